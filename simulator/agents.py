@@ -1,29 +1,37 @@
-# Definition of Agent class as subclass of Pygame Sprite
+# Definition of Agent class
 # Agents are the entities in the simulation that interact with the environment
 # An agent is a state machine that can be in one of several states at a time
 # The agent's behavior (actions, movements, ...) is determined by the current state
 # The agent can change states based on certain conditions
 # Current Agents implemented: Drone, Animal, Poacher
+# Agents don't depend on pygame, sprites for rendering are created by the renderer (see game_env.AgentSprite)
+# Agents declare their attributes in __slots__, so large headless worlds don't need a __dict__ per agent
 
-import pygame
 import heapq
 from collections import deque
 
 from settings import *
+from vector import Vector2
+from random_stream import default_stream
 from states import DroneFastSearch, AnimalIdle, PoacherIdle
 
 
-class Agent(pygame.sprite.Sprite):
-    def __init__(self, name, x, y, color):
+class Agent:
+    __slots__ = ('name', 'type', 'active_state', 'controller', 'base_speed', 'position', 'scan_range',
+                 'event_bus', 'map_size', 'rng', 'color')
+
+    def __init__(self, name, x, y, color, event_bus=None, map_size=(GAME_WIDTH, HEIGHT), rng=None):
         """
-        Initialize the base agent class as subclass of Pygame Sprite.
+        Initialize the base agent class.
         Args:
             name: str, name of the agent
             x: int, x-coordinate of the agent
             y: int, y-coordinate of the agent
             color: tuple, RGB color of the agent
+            event_bus: EventBus (optional), bus of the world the agent lives in, used by states to post events
+            map_size: tuple (width, height), boundaries of the map the agent moves in
+            rng: RandomStream (optional), random stream of the world used by the states, defaults to a shared stream
         """
-        super().__init__()
         # Basic identifiers 
         self.name = name
         self.type = None
@@ -34,38 +42,38 @@ class Agent(pygame.sprite.Sprite):
         # Agent properties
         self.controller = None
         self.base_speed = 0
-        self.position = pygame.Vector2(x, y)
+        self.position = Vector2(x, y)
         self.scan_range = 0
-        self.memory = deque(maxlen=3)  # Memory queue of tuples to store last sightings (agent_type, position)
         
-        # Pygame sprite setup for rendering
-        self.image = pygame.Surface((10, 10))
-        self.image.fill(color)
-        self.rect = self.image.get_rect(center=(x, y))
+        # World connection & rendering
+        self.event_bus = event_bus
+        self.map_size = map_size
+        self.rng = rng if rng is not None else default_stream
+        self.color = color
 
     def set_state(self, new_state):
         """
         Change the agent's state. Called from updated method after transition conditions were checked.
         Exits the current state and enters the new state.
         Args:
-            new_state: state object
+            new_state: state object, shared by all agents in this state (see states.State)
         """
         # Exit the current state if exists (in initialization no current state)
-        if self.active_state:
-            self.active_state.exit()
+        if self.active_state is not None:
+            self.active_state.exit(self)
         
         # Set new active state
         self.active_state = new_state
 
-        # Enter the new state
-        self.active_state.enter(agent=self)
+        # Enter the new state, resets the data of the state kept on the agent
+        new_state.enter(self)
         return
     
-    def move(self, vector: pygame.Vector2, speed=None, mode='direction'):
+    def move(self, vector: Vector2, speed=None, mode='direction'):
         """
         Move agent to the given position if within speed range, else on a vector towards it.
         Args:
-            vector: pygame.Vector2, can be position to move to or direction to move in
+            vector: Vector2, can be position to move to or direction to move in
             speed: int (optional), speed to move with, if None method uses base speed
             mode: str, 'direction' or 'position', whether vector is a direction or a position
         """
@@ -84,7 +92,7 @@ class Agent(pygame.sprite.Sprite):
             
             # Calculate the direction towards target position & move agent
             else:
-                direction = pygame.Vector2(vector - self.position)
+                direction = Vector2(vector - self.position)
                 direction.normalize_ip()
                 self.position += direction * velocity
         
@@ -98,22 +106,26 @@ class Agent(pygame.sprite.Sprite):
             raise ValueError(f"Invalid mode: {mode}")
         
         # Keep agent within boundaries
-        self.position.x = max(0, min(GAME_WIDTH, self.position.x))
-        self.position.y = max(0, min(HEIGHT, self.position.y))
-
-        # Update the sprite position
-        self.rect.center = self.position
+        self.position.x = max(0, min(self.map_size[0], self.position.x))
+        self.position.y = max(0, min(self.map_size[1], self.position.y))
         return
     
-    def scan_surroundings(self, agents, mode='all'):
+    def scan_surroundings(self, agents, mode='all', index=None):
         """
         Scan the environment for the given agents within scan range.
         Args:
             agents: list of agents to check for
             mode: str, 'all' or 'nearest', whether to return all detected agents or only the nearest one
+            index: SpatialGrid (optional), spatial index built over agents, restricts the scan to nearby cells
         Returns:
             detected_agents: list, heapified list of detected agents with (distance, tie_breaker, agent) tuples for mode all or single tuple for mode nearest. If no agents found, returns empty list.
         """
+        scan_radius = self.scan_range * self.active_state.scan_range_modifier
+
+        # Only check agents in cells overlapping the scan range if an index is given
+        # The index returns candidates in the order of the group, so the heap is identical to the brute-force scan
+        if index is not None:
+            agents = index.query(self.position, scan_radius)
 
         # Create a heap to store detected agents
         detected_agents = []
@@ -122,7 +134,7 @@ class Agent(pygame.sprite.Sprite):
 
         # Check each agent in the list
         for agent in agents:
-            
+
             # Skip self
             if agent == self:
                 continue
@@ -131,7 +143,7 @@ class Agent(pygame.sprite.Sprite):
             distance = self.position.distance_to(agent.position)
 
             # If the agent is within the scan range, add it to the heap
-            if distance < self.scan_range * self.active_state.scan_range_modifier:
+            if distance < scan_radius:
                 heapq.heappush(detected_agents, (self.position.distance_to(agent.position), tie_breaker, agent))
                 tie_breaker += 1
 
@@ -146,8 +158,10 @@ class Agent(pygame.sprite.Sprite):
 
 
 class Drone(Agent):
-    def __init__(self, name, x, y):
-        super().__init__(name=name, x=x, y=y, color=DRONE_COLOR)
+    __slots__ = ('catch_range', 'target')
+
+    def __init__(self, name, x, y, event_bus=None, map_size=(GAME_WIDTH, HEIGHT), rng=None):
+        super().__init__(name=name, x=x, y=y, color=DRONE_COLOR, event_bus=event_bus, map_size=map_size, rng=rng)
         self.type = 'Drone'
         self.base_speed = DRONE_SPEED
         self.scan_range = DRONE_SCAN_RANGE
@@ -158,10 +172,13 @@ class Drone(Agent):
 
 
 class Animal(Agent):
-    def __init__(self, name, x, y):
-        super().__init__(name=name, x=x, y=y, color=ANIMAL_COLOR)
+    __slots__ = ('herd', 'herds', 'threat_range', 'separation', 'threat', 'health')
+
+    def __init__(self, name, x, y, event_bus=None, map_size=(GAME_WIDTH, HEIGHT), rng=None):
+        super().__init__(name=name, x=x, y=y, color=ANIMAL_COLOR, event_bus=event_bus, map_size=map_size, rng=rng)
         self.type = 'Animal'
-        self.herd = None
+        self.herd = None  # Animals within scan range, updated every tick
+        self.herds = None  # HerdTracker of the world if herds are tracked as connected groups, replaces herd
         self.base_speed = ANIMAL_SPEED
         self.scan_range = ANIMAL_SCAN_RANGE
         self.threat_range = ANIMAL_THREAT_RANGE
@@ -173,8 +190,11 @@ class Animal(Agent):
             
 
 class Poacher(Agent):
-    def __init__(self, name, x, y):
-        super().__init__(name=name, x=x, y=y, color=POACHER_COLOR)  
+    __slots__ = ('attack_range', 'attack_duration', 'attack_damage', 'kill_range', 'target', 'memory',
+                 'search_time', 'time_since_direction_change', 'search_angle', 'attack_time')
+
+    def __init__(self, name, x, y, event_bus=None, map_size=(GAME_WIDTH, HEIGHT), rng=None):
+        super().__init__(name=name, x=x, y=y, color=POACHER_COLOR, event_bus=event_bus, map_size=map_size, rng=rng)
         self.type = 'Poacher'
         self.base_speed = POACHER_SPEED
         self.scan_range = POACHER_SCAN_RANGE
@@ -183,5 +203,46 @@ class Poacher(Agent):
         self.attack_damage = POACHER_ATTACK_DAMAGE
         self.kill_range = POACHER_KILL_RANGE
         self.target = None 
+        self.memory = deque(maxlen=3)  # Memory queue of tuples to store last sightings (agent_type, position)
+        # Data of the idle search pattern and of the attack, reset when entering the states
+        self.search_time = 0
+        self.time_since_direction_change = 0
+        self.search_angle = 0
+        self.attack_time = 0
         # Set initial state
         self.set_state(PoacherIdle())
+
+
+class AgentGroup:
+    """
+    Ordered set of agents, replaces pygame.sprite.Group in the simulation core.
+    Iterates in insertion order. Unlike pygame groups it doesn't iterate over a copy,
+    so agents must not be added or removed while iterating over the same group.
+    """
+    __slots__ = ('agents',)
+
+    def __init__(self, agents=()):
+        self.agents = dict.fromkeys(agents)
+
+    def __iter__(self):
+        return iter(self.agents)
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __contains__(self, agent):
+        return agent in self.agents
+
+    def add(self, *agents):
+        for agent in agents:
+            self.agents[agent] = None
+        return
+
+    def remove(self, *agents):
+        for agent in agents:
+            self.agents.pop(agent, None)
+        return
+
+    def empty(self):
+        self.agents.clear()
+        return
@@ -0,0 +1,1041 @@
+# Struct-of-arrays simulation engine
+# Alternative to the object loop in main.run: the state of all agents lives in contiguous NumPy arrays per agent type
+# and a whole tick (events, sensing, state transitions, actions and movement) is computed in vectorized form.
+# Drones, animals and poachers are exposed as thin views on the arrays, so the optimizers and the renderer keep working.
+# Like World, the engine doesn't depend on pygame and routes optimizer events through its own EventBus.
+# The engine follows the rules of the states of states.py, but it is not a bit-exact replica of World:
+# - Agents of one type are updated simultaneously: all animals (poachers) scan, decide and move based on the positions
+#   at the start of their phase. In World every agent already sees the moves of the agents updated before it.
+# - Poachers without a target pick the animal in the smallest herd in sight like in World, but the herd of an animal
+#   is always the animals within its scan range at the start of the animal phase, as in World with herding='neighbors'.
+#   There are no tracked herds (herding='components', the default of World).
+# - Random numbers are drawn per phase from a NumPy generator, equal seeds don't give the same episode as World.
+# Like World, the engine keeps the drone that first saw every detected agent, records the detected and lost agents as
+# DRONE_DETECTED_*/DRONE_LOST_* events and passes them to optimizers that track detections (single worlds only).
+# tests/test_array_engine.py checks these differences against World.
+# BatchWorld stacks the agents of several independent worlds into the same arrays (with a world index per agent)
+# and advances all of them with one tick. Every world draws from a random stream of its own.
+
+import copy
+import time
+from itertools import repeat
+from collections import deque
+import numpy as np
+
+from settings import *
+from events import (POACHER_ATTACK_ANIMAL, ANIMAL_KILLED, DRONE_CAUGHT_POACHER, DRONE_DETECTED_ANIMAL, DRONE_LOST_ANIMAL,
+                    DRONE_DETECTED_POACHER, DRONE_LOST_POACHER)
+from event_bus import EventBus
+from vector import Vector2
+from world import DEFAULT_DRONES, DEFAULT_ANIMALS, DEFAULT_POACHERS, MAX_STEPS, DETECTION_VIEWS
+from snapshot import WorldSnapshot
+from random_stream import spawn_streams
+from states import DroneFastSearch, DroneDeepSearch, AnimalIdle, AnimalFleeing, PoacherIdle, PoacherHunting, PoacherAttacking, Terminal, STATES
+
+# State codes of the engine, the codes of the state classes
+DRONE_FAST_SEARCH = DroneFastSearch.code
+DRONE_DEEP_SEARCH = DroneDeepSearch.code
+ANIMAL_IDLE = AnimalIdle.code
+ANIMAL_FLEEING = AnimalFleeing.code
+POACHER_IDLE = PoacherIdle.code
+POACHER_HUNTING = PoacherHunting.code
+POACHER_ATTACKING = PoacherAttacking.code
+TERMINAL = Terminal.code
+
+# Shared state objects returned by the views, indexed by state code
+STATE_OBJECTS = STATES
+SPEED_MODIFIERS = np.array([state.speed_modifier for state in STATE_OBJECTS], dtype=float)
+SCAN_RANGE_MODIFIERS = np.array([state.scan_range_modifier for state in STATE_OBJECTS], dtype=float)
+
+MEMORY_SIZE = 3  # Number of remembered animal sightings per poacher, same as Agent.memory
+CELL_STRIDE = 1 << 32  # Multiplier to combine grid cell coordinates into one integer key
+WORLD_STRIDE = 1 << 16  # Offset in grid columns between the worlds of a batch, so their cells never overlap
+
+# State captured by snapshots, arrays of AgentArrays and of the world, the other arrays don't change during a run
+SNAPSHOT_AGENT_ARRAYS = ('position', 'velocity', 'state', 'alive')
+SNAPSHOT_WORLD_ARRAYS = ('drone_target', 'animal_health', 'animal_threat', 'animal_sighted_by', 'poacher_target',
+                         'poacher_sighted_by', 'poacher_memory',
+                         'poacher_search_time', 'poacher_direction_time', 'poacher_search_angle', 'poacher_attack_time',
+                         'pending_catches', 'world_steps', 'world_running', 'stepping')
+
+
+def neighbor_pairs(a, b, radius, cell_size=SPATIAL_CELL_SIZE, world_a=None, world_b=None):
+    """
+    Find all pairs of positions closer than the scan radius of the first position.
+    The positions of b are bucketed into a uniform grid and only the cells overlapping a scan range are compared,
+    so the cost grows with the number of neighbors instead of len(a) * len(b).
+    Args:
+        a: np.ndarray (n, 2), scanning positions
+        b: np.ndarray (m, 2), scanned positions
+        radius: np.ndarray (n,), scan radius of each position of a
+        cell_size: float, edge length of the grid cells
+        world_a: np.ndarray (n,) (optional), world index of each position of a, only pairs within a world are found
+        world_b: np.ndarray (m,) (optional), world index of each position of b
+    Returns:
+        i: np.ndarray, indices into a
+        j: np.ndarray, indices into b
+        distance: np.ndarray, distances between a[i] and b[j], all smaller than radius[i]
+    """
+    if len(a) == 0 or len(b) == 0 or radius.max() <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+    # Sort b by grid cell, cells of one grid column are then contiguous in the sorted order
+    cell_b = np.floor(b / cell_size).astype(np.int64)
+    if world_b is not None:
+        cell_b[:, 0] += world_b * WORLD_STRIDE
+    key_b = cell_b[:, 0] * CELL_STRIDE + cell_b[:, 1]
+    order = np.argsort(key_b, kind='stable')
+    sorted_keys = key_b[order]
+
+    # Coordinates as contiguous 1D arrays, gathering from them is cheaper than from the (n, 2) arrays
+    a_x, a_y = a[:, 0].copy(), a[:, 1].copy()
+    b_x, b_y = b[order, 0], b[order, 1]
+    squared_radius = radius * radius
+
+    # Check the candidates of all cells overlapping the largest scan range, one contiguous range per grid column,
+    # every column is filtered right away so the temporary arrays stay small
+    cell_a = np.floor(a / cell_size).astype(np.int64)
+    if world_a is not None:
+        cell_a[:, 0] += world_a * WORLD_STRIDE
+    span = int(np.ceil(radius.max() / cell_size))
+    rows = np.arange(len(a))
+    pairs_i, pairs_j, pairs_distance = [], [], []
+    for dx in range(-span, span + 1):
+        column = (cell_a[:, 0] + dx) * CELL_STRIDE + cell_a[:, 1]
+        start = np.searchsorted(sorted_keys, column - span, side='left')
+        count = np.searchsorted(sorted_keys, column + span, side='right') - start
+        found = count > 0
+        if not found.any():
+            continue
+        count, start = count[found], start[found]
+        i = np.repeat(rows[found], count)
+        j = np.arange(len(i)) + np.repeat(start - np.cumsum(count) + count, count)
+
+        # Exact distance check
+        delta_x = a_x[i] - b_x[j]
+        delta_y = a_y[i] - b_y[j]
+        squared_distance = delta_x * delta_x + delta_y * delta_y
+        within = squared_distance < squared_radius[i]
+        pairs_i.append(i[within])
+        pairs_j.append(j[within])
+        pairs_distance.append(squared_distance[within])
+
+    if not pairs_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(pairs_i), order[np.concatenate(pairs_j)], np.sqrt(np.concatenate(pairs_distance))
+
+
+def take_index(index, local):
+    """Map indices into a subset (-1 for none) back to indices into the full arrays"""
+    if len(index) == 0:
+        return np.full(np.shape(local), -1)
+    return np.where(local >= 0, index[local], -1)
+
+
+def first_sightings(n, scanners, i, j):
+    """
+    First scanner that sees each of n positions, from the pairs of neighbor_pairs, like the scan order of World.
+    Args:
+        n: int, number of scanned positions
+        scanners: np.ndarray, indices of the scanning agents, the pairs index into it
+    Returns:
+        np.ndarray (n,), indices of the scanners with the lowest index, -1 where no scanner sees the position
+    """
+    first = np.full(n, len(scanners))
+    np.minimum.at(first, j, i)
+    return take_index(scanners, np.where(first < len(scanners), first, -1))
+
+
+def k_nearest(n, k, i, j, distance):
+    """
+    Select the k nearest neighbors of every scanning position from the pairs of neighbor_pairs.
+    Ties are resolved by the lower index, like the tie breaker of Agent.scan_surroundings.
+    Returns:
+        nearest: np.ndarray (n, k), indices into b ordered by distance, -1 where less than k neighbors exist
+        nearest_distance: np.ndarray (n, k), distances of the neighbors, inf where no neighbor exists
+    """
+    nearest = np.full((n, k), -1)
+    nearest_distance = np.full((n, k), np.inf)
+    if len(i) == 0:
+        return nearest, nearest_distance
+
+    # Sort pairs by scanning position, then distance & rank them within each scanning position
+    order = np.lexsort((j, distance, i))
+    i, j, distance = i[order], j[order], distance[order]
+    group_start = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+    rank = np.arange(len(i)) - np.repeat(group_start, np.diff(np.r_[group_start, len(i)]))
+    keep = rank < k
+    nearest[i[keep], rank[keep]] = j[keep]
+    nearest_distance[i[keep], rank[keep]] = distance[keep]
+    return nearest, nearest_distance
+
+
+class AgentArrays:
+    """Contiguous storage of the common state of all agents of one type"""
+
+    def __init__(self, names, positions, state, base_speed, scan_range, world=None, map_size=(GAME_WIDTH, HEIGHT)):
+        """
+        Args:
+            names: list of str, agent names
+            positions: array-like (n, 2), initial positions
+            state: int, initial state code
+            base_speed: float, base speed of the agent type
+            scan_range: float, base scan range of the agent type
+            world: array-like (n,) (optional), index of the world of each agent in a batch of worlds
+            map_size: tuple (width, height), boundaries of the map
+        """
+        n = len(names)
+        self.names = list(names)
+        self.world = np.zeros(n, dtype=np.int64) if world is None else np.asarray(world, dtype=np.int64)
+        self.position = np.asarray(positions, dtype=float).reshape(n, 2).copy()
+        self.velocity = np.zeros((n, 2))
+        self.state = np.full(n, state, dtype=np.int8)
+        self.base_speed = np.full(n, base_speed, dtype=float)
+        self.scan_range = np.full(n, scan_range, dtype=float)
+        self.alive = np.ones(n, dtype=bool)
+        self.map_size = map_size
+
+    def __len__(self):
+        return len(self.names)
+
+    def scan_radius(self):
+        """Effective scan range of each agent in its current state"""
+        return self.scan_range * SCAN_RANGE_MODIFIERS[self.state]
+
+    def speed(self):
+        """Effective speed of each agent in its current state"""
+        return self.base_speed * SPEED_MODIFIERS[self.state]
+
+    def move_direction(self, index, direction, speed):
+        """
+        Vectorized version of Agent.move in direction mode.
+        Args:
+            index: np.ndarray, indices of the agents to move
+            direction: np.ndarray (len(index), 2), direction vectors, zero vectors don't move
+            speed: np.ndarray (len(index),), distance to move
+        """
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        moving = length > 0
+        step = np.zeros_like(direction)
+        step[moving] = direction[moving] / length[moving, None] * speed[moving, None]
+        self.set_positions(index, self.position[index] + step)
+
+    def move_towards(self, index, target, speed):
+        """
+        Vectorized version of Agent.move in position mode.
+        Args:
+            index: np.ndarray, indices of the agents to move
+            target: np.ndarray (len(index), 2), positions to move to
+            speed: np.ndarray (len(index),), maximal distance to move
+        """
+        position = self.position[index]
+        delta = target - position
+        distance = np.hypot(delta[:, 0], delta[:, 1])
+        reached = distance <= speed
+        new_position = target.copy()
+        new_position[~reached] = position[~reached] + delta[~reached] / distance[~reached, None] * speed[~reached, None]
+        self.set_positions(index, new_position)
+
+    def set_positions(self, index, new_position):
+        """Keep agents within boundaries and store positions & velocities"""
+        np.clip(new_position[:, 0], 0, self.map_size[0], out=new_position[:, 0])
+        np.clip(new_position[:, 1], 0, self.map_size[1], out=new_position[:, 1])
+        self.velocity[index] = new_position - self.position[index]
+        self.position[index] = new_position
+
+
+class AgentView:
+    """
+    Thin view on one row of the agent arrays of an ArrayWorld.
+    Provides the attributes of the Agent classes used by the optimizers and the renderer.
+    """
+    color = (255, 255, 255)
+
+    def __init__(self, world, arrays, index):
+        self.world = world
+        self.arrays = arrays
+        self.index = index
+        self.name = arrays.names[index]
+        self.event_bus = world.event_bus
+
+    @property
+    def position(self):
+        return Vector2(*self.arrays.position[self.index])
+
+    @property
+    def active_state(self):
+        return STATE_OBJECTS[self.arrays.state[self.index]]
+
+    @property
+    def base_speed(self):
+        return float(self.arrays.base_speed[self.index])
+
+    @property
+    def scan_range(self):
+        return float(self.arrays.scan_range[self.index])
+
+
+class DroneView(AgentView):
+    type = 'Drone'
+    color = DRONE_COLOR
+
+    @property
+    def catch_range(self):
+        return float(self.world.drone_catch_range[self.index])
+
+    @property
+    def target(self):
+        target = self.world.drone_target[self.index]
+        return self.world.poacher_views[target] if target >= 0 else None
+
+
+class AnimalView(AgentView):
+    type = 'Animal'
+    color = ANIMAL_COLOR
+
+    @property
+    def health(self):
+        return float(self.world.animal_health[self.index])
+
+    @property
+    def threat(self):
+        threat = self.world.animal_threat[self.index]
+        return self.world.poacher_views[threat] if threat >= 0 else None
+
+
+class PoacherView(AgentView):
+    type = 'Poacher'
+    color = POACHER_COLOR
+
+    @property
+    def target(self):
+        target = self.world.poacher_target[self.index]
+        return self.world.animal_views[target] if target >= 0 else None
+
+
+class ArrayWorld:
+    """
+    Simulation world with struct-of-arrays agent storage and vectorized tick.
+    Differences to World, see the module description:
+    - agents of one type are updated simultaneously from the positions at the start of their phase
+    - herd sizes for the target choice of the poachers are the animals in scan range at the start of the animal phase
+    - random numbers come from a NumPy generator, episodes differ from World episodes with the same seed
+    """
+
+    def __init__(self, drones=DEFAULT_DRONES, animals=DEFAULT_ANIMALS, poachers=DEFAULT_POACHERS, seed=None, event_log=None, log_transitions=False,
+                 max_steps=MAX_STEPS, profiler=None, map_size=(GAME_WIDTH, HEIGHT), recorder=None):
+        """
+        Args:
+            drones: list of (name, x, y) tuples
+            animals: list of (name, x, y) tuples
+            poachers: list of (name, x, y) tuples
+            seed: int or np.random.SeedSequence (optional), seed of the random generator for grazing and search patterns
+            event_log: deque (optional), log of (message, ticks) tuples shown in the info panel
+            log_transitions: bool, whether to log state changes (costly for large worlds)
+            max_steps: int, number of steps after which the simulation ends with a timeout
+            profiler: PhaseProfiler (optional), times the phases of every tick and counts scans, transitions and events
+            map_size: tuple (width, height), boundaries of the map
+            recorder: TrajectoryRecorder (optional), records positions, states, health and events of every tick
+        """
+        self.setup([(drones, animals, poachers)], [seed], event_log, log_transitions, max_steps, profiler, map_size, recorder)
+
+    def setup(self, scenarios, seeds, event_log, log_transitions, max_steps, profiler=None, map_size=(GAME_WIDTH, HEIGHT),
+              recorder=None):
+        """
+        Create the agent arrays of one or more worlds, the agents of all worlds are stacked world after world.
+        Args:
+            scenarios: list of (drones, animals, poachers) tuples, one per world, each a list of (name, x, y) tuples
+            seeds: list with the seed of the random generator of every world
+        """
+        self.rngs = [np.random.default_rng(seed) for seed in seeds]
+        self.event_bus = EventBus()
+        self.start_time = time.perf_counter()
+        self.event_log = event_log if event_log is not None else deque(maxlen=15)
+        self.log_transitions = log_transitions
+        self.max_steps = max_steps
+        self.profiler = profiler
+        self.map_size = map_size
+        self.n_worlds = len(scenarios)
+
+        # Common agent arrays
+        def stack(agent_type, state, base_speed, scan_range):
+            rows = [(agent, world) for world, scenario in enumerate(scenarios) for agent in scenario[agent_type]]
+            return AgentArrays([agent[0] for agent, _ in rows], [agent[1:] for agent, _ in rows], state, base_speed, scan_range,
+                               [world for _, world in rows], map_size)
+        self.drones = stack(0, DRONE_FAST_SEARCH, DRONE_SPEED, DRONE_SCAN_RANGE)
+        self.animals = stack(1, ANIMAL_IDLE, ANIMAL_SPEED, ANIMAL_SCAN_RANGE)
+        self.poachers = stack(2, POACHER_IDLE, POACHER_SPEED, POACHER_SCAN_RANGE)
+
+        # Drone arrays
+        self.drone_catch_range = np.full(len(self.drones), DRONE_CATCH_RANGE, dtype=float)
+        self.drone_target = np.full(len(self.drones), -1)
+
+        # Animal arrays
+        self.animal_health = np.full(len(self.animals), ANIMAL_HEALTH, dtype=float)
+        self.animal_threat = np.full(len(self.animals), -1)
+        self.animal_herd_size = np.ones(len(self.animals), dtype=int)  # Herd sizes of the last animal phase, including the animal
+        self.animal_sighted_by = np.full(len(self.animals), -1)  # First drone that saw the animal in the last tick, -1 if none
+
+        # Poacher arrays
+        n_poachers = len(self.poachers)
+        self.poacher_target = np.full(n_poachers, -1)
+        self.poacher_sighted_by = np.full(n_poachers, -1)  # First drone that saw the poacher in the last tick, -1 if none
+        self.poacher_memory = np.full((n_poachers, MEMORY_SIZE), -1)  # Animal indices of last sightings, most recent first
+        self.poacher_search_time = np.zeros(n_poachers, dtype=int)
+        self.poacher_direction_time = np.zeros(n_poachers, dtype=int)
+        self.poacher_search_angle = self.random_rows(self.poachers.world, lambda rng, n: rng.integers(0, 361, n)).astype(float)
+        self.poacher_attack_time = np.zeros(n_poachers, dtype=int)
+
+        # Views for optimizers and renderer
+        self.drone_views = [DroneView(self, self.drones, i) for i in range(len(self.drones))]
+        self.animal_views = [AnimalView(self, self.animals, i) for i in range(len(self.animals))]
+        self.poacher_views = [PoacherView(self, self.poachers, i) for i in range(len(self.poachers))]
+
+        # Events raised during a tick, handled at the start of the next tick like the pygame event queue
+        self.pending_attacks = (np.empty(0, dtype=int), np.empty(0, dtype=int))  # (animal indices, poacher indices)
+        self.pending_kills = (np.empty(0, dtype=int), np.empty(0, dtype=int))  # (animal indices, poacher indices)
+        self.pending_catches = np.empty(0, dtype=int)  # poacher indices
+        self.detection_changes = []  # (type, agent indices, drone indices) of the agents detected or lost in the tick
+        self.detection_optimizer = None  # Optimizer whose view of the detected agents is up to date
+        self.detection_view = next(DETECTION_VIEWS)
+
+        # Simulation progress per world, stepping marks the worlds updated in the current tick
+        self.world_steps = np.zeros(self.n_worlds, dtype=int)
+        self.world_outcomes = [None] * self.n_worlds
+        self.world_running = np.ones(self.n_worlds, dtype=bool)
+        self.stepping = self.world_running.copy()
+
+        # Optional trajectory recording, agents are recorded in the order of all_agents
+        self.recorder = recorder
+        if recorder is not None:
+            types = (('drones', self.drones), ('animals', self.animals), ('poachers', self.poachers))
+            recorder.open([name for _, agents in types for name in agents.names], [(name, len(agents)) for name, agents in types],
+                          map_size, engine='array', world=np.concatenate([agents.world for _, agents in types]).tolist())
+            self.record()
+        return
+
+    # Progress of a single world, a batch is running as long as one of its worlds is
+    @property
+    def steps(self):
+        return int(self.world_steps[0])
+
+    @property
+    def outcome(self):
+        return self.world_outcomes[0]
+
+    @property
+    def running(self):
+        return bool(self.world_running.any())
+
+    @running.setter
+    def running(self, running):
+        self.world_running[:] = running
+
+    @classmethod
+    def from_agents(cls, drones, animals, poachers, **kwargs):
+        """Create a world with the names and positions of existing Drone, Animal and Poacher objects"""
+        def rows(agents):
+            return [(agent.name, agent.position.x, agent.position.y) for agent in agents]
+        return cls(rows(drones), rows(animals), rows(poachers), **kwargs)
+
+    def all_agents(self):
+        """Views of all agents of the world, alive or not"""
+        return self.drone_views + self.animal_views + self.poacher_views
+
+    def agents_by_type(self):
+        """Drones, alive animals and alive poachers, as shown in the info panel"""
+        return (self.drone_views,
+                [self.animal_views[i] for i in np.flatnonzero(self.animals.alive)],
+                [self.poacher_views[i] for i in np.flatnonzero(self.poachers.alive)])
+
+    def elapsed_ms(self):
+        """Milliseconds since the world was created, used as timestamp in the event log"""
+        return int((time.perf_counter() - self.start_time) * 1000)
+
+    def log(self, message):
+        self.event_log.append((message, self.elapsed_ms()))
+
+    def log_state_changes(self, arrays, index, old_state):
+        """Log state changes of the given agents if enabled"""
+        if self.profiler is not None:
+            self.profiler.count('state_transitions', int((arrays.state[index] != old_state).sum()))
+        if not self.log_transitions:
+            return
+        for i, old in zip(index, old_state):
+            if arrays.state[i] != old:
+                self.log(f"{arrays.names[i]} changed state to {STATE_OBJECTS[arrays.state[i]].__class__.__name__}")
+
+    def run(self, optimizer):
+        """Step the world until the simulation ends and return the results"""
+        while self.running:
+            self.step(optimizer)
+        return self.results()
+
+    def snapshot(self):
+        """
+        Capture the complete state of the world between two ticks, copies of all arrays changed by the tick
+        Returns:
+            snapshot: WorldSnapshot
+        """
+        arrays = {f"{name}.{field}": getattr(agents, field).copy()
+                  for name, agents in (('drones', self.drones), ('animals', self.animals), ('poachers', self.poachers))
+                  for field in SNAPSHOT_AGENT_ARRAYS}
+        arrays.update({name: getattr(self, name).copy() for name in SNAPSHOT_WORLD_ARRAYS})
+        arrays['pending_attacks'] = np.array(self.pending_attacks)
+        arrays['pending_kills'] = np.array(self.pending_kills)
+        data = {
+            'rngs': [rng.bit_generator.state for rng in self.rngs],
+            'world_outcomes': list(self.world_outcomes),
+            'event_log': list(self.event_log)
+        }
+        return WorldSnapshot('array', arrays, data)
+
+    def restore(self, snapshot):
+        """
+        Reset the world to a snapshot of itself or of a fork, views of the agents stay valid
+        Args:
+            snapshot: WorldSnapshot, as returned by snapshot
+        """
+        arrays = snapshot.arrays
+        for name, agents in (('drones', self.drones), ('animals', self.animals), ('poachers', self.poachers)):
+            for field in SNAPSHOT_AGENT_ARRAYS:
+                setattr(agents, field, arrays[f"{name}.{field}"].copy())
+        for name in SNAPSHOT_WORLD_ARRAYS:
+            setattr(self, name, arrays[name].copy())
+        self.pending_attacks = tuple(arrays['pending_attacks'].copy())
+        self.pending_kills = tuple(arrays['pending_kills'].copy())
+        self.detection_changes = []
+        self.detection_optimizer = None  # Optimizers tracking detections get the restored detected agents anew
+        self.detection_view = next(DETECTION_VIEWS)
+        for rng, state in zip(self.rngs, snapshot.data['rngs']):
+            rng.bit_generator.state = state
+        self.world_outcomes = list(snapshot.data['world_outcomes'])
+        self.event_log.clear()
+        self.event_log.extend(snapshot.data['event_log'])
+        return
+
+    def fork(self, n):
+        """
+        Independent copies of the world in its current state, e.g. for what-if rollouts with different actions.
+        The copies share the arrays that don't change during a run and continue the random stream of the world.
+        Args:
+            n: int, number of copies
+        Returns:
+            list of ArrayWorld (BatchWorld for a batch)
+        """
+        snapshot = self.snapshot()
+        forks = []
+        for _ in range(n):
+            world = copy.copy(self)
+            world.drones, world.animals, world.poachers = copy.copy(self.drones), copy.copy(self.animals), copy.copy(self.poachers)
+            world.rngs = [np.random.default_rng() for _ in self.rngs]
+            world.event_bus = EventBus()
+            world.event_log = deque(maxlen=self.event_log.maxlen)
+            world.profiler = None
+            world.recorder = None
+            world.drone_views = [DroneView(world, world.drones, i) for i in range(len(world.drones))]
+            world.animal_views = [AnimalView(world, world.animals, i) for i in range(len(world.animals))]
+            world.poacher_views = [PoacherView(world, world.poachers, i) for i in range(len(world.poachers))]
+            world.restore(snapshot)
+            forks.append(world)
+        return forks
+
+    def step(self, optimizer):
+        """Advance all running worlds by one tick"""
+        self.stepping = self.world_running.copy()
+        self.world_steps[self.stepping] += 1
+        for world in np.flatnonzero(self.stepping & (self.world_steps > self.max_steps)):
+            self.end_world(world, "timeout")
+
+        profiler = self.profiler
+        if profiler is None:
+            self.handle_events()
+            self.update_animals()
+            self.update_poachers()
+            self.update_drones(optimizer)
+            if self.recorder is not None:
+                self.record()
+            return
+
+        # Same phases with timers, update_drones times its sensing, optimizer and action phases itself
+        profiler.tick()
+        start = profiler.start()
+        self.handle_events()
+        start = profiler.stop('events', start)
+        self.update_animals()
+        start = profiler.stop('animals', start)
+        self.update_poachers()
+        profiler.stop('poachers', start)
+        self.update_drones(optimizer)
+        if self.recorder is not None:
+            start = profiler.start()
+            self.record()
+            profiler.stop('recording', start)
+        return
+
+    def record(self):
+        """Write the current tick and the events raised in it (pending for the next tick) to the recorder"""
+        position, state, health = self.recorder.tick(self.steps)
+        n_drones, n_animals = len(self.drones), len(self.animals)
+        animals, poachers = slice(n_drones, n_drones + n_animals), slice(n_drones + n_animals, None)
+        position[:n_drones], state[:n_drones] = self.drones.position, self.drones.state
+        position[animals], state[animals] = self.animals.position, self.animals.state
+        position[poachers], state[poachers] = self.poachers.position, self.poachers.state
+        health[animals] = self.animal_health
+
+        # Same order as the event queue of World, the catching drone is not tracked
+        starts = {DRONE_DETECTED_ANIMAL: animals.start, DRONE_LOST_ANIMAL: animals.start,
+                  DRONE_DETECTED_POACHER: poachers.start, DRONE_LOST_POACHER: poachers.start}
+        events = [(ANIMAL_KILLED, self.pending_kills[0] + animals.start, self.pending_kills[1] + poachers.start),
+                  (POACHER_ATTACK_ANIMAL, self.pending_attacks[0] + animals.start, self.pending_attacks[1] + poachers.start),
+                  *((event_type, agent + starts[event_type], drone) for event_type, agent, drone in self.detection_changes),
+                  (DRONE_CAUGHT_POACHER, self.pending_catches + poachers.start, None)]
+        for event_type, agent, other in events:
+            if len(agent):
+                other = repeat(-1) if other is None else other.tolist()
+                self.recorder.add_events(self.steps, zip(repeat(event_type), agent.tolist(), other))
+        return
+
+    def update_sightings(self, sighted_by, agents, sightings, detected_type, lost_type):
+        """
+        Update the sightings of the agents of the stepping worlds and keep the changes for the recorder
+        Args:
+            sighted_by: np.ndarray, sightings of the last tick (drone indices, -1 if not sighted), updated in place
+            agents: AgentArrays, the sighted agents
+            sightings: np.ndarray, sightings of this tick
+            detected_type: int, event type recorded with the agent and the drone that detected it
+            lost_type: int, event type recorded with the agent and the drone that saw it last
+        Returns:
+            (detected, lost): np.ndarray of agent indices
+        """
+        sightings = np.where(self.stepping[agents.world], sightings, sighted_by)  # Finished worlds keep their sightings
+        lost = np.flatnonzero((sighted_by >= 0) & (sightings < 0))
+        detected = np.flatnonzero((sightings >= 0) & (sighted_by < 0))
+        self.detection_changes += [(lost_type, lost, sighted_by[lost]), (detected_type, detected, sightings[detected])]
+        sighted_by[:] = sightings
+        return detected, lost
+
+    def scan_pairs(self, a, b, radius, **kwargs):
+        """neighbor_pairs counting the scans and the agents found in scan range if profiling"""
+        pairs = neighbor_pairs(a, b, radius, **kwargs)
+        if self.profiler is not None:
+            self.profiler.count('scans', len(a))
+            self.profiler.count('agents_scanned', len(pairs[0]))
+        return pairs
+
+    def results(self):
+        """Return the simulation results in the format of main.run"""
+        return self.world_results(0)
+
+    def world_results(self, world):
+        """Return the simulation results of one world in the format of main.run"""
+        poachers = int((self.poachers.world == world).sum())
+        animals = int((self.animals.world == world).sum())
+        return {
+            'outcome': self.world_outcomes[world],
+            'steps': int(self.world_steps[world]),
+            'poachers_caught_pct': 1 - float(self.poachers.alive[self.poachers.world == world].sum()) / poachers,
+            'animals_alive_pct': float(self.animals.alive[self.animals.world == world].sum()) / animals
+        }
+
+    def end_world(self, world, outcome):
+        self.world_outcomes[world] = outcome
+        self.world_running[world] = False
+        return
+
+    def end_extinct_worlds(self, arrays, index, outcome):
+        """End the worlds of the given agents if none of their agents is alive anymore"""
+        alive = np.bincount(arrays.world[arrays.alive], minlength=self.n_worlds)
+        for world in np.unique(arrays.world[index]):
+            if alive[world] == 0:
+                self.end_world(world, outcome)
+        return
+
+    def random_rows(self, world, draw):
+        """
+        Random values for a set of agents, drawn from the stream of the world of every agent, so the worlds of a batch
+        don't depend on each other
+        Args:
+            world: np.ndarray (n,), world index of every agent
+            draw: function (generator, size) -> np.ndarray with size rows
+        Returns:
+            np.ndarray with one row per agent, the rows of the agents of a world in the order of the agents
+        """
+        if self.n_worlds == 1:
+            return draw(self.rngs[0], len(world))
+        worlds, counts = np.unique(world, return_counts=True)
+        if len(worlds) == 0:
+            return draw(self.rngs[0], 0)
+        rows = np.concatenate([draw(self.rngs[w], n) for w, n in zip(worlds.tolist(), counts.tolist())])
+        values = np.empty_like(rows)
+        values[np.argsort(world, kind='stable')] = rows
+        return values
+
+    def world_index(self, arrays, index):
+        """World indexes of the given agents for neighbor_pairs, None for a single world"""
+        return arrays.world[index] if self.n_worlds > 1 else None
+
+    def active(self, arrays):
+        """Indices of the alive agents in the worlds stepped in this tick"""
+        if self.n_worlds == 1:
+            return np.flatnonzero(arrays.alive)
+        return np.flatnonzero(arrays.alive & self.stepping[arrays.world])
+
+    def handle_events(self):
+        """Apply kills, attacks and catches raised in the previous tick"""
+        if self.profiler is not None:
+            self.profiler.count('events_dispatched', len(self.pending_kills[0]) + len(self.pending_attacks[0])
+                                + len(self.pending_catches))
+
+        # Animals killed by poachers
+        animal_index, poacher_index = self.pending_kills
+        if len(animal_index):
+            if self.profiler is not None:
+                self.profiler.count('state_transitions', len(animal_index))
+            self.animals.state[animal_index] = TERMINAL
+            self.animals.alive[animal_index] = False
+            self.poacher_target[poacher_index] = -1
+            for a, p in zip(animal_index, poacher_index):
+                self.log(f"Poacher {self.poachers.names[p]} killed {self.animals.names[a]}")
+            self.end_extinct_worlds(self.animals, animal_index, "defeat")
+
+        # Poacher attacks on animals, health reaching zero kills the animal in the next tick
+        animal_index, poacher_index = self.pending_attacks
+        if len(animal_index):
+            np.subtract.at(self.animal_health, animal_index, POACHER_ATTACK_DAMAGE)
+            killed = self.animal_health[animal_index] <= 0
+            self.pending_kills = (animal_index[killed], poacher_index[killed])
+        else:
+            self.pending_kills = (np.empty(0, dtype=int), np.empty(0, dtype=int))
+
+        # Poachers caught by drones
+        if len(self.pending_catches):
+            caught = np.unique(self.pending_catches)
+            if self.profiler is not None:
+                self.profiler.count('state_transitions', len(caught))
+            self.poachers.state[caught] = TERMINAL
+            self.poachers.alive[caught] = False
+            for p in caught:
+                self.log(f"Drone caught poacher {self.poachers.names[p]}")
+            self.end_extinct_worlds(self.poachers, caught, "victory")
+        self.pending_catches = np.empty(0, dtype=int)
+        return
+
+    def update_animals(self):
+        """Sensing, state transitions and movement of all alive animals"""
+        animals = self.animals
+        index = self.active(animals)
+        if len(index) == 0:
+            return
+        position = animals.position[index]
+        scan_radius = animals.scan_radius()[index]
+        world = self.world_index(animals, index)
+
+        # Nearest poacher in sight is the threat
+        poacher_index = np.flatnonzero(self.poachers.alive)
+        nearest, nearest_distance = k_nearest(len(index), 1, *self.scan_pairs(
+            position, self.poachers.position[poacher_index], scan_radius,
+            world_a=world, world_b=self.world_index(self.poachers, poacher_index)))
+        threat = take_index(poacher_index, nearest[:, 0])
+        threat_distance = nearest_distance[:, 0]
+        self.animal_threat[self.stepping[animals.world]] = -1
+        self.animal_threat[index] = threat
+
+        # State transitions: flee from threats in threat range, otherwise idle
+        old_state = animals.state[index].copy()
+        fleeing = threat_distance < ANIMAL_THREAT_RANGE
+        animals.state[index] = np.where(fleeing, ANIMAL_FLEEING, ANIMAL_IDLE)
+        self.log_state_changes(animals, index, old_state)
+
+        # Herd of every animal: all other alive animals within scan range
+        i, j, distance = self.scan_pairs(position, position, scan_radius, world_a=world, world_b=world)
+        other = i != j
+        i, j, distance = i[other], j[other], distance[other]
+        herd_count = np.bincount(i, minlength=len(index))
+        self.animal_herd_size[index] = herd_count + 1
+        herd_sum = np.stack([np.bincount(i, position[j, 0], len(index)), np.bincount(i, position[j, 1], len(index))], axis=1)
+
+        # Separation force from close herd members, the closer another animal the stronger
+        close = (distance < ANIMAL_SEPARATION) & (distance > 0)
+        away = (position[i[close]] - position[j[close]]) / np.maximum(1, distance[close])[:, None]
+        separation = np.stack([np.bincount(i[close], away[:, 0], len(index)), np.bincount(i[close], away[:, 1], len(index))], axis=1)
+
+        # Idle animals graze randomly and stay with their herd
+        idle_state = STATE_OBJECTS[ANIMAL_IDLE]
+        direction = self.random_rows(animals.world[index], lambda rng, n: rng.integers(-1, 2, (n, 2))).astype(float)
+        with_herd = herd_count > 0
+        if with_herd.any():
+            cohesion = herd_sum[with_herd] / herd_count[with_herd, None] - position[with_herd]
+            length = np.hypot(cohesion[:, 0], cohesion[:, 1])
+            cohesion[length > 0] /= length[length > 0, None]
+            random_vector = self.random_rows(animals.world[index[with_herd]], lambda rng, n: rng.uniform(-1, 1, (n, 2)))
+            direction[with_herd] = (cohesion * idle_state.herd_cohesion
+                                    + separation[with_herd] * idle_state.separation_weight
+                                    + random_vector * idle_state.random_weight)
+
+        # Fleeing animals run away from the threat
+        if fleeing.any():
+            direction[fleeing] = position[fleeing] - self.poachers.position[threat[fleeing]]
+
+        animals.move_direction(index, direction, animals.speed()[index])
+        return
+
+    def update_poachers(self):
+        """Sensing, state transitions and actions of all alive poachers"""
+        poachers = self.poachers
+        index = self.active(poachers)
+        if len(index) == 0:
+            return
+        position = poachers.position[index]
+        animal_index = np.flatnonzero(self.animals.alive)
+
+        # Scan for animals, the animal in the smallest herd (the nearest of equal herds) is the new target
+        i, j, distance = self.scan_pairs(
+            position, self.animals.position[animal_index], poachers.scan_radius()[index],
+            world_a=self.world_index(poachers, index), world_b=self.world_index(self.animals, animal_index))
+        nearest, _ = k_nearest(len(index), MEMORY_SIZE + 1, i, j, distance)
+        sightings = take_index(animal_index, nearest)
+        detected = sightings[:, 0] >= 0
+        choice = np.full(len(index), -1)
+        if len(i):
+            order = np.lexsort((j, distance, self.animal_herd_size[animal_index[j]], i))
+            first = order[np.r_[True, i[order][1:] != i[order][:-1]]]
+            choice[i[first]] = animal_index[j[first]]
+
+        # Keep current target if one exists, lose it if nothing is in sight
+        target = self.poacher_target[index]
+        target = np.where(detected, np.where(target >= 0, target, choice), -1)
+        self.poacher_target[index] = target
+
+        # The other sightings are remembered, nearest and most recent first, older memories are pushed out
+        sightings = np.where(sightings == choice[:, None], -1, sightings)
+        memory = np.concatenate([sightings, self.poacher_memory[index]], axis=1)
+        order = np.argsort(memory < 0, axis=1, kind='stable')
+        memory = np.take_along_axis(memory, order, axis=1)[:, :MEMORY_SIZE]
+        self.poacher_memory[index] = np.where(detected[:, None], memory, self.poacher_memory[index])
+
+        # State transitions
+        old_state = poachers.state[index].copy()
+        has_target = target >= 0
+        target_position = self.animals.position[np.maximum(target, 0)]
+        target_distance = np.where(has_target, np.hypot(*(target_position - position).T), np.inf)
+        in_attack_range = target_distance < POACHER_ATTACK_RANGE
+        state = np.select(
+            [~has_target, old_state == POACHER_IDLE, in_attack_range],
+            [POACHER_IDLE, POACHER_HUNTING, POACHER_ATTACKING],
+            default=POACHER_HUNTING
+        ).astype(np.int8)
+        poachers.state[index] = state
+        self.log_state_changes(poachers, index, old_state)
+
+        # Reset state data of newly entered states
+        entered_idle = index[(state == POACHER_IDLE) & (old_state != POACHER_IDLE)]
+        self.poacher_search_time[entered_idle] = 0
+        self.poacher_direction_time[entered_idle] = 0
+        self.poacher_search_angle[entered_idle] = self.random_rows(poachers.world[entered_idle],
+                                                                   lambda rng, n: rng.integers(0, 361, n))
+        self.poacher_attack_time[index[(state == POACHER_ATTACKING) & (old_state != POACHER_ATTACKING)]] = 0
+
+        # Actions
+        idle = state == POACHER_IDLE
+        speed = poachers.speed()[index]
+        goal = target_position.copy()
+        towards = ~idle
+
+        # Idle poachers with memories move to the most recent sighting
+        remembered = idle & (self.poacher_memory[index, 0] >= 0)
+        if remembered.any():
+            goal[remembered] = self.animals.position[self.poacher_memory[index[remembered], 0]]
+            self.poacher_memory[index[remembered]] = np.concatenate(
+                [self.poacher_memory[index[remembered], 1:], np.full((remembered.sum(), 1), -1)], axis=1)
+            towards |= remembered
+
+        # Idle poachers without memories search in expanding circles
+        searching = idle & ~remembered
+        if searching.any():
+            search = index[searching]
+            self.poacher_search_time[search] += 1
+            self.poacher_direction_time[search] += 1
+            interval = STATE_OBJECTS[POACHER_IDLE].max_interval * (1 - 1 / np.log(1 + self.poacher_search_time[search] / 2))
+            change = self.poacher_direction_time[search] >= interval
+            self.poacher_search_angle[search[change]] = (self.poacher_search_angle[search[change]] + 45) % 360
+            self.poacher_direction_time[search[change]] = 0
+            angle = np.radians(self.poacher_search_angle[search])
+            poachers.move_direction(search, np.stack([np.cos(angle), np.sin(angle)], axis=1), speed[searching])
+
+        # Attacking poachers in kill range attack instead of moving
+        attacking = state == POACHER_ATTACKING
+        self.poacher_attack_time[index[attacking]] += 1
+        in_kill_range = attacking & (target_distance < POACHER_KILL_RANGE)
+        self.pending_attacks = (target[in_kill_range], index[in_kill_range])
+        towards &= ~in_kill_range
+
+        if towards.any():
+            poachers.move_towards(index[towards], goal[towards], speed[towards])
+        return
+
+    def update_drones(self, optimizer):
+        """Sensing of all drones, optimizer call and application of the drone actions"""
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.start()
+        drones = self.drones
+        scan_radius = drones.scan_radius()
+        drone_index = self.active(drones)
+        drone_world = self.world_index(drones, drone_index)
+
+        # Drones see all animals (also dead ones) in their scan range, every agent is sighted by the first drone seeing it
+        animal_sightings = first_sightings(len(self.animals), drone_index, *self.scan_pairs(
+            drones.position[drone_index], self.animals.position, scan_radius[drone_index],
+            world_a=drone_world, world_b=self.world_index(self.animals, slice(None)))[:2])
+
+        # Only drones in deep search can see poachers
+        poacher_index = np.flatnonzero(self.poachers.alive)
+        deep = drone_index[drones.state[drone_index] == DRONE_DEEP_SEARCH]
+        poacher_sightings = np.full(len(self.poachers), -1)
+        poacher_sightings[poacher_index] = first_sightings(len(poacher_index), deep, *self.scan_pairs(
+            drones.position[deep], self.poachers.position[poacher_index], scan_radius[deep],
+            world_a=self.world_index(drones, deep), world_b=self.world_index(self.poachers, poacher_index))[:2])
+
+        # Changes of the sightings since the last tick
+        self.detection_changes = []
+        new_animals, lost_animals = self.update_sightings(self.animal_sighted_by, self.animals, animal_sightings,
+                                                          DRONE_DETECTED_ANIMAL, DRONE_LOST_ANIMAL)
+        new_poachers, lost_poachers = self.update_sightings(self.poacher_sighted_by, self.poachers, poacher_sightings,
+                                                            DRONE_DETECTED_POACHER, DRONE_LOST_POACHER)
+
+        # Push current state to optimizer and get drone actions
+        detected_animal_index = np.flatnonzero(animal_sightings >= 0)
+        detected_poacher_index = np.flatnonzero(poacher_sightings >= 0)
+        if profiler is not None:
+            start = profiler.stop('drone_sensing', start)
+        if optimizer.optimizes_arrays:
+            # The optimizer gets the arrays directly, with the drones of the stepping worlds of a batch in one call
+            index = drone_index if self.n_worlds > 1 else np.arange(len(drones))
+            array_actions = optimizer.optimize_arrays(
+                [drones.names[i] for i in index], drones.position[index], drones.scan_range[index], drones.state[index],
+                drones.world[index], self.n_worlds, self.animals.position[detected_animal_index],
+                self.animals.scan_range[detected_animal_index], self.animals.world[detected_animal_index],
+                self.poachers.position[detected_poacher_index], self.poachers.world[detected_poacher_index])
+            drone_actions = None
+        elif optimizer.tracks_detections:
+            # The optimizer only gets the changes, a new optimizer, a restored world or a view of another world starts
+            # from all sightings
+            if self.n_worlds > 1:
+                raise ValueError("Optimizers that track detections can't optimize batches of worlds")
+            animal_views, poacher_views = self.animal_views, self.poacher_views
+            if self.detection_optimizer is not optimizer or optimizer.detection_view != self.detection_view:
+                optimizer.update_detections([animal_views[i] for i in detected_animal_index], [],
+                                            [poacher_views[i] for i in detected_poacher_index], [], reset=True)
+                self.detection_optimizer = optimizer
+                optimizer.detection_view = self.detection_view
+            elif len(new_animals) or len(lost_animals) or len(new_poachers) or len(lost_poachers):
+                optimizer.update_detections([animal_views[i] for i in new_animals], [animal_views[i] for i in lost_animals],
+                                            [poacher_views[i] for i in new_poachers], [poacher_views[i] for i in lost_poachers])
+            drone_actions = optimizer.optimize(self.drone_views, None, None)
+        elif self.n_worlds == 1:
+            drone_actions = optimizer.optimize(self.drone_views, [self.animal_views[i] for i in detected_animal_index],
+                                               [self.poacher_views[i] for i in detected_poacher_index])
+        else:
+            # One batched call with the agents of every stepping world
+            worlds = np.flatnonzero(self.stepping)
+            def split(views, arrays, index):
+                return [[views[i] for i in index[arrays.world[index] == world]] for world in worlds]
+            drone_actions = {}
+            for actions in optimizer.optimize_batch(split(self.drone_views, drones, drone_index),
+                                                    split(self.animal_views, self.animals, detected_animal_index),
+                                                    split(self.poacher_views, self.poachers, detected_poacher_index)):
+                drone_actions.update(actions)
+        if profiler is not None:
+            start = profiler.stop('optimizer', start)
+
+        # Optimizers can catch poachers themselves by posting events
+        caught = [event.poacher.index for event in self.event_bus.get(DRONE_CAUGHT_POACHER)]
+        self.pending_catches = np.append(self.pending_catches, np.array(caught, dtype=int))
+
+        # Collect actions in arrays
+        old_state = drones.state.copy()
+        direction = np.zeros((len(drones), 2))
+        speed_optimizer = np.zeros(len(drones))
+        acting = np.zeros(len(drones), dtype=bool)
+        if drone_actions is None:
+            direction[index], new_state, speed_optimizer[index] = array_actions
+            drones.state[index] = np.where(new_state >= 0, new_state, drones.state[index])
+            acting[index] = True
+        else:
+            for view, action in drone_actions.items():
+                if action['state']:
+                    drones.state[view.index] = action['state'].code
+                direction[view.index] = tuple(action['direction'])
+                speed_optimizer[view.index] = action['speed_modifier']
+                acting[view.index] = True
+        self.log_state_changes(drones, drone_index, old_state[drone_index])
+
+        # Closest detected poacher becomes the target
+        nearest, _ = k_nearest(len(drone_index), 1, *self.scan_pairs(
+            drones.position[drone_index], self.poachers.position[detected_poacher_index], drones.scan_radius()[drone_index],
+            world_a=drone_world, world_b=self.world_index(self.poachers, detected_poacher_index)))
+        self.drone_target[drone_index] = take_index(detected_poacher_index, nearest[:, 0])
+
+        # Move drones, speed is limited by the state
+        index = np.flatnonzero(acting)
+        speed = np.minimum(drones.base_speed * speed_optimizer, drones.speed())
+        drones.move_direction(index, direction[index], speed[index])
+
+        # Drones in deep search catch their target if in catch range
+        target = self.drone_target
+        catching = acting & (drones.state == DRONE_DEEP_SEARCH) & (target >= 0)
+        if catching.any():
+            distance = np.hypot(*(self.poachers.position[target[catching]] - drones.position[catching]).T)
+            caught = np.flatnonzero(catching)[distance < self.drone_catch_range[catching]]
+            self.pending_catches = np.append(self.pending_catches, target[caught])
+            self.drone_target[caught] = -1
+
+        if profiler is not None:
+            profiler.stop('drone_actions', start)
+        return
+
+
+class BatchWorld(ArrayWorld):
+    """
+    Batch of independent ArrayWorlds advanced in lockstep.
+    The agents of all worlds are stacked into the same arrays and every tick updates all running worlds with one
+    vectorized pass, the optimizer gets the drones of all worlds in one optimize_batch call.
+    Finished worlds stay frozen until the last world has finished.
+    Agent names get the world index as suffix, so optimizers can tell the drones of different worlds apart.
+    """
+
+    def __init__(self, scenarios=None, n_worlds=None, seed=None, event_log=None, log_transitions=False, max_steps=MAX_STEPS,
+                 profiler=None, map_size=(GAME_WIDTH, HEIGHT), recorder=None):
+        """
+        Args:
+            scenarios: list of (drones, animals, poachers) tuples (optional), one per world, each a list of (name, x, y) tuples
+            n_worlds: int (optional), number of worlds with the default scenario if no scenarios are given
+            seed: int or np.random.SeedSequence (optional), spawned into one random stream per world (see spawn_streams)
+            event_log: deque (optional), log of (message, ticks) tuples
+            log_transitions: bool, whether to log state changes
+            max_steps: int, number of steps after which the worlds end with a timeout
+            profiler: PhaseProfiler (optional), aggregates the phase times and counters over all worlds
+            map_size: tuple (width, height), boundaries of the map shared by all worlds
+            recorder: TrajectoryRecorder (optional), records the stacked agents of all worlds, the steps of the batch per tick
+        """
+        if scenarios is None:
+            scenarios = [(DEFAULT_DRONES, DEFAULT_ANIMALS, DEFAULT_POACHERS)] * (n_worlds or 1)
+        scenarios = [tuple([(f"{name} [{world}]", x, y) for name, x, y in agents] for agents in scenario)
+                     for world, scenario in enumerate(scenarios)]
+        self.setup(scenarios, spawn_streams(seed, len(scenarios)), event_log, log_transitions, max_steps, profiler, map_size,
+                   recorder)
+
+    @property
+    def steps(self):
+        return int(self.world_steps.max())
+
+    def run(self, optimizer):
+        """Step all worlds until the last one has finished, then end the batch of the optimizer and return the results"""
+        results = super().run(optimizer)
+        optimizer.end_batch()
+        return results
+
+    def results(self):
+        """Return the results of all worlds, each in the format of main.run"""
+        return [self.world_results(world) for world in range(self.n_worlds)]
@@ -0,0 +1,339 @@
+import numpy as np
+from vector import Vector2
+from agents import AgentGroup
+from optimizer import DroneOptimizer
+from states import DroneFastSearch, DroneDeepSearch
+
+# State classes of the drone actions by state code
+STATE_CLASSES = {DroneFastSearch.code: DroneFastSearch, DroneDeepSearch.code: DroneDeepSearch}
+
+class ArrayPSOOptimizer(DroneOptimizer):
+    """
+    Particle Swarm Optimization for drone control on NumPy arrays.
+    Drop-in replacement for PSOOptimizer: the particles of all drones are held in (drones, particles, 2) arrays
+    and the fitness of all particles is computed in one vectorized pass against all detected animals and poachers.
+    The fitness function, the velocity update and the altitude rules are the ones of PSOOptimizer. The swarm differs
+    from PSOOptimizer in three ways, with a single particle per drone and the same random numbers both optimizers take
+    the same actions:
+    - every particle keeps its own personal best, PSOOptimizer shares one best position among the particles of a drone
+    - all particles of a drone are updated synchronously from the bests at the start of the call, PSOOptimizer updates
+      them one after another and later particles already see the bests found by earlier ones
+    - the global best of a drone is the best personal best of the current call. PSOOptimizer keeps its global best
+      from the start, at the position of the first particle, until a particle scores higher
+    The fitness depends on the positions of the detected agents and on the state of the particle, so the personal
+    bests are rescored in every call. They are scored in the same vectorized pass as the particles, PSOOptimizer scores
+    every particle, its best and the global best in three separate calls.
+    ArrayWorld calls optimize_arrays with its position arrays, optimize and optimize_batch build the same arrays from
+    the agents. World passes only the changes of the detected agents, the optimizer keeps the detected agents in
+    detection order like the detected groups of World and reads their positions in optimize.
+    """
+
+    tracks_detections = True
+    optimizes_arrays = True
+
+    def __init__(self, particles_per_drone=20, w=0.5, c1=1.5, c2=1.5, map_width=800, map_height=600, max_velocity=5, seed=None):
+        self.particles_per_drone = particles_per_drone
+        self.w = w  # Inertia weight
+        self.c1 = c1  # Cognitive parameter
+        self.c2 = c2  # Social parameter
+        self.map_size = np.array([map_width, map_height], dtype=float)
+        self.max_velocity = max_velocity
+        self.rng = np.random.default_rng(seed)
+
+        # One row per drone, {drone_name: row}
+        self.rows = {}
+        shape = (0, particles_per_drone)
+        self.positions = np.empty(shape + (2,))
+        self.velocities = np.empty(shape + (2,))
+        self.last_positions = np.empty(shape + (2,))
+        self.has_last_position = np.empty(shape, dtype=bool)
+        self.stagnation_count = np.empty(shape, dtype=np.int64)
+        self.best_positions = np.empty(shape + (2,))
+        self.global_best = np.empty((0, 2))
+
+        # Detected agents kept from the changes passed to update_detections
+        self.detected_animals = AgentGroup()
+        self.detected_poachers = AgentGroup()
+
+    def set_rng(self, seed):
+        """Reseed the NumPy generator of the optimizer, see DroneOptimizer.set_rng"""
+        self.rng = np.random.default_rng(seed)
+
+    def initialize_particles(self, drones):
+        """Add rows for drones that are not initialized yet, returns the rows of all drones"""
+        return self.initialize_rows([drone.name for drone in drones])
+
+    def initialize_rows(self, names):
+        """Add rows for the drone names that are not initialized yet, returns the rows of all names"""
+        new_drones = [name for name in names if name not in self.rows]
+        if new_drones:
+            shape = (len(new_drones), self.particles_per_drone)
+            # Random positions in the game area
+            positions = self.rng.uniform(0, 1, shape + (2,)) * self.map_size
+            self.positions = np.concatenate([self.positions, positions])
+            self.velocities = np.concatenate([self.velocities, self.rng.uniform(-1, 1, shape + (2,))])
+            self.last_positions = np.concatenate([self.last_positions, np.zeros(shape + (2,))])
+            self.has_last_position = np.concatenate([self.has_last_position, np.zeros(shape, dtype=bool)])
+            self.stagnation_count = np.concatenate([self.stagnation_count, np.zeros(shape, dtype=np.int64)])
+
+            # Initialize best positions, the global best is chosen from the personal bests in every optimization
+            self.best_positions = np.concatenate([self.best_positions, positions])
+            self.global_best = np.concatenate([self.global_best, positions[:, 0]])
+
+            for name in new_drones:
+                self.rows[name] = len(self.rows)
+        return np.array([self.rows[name] for name in names], dtype=np.int64)
+
+    def calculate_fitness(self, positions, last_positions, has_last_position, stagnation_count, fast_search,
+                          animal_positions, animal_scan_ranges, animal_mask, poacher_positions, poacher_mask):
+        """
+        Fitness of positions, vectorized version of PSOOptimizer.calculate_fitness
+        Every drone is scored against the detected agents of its own world, padded to the same number per drone.
+        Drones in high altitude are only scored against the animals, drones in low altitude only against the poachers.
+        Args:
+            positions: np.ndarray (drones, n, 2), positions to score
+            last_positions: np.ndarray (drones, n, 2), last positions of the particles, for the tangential movement bonus
+            has_last_position: np.ndarray (drones, n), whether last_positions is set
+            stagnation_count: np.ndarray (drones, n), stagnation counts of the particles
+            fast_search: np.ndarray (drones,), whether the drone is in high altitude
+            animal_positions: np.ndarray (drones, animals, 2), positions of the detected animals
+            animal_scan_ranges: np.ndarray (drones, animals), scan ranges of the detected animals
+            animal_mask: np.ndarray (drones, animals), False for padding
+            poacher_positions: np.ndarray (drones, poachers, 2), positions of the detected poachers
+            poacher_mask: np.ndarray (drones, poachers), False for padding
+        Returns:
+            fitness: np.ndarray (drones, n)
+        """
+        fitness = np.zeros(positions.shape[:2])
+        stagnating = stagnation_count > 5
+        fast = np.flatnonzero(fast_search)
+        deep = np.flatnonzero(~fast_search)
+
+        # High altitude: search in a stable band around the detected animals
+        if len(fast):
+            fitness[fast] = 30.0
+            mask = animal_mask[fast]
+            if mask.any():
+                fitness[fast] += self.animal_fitness(positions[fast], last_positions[fast], has_last_position[fast],
+                                                     animal_positions[fast], animal_scan_ranges[fast], mask)
+                fitness[fast] -= np.where(stagnating[fast], 50 * mask.sum(axis=-1)[:, None], 0)
+
+        # Low altitude: monitor the detected poachers
+        if len(deep):
+            mask = poacher_mask[deep]
+            if mask.any():
+                dx, dy = components(poacher_positions[deep], positions[deep])
+                distance = np.sqrt(dx * dx + dy * dy)
+                distance += 1
+                score = np.divide(100, distance, out=distance)
+                if not mask.all():
+                    score *= mask[:, None]
+                fitness[deep] += score.sum(axis=-1)
+                fitness[deep] -= np.where(stagnating[deep], 20 * mask.sum(axis=-1)[:, None], 0)
+
+        return fitness
+
+    def animal_fitness(self, positions, last_positions, has_last_position, animal_positions, animal_scan_ranges, animal_mask):
+        """
+        Band and tangential movement terms of the high altitude fitness, see calculate_fitness.
+        The (drones, n, animals) terms are computed per coordinate and in place, they dominate the cost of the optimizer.
+        """
+        dx, dy = components(animal_positions, positions)  # Radial vectors from the positions to the animals
+        distance = dx * dx
+        distance += dy * dy
+        np.sqrt(distance, out=distance)
+        masked = not animal_mask.all()
+
+        # Target a stable band around the animals
+        band = np.abs(distance - (animal_scan_ranges * 1.1)[:, None])
+        in_band = band <= 10
+        if masked:
+            in_band &= animal_mask[:, None]
+        band += 1
+        np.divide(50, band, out=band)
+        band *= in_band
+        fitness = band.sum(axis=-1)
+
+        # Encourage tangential movement around the animals: 10 * (1 - |cosine|) per animal
+        move = positions - last_positions
+        move_length = np.sqrt((move ** 2).sum(axis=-1))
+        moving = has_last_position & (move_length > 0)
+        if moving.any():
+            move_direction = move / np.where(moving, move_length, 1)[..., None]
+            cosine = dx
+            cosine *= move_direction[..., 0, None]
+            dy *= move_direction[..., 1, None]
+            cosine += dy
+            cosine /= np.where(distance > 0, distance, 1)
+            tangential = np.abs(cosine, out=cosine)
+            np.subtract(1, tangential, out=tangential)
+            if masked:
+                tangential *= animal_mask[:, None]
+            fitness += np.where(moving, tangential.sum(axis=-1) * 10, 0)
+        return fitness
+
+    def update_detections(self, detected_animals, lost_animals, detected_poachers, lost_poachers, reset=False):
+        """Keep the detected agents from their changes, see DroneOptimizer.update_detections"""
+        if reset:
+            self.detected_animals.empty()
+            self.detected_poachers.empty()
+        self.detected_animals.remove(*lost_animals)
+        self.detected_poachers.remove(*lost_poachers)
+        self.detected_animals.add(*detected_animals)
+        self.detected_poachers.add(*detected_poachers)
+        return
+
+    def optimize(self, drones, detected_animals, detected_poachers):
+        # Worlds that passed the changes of the detected agents call optimize without them
+        if detected_animals is None:
+            detected_animals, detected_poachers = self.detected_animals, self.detected_poachers
+        return self.optimize_batch([drones], [detected_animals], [detected_poachers])[0]
+
+    def optimize_batch(self, drones, detected_animals, detected_poachers):
+        """Vectorized optimize for a batch of worlds, the particles of the drones of all worlds are updated in one pass"""
+        drones = [list(world) for world in drones]
+        detected_animals = [list(world) for world in detected_animals]
+        detected_poachers = [list(world) for world in detected_poachers]
+        all_drones = [drone for world in drones for drone in world]
+        if not all_drones:
+            return [{} for _ in drones]
+        animals = [animal for world in detected_animals for animal in world]
+        poachers = [poacher for world in detected_poachers for poacher in world]
+
+        def world_index(worlds):
+            return np.repeat(np.arange(len(worlds)), [len(world) for world in worlds])
+
+        def positions(agents):
+            return np.array([tuple(agent.position) for agent in agents], dtype=float).reshape(-1, 2)
+
+        drone_world = world_index(drones)
+        direction, state, speed_modifier = self.optimize_arrays(
+            [drone.name for drone in all_drones], positions(all_drones), np.array([drone.scan_range for drone in all_drones], dtype=float),
+            np.array([drone.active_state.code for drone in all_drones]), drone_world, len(drones),
+            positions(animals), np.array([animal.scan_range for animal in animals], dtype=float), world_index(detected_animals),
+            positions(poachers), world_index(detected_poachers))
+
+        drone_actions = [{} for _ in drones]
+        for index, drone in enumerate(all_drones):
+            drone_actions[drone_world[index]][drone] = {
+                'state': STATE_CLASSES[state[index]]() if state[index] >= 0 else None,
+                'direction': Vector2(*direction[index]),
+                'speed_modifier': float(speed_modifier[index])
+            }
+        return drone_actions
+
+    def optimize_arrays(self, names, drone_positions, drone_scan_ranges, drone_states, drone_world, n_worlds,
+                        animal_positions, animal_scan_ranges, animal_world, poacher_positions, poacher_world):
+        """Array version of optimize_batch, see DroneOptimizer.optimize_arrays"""
+        if len(names) == 0:
+            return np.zeros((0, 2)), np.zeros(0, dtype=int), np.zeros(0)
+        rows = self.initialize_rows(names)
+
+        # Detected agents of every world as padded arrays, indexed by the world of each drone
+        (animal_positions, animal_scan_ranges), animal_mask = padded_by_world(
+            (animal_positions, animal_scan_ranges), animal_world, n_worlds)
+        (poacher_positions,), poacher_mask = padded_by_world((poacher_positions,), poacher_world, n_worlds)
+        animal_positions, animal_scan_ranges, animal_mask = (animal_positions[drone_world], animal_scan_ranges[drone_world],
+                                                             animal_mask[drone_world])
+        fast_search = drone_states == DroneFastSearch.code
+
+        # Score the particles and their personal bests in one pass, both with the state of the particle
+        positions = self.positions[rows]
+        last_positions = self.last_positions[rows]
+        has_last_position = self.has_last_position[rows]
+        stagnation_count = self.stagnation_count[rows]
+        best_positions = self.best_positions[rows]
+        scored = np.concatenate([positions, best_positions], axis=1)
+        fitness = self.calculate_fitness(
+            scored, np.concatenate([last_positions, last_positions], axis=1),
+            np.concatenate([has_last_position, has_last_position], axis=1),
+            np.concatenate([stagnation_count, stagnation_count], axis=1), fast_search,
+            animal_positions, animal_scan_ranges, animal_mask, poacher_positions[drone_world], poacher_mask[drone_world])
+        particle_fitness, best_scores = np.split(fitness, 2, axis=1)
+
+        # Update personal bests
+        improved = particle_fitness > best_scores
+        best_positions = np.where(improved[..., None], positions, best_positions)
+        best_scores = np.where(improved, particle_fitness, best_scores)
+
+        # The global best of each drone is its best personal best, the first particle wins ties
+        best_particle = best_scores.argmax(axis=1)
+        global_best = best_positions[np.arange(len(rows)), best_particle]
+
+        # Update velocities and positions
+        r1 = self.rng.random(positions.shape[:2] + (1,))
+        r2 = self.rng.random(positions.shape[:2] + (1,))
+        cognitive = self.c1 * r1 * (best_positions - positions)
+        social = self.c2 * r2 * (global_best[:, None] - positions)
+        velocities = self.w * self.velocities[rows] + cognitive + social
+
+        # Limit velocity
+        speed = np.sqrt((velocities ** 2).sum(axis=-1, keepdims=True))
+        velocities = np.where(speed > self.max_velocity, velocities * (self.max_velocity / np.maximum(speed, 1e-12)), velocities)
+
+        # Keep within bounds
+        positions = np.clip(positions + velocities, 0, self.map_size)
+
+        # Track how long the particles have stayed in a similar position
+        moved = np.sqrt(((positions - last_positions) ** 2).sum(axis=-1))
+        stagnation_count = np.where(has_last_position & (moved < 5), stagnation_count + 1, 0)
+
+        # Store the new swarm state
+        self.positions[rows] = positions
+        self.velocities[rows] = velocities
+        self.last_positions[rows] = positions
+        self.has_last_position[rows] = True
+        self.stagnation_count[rows] = stagnation_count
+        self.best_positions[rows] = best_positions
+        self.global_best[rows] = global_best
+
+        # Drones move towards their global best, normalized like Vector2.normalize
+        direction = global_best - drone_positions
+        length = np.sqrt(direction[:, 0] * direction[:, 0] + direction[:, 1] * direction[:, 1])
+        direction = np.divide(direction, length[:, None], out=np.zeros_like(direction), where=length[:, None] > 0)
+
+        # Same altitude rules as PSOOptimizer: drones within the scan range of a detected animal of their world go to
+        # low altitude, otherwise they search in high altitude
+        dx, dy = components(animal_positions, drone_positions[:, None])
+        within_radius = (animal_mask & (np.sqrt(dx * dx + dy * dy)[:, 0] <= drone_scan_ranges[:, None])).any(axis=1)
+        state = np.where(within_radius, DroneDeepSearch.code, DroneFastSearch.code)
+        state = np.where(state == drone_states, -1, state)
+        return direction, state, np.ones(len(rows))
+
+
+def components(targets, positions):
+    """
+    Coordinates of the vectors from positions to targets, broadcast over all pairs of one drone
+    Args:
+        targets: np.ndarray (drones, targets, 2)
+        positions: np.ndarray (drones, n, 2)
+    Returns:
+        (dx, dy): np.ndarray (drones, n, targets) each
+    """
+    return (targets[:, None, :, 0] - positions[:, :, None, 0], targets[:, None, :, 1] - positions[:, :, None, 1])
+
+
+def padded_by_world(arrays, world, n_worlds):
+    """
+    Group the rows of arrays by world into arrays padded with zeros
+    Args:
+        arrays: tuple of np.ndarray with one row per agent
+        world: np.ndarray, world index of every agent
+        n_worlds: int, number of worlds
+    Returns:
+        padded: tuple of np.ndarray (n_worlds, most agents of a world, ...)
+        mask: np.ndarray (n_worlds, most agents of a world), False for padding
+    """
+    order = np.argsort(world, kind='stable')
+    world = world[order]
+    counts = np.bincount(world, minlength=n_worlds)
+    slot = np.arange(len(world)) - (np.cumsum(counts) - counts)[world]
+    longest = int(counts.max(initial=0))
+    mask = np.zeros((n_worlds, longest), dtype=bool)
+    mask[world, slot] = True
+    padded = []
+    for array in arrays:
+        values = np.zeros((n_worlds, longest) + array.shape[1:])
+        values[world, slot] = array[order]
+        padded.append(values)
+    return tuple(padded), mask
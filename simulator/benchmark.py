@@ -0,0 +1,166 @@
+# Scaling benchmark of the simulator tick
+# Runs main.run(headless=True) for growing scenario sizes at fixed seeds with every optimizer and engine
+# and reports ticks per second, wall time per episode, peak memory and the scaling exponent of the tick time.
+# The scenarios are generated herds on a map that grows with the number of agents, at the density of a default
+# generated scenario (Scenario.generate), so larger sizes measure more agents rather than a more crowded map.
+# Results are printed and written as JSON, so runs before and after a change can be compared.
+#
+# Usage: python benchmark.py [--sizes 30 100 1000] [--ticks 50] [--optimizers pso array_pso rl] [--engines objects array]
+#                            [--output benchmark.json]
+
+import argparse
+import json
+import platform
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+from settings import GAME_WIDTH, HEIGHT
+from main import run
+from scenario import Scenario
+from pso_optimizer import PSOOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+from rl_optimizer import RLOptimizer
+
+DEFAULT_SIZES = [30, 100, 300, 1000, 3000, 10000, 30000]
+DEFAULT_AGENTS = sum(len(agents) for agents in Scenario.generate())  # Agents of a default generated scenario on the default map
+HERD_SIZE = 8
+OPTIMIZERS = {
+    'pso': PSOOptimizer,
+    'array_pso': ArrayPSOOptimizer,
+    'rl': RLOptimizer
+}
+
+
+def make_scenario(n_agents, seed):
+    """
+    Generated scenario with n_agents agents: 5% drones and 5% poachers (at least 2 each), the rest animals in herds of
+    HERD_SIZE. The map keeps the aspect ratio of the default map and the agent density of Scenario.generate.
+    Args:
+        n_agents: int, total number of agents, the animals are rounded down to whole herds
+        seed: int, seed of the placement
+    Returns:
+        scenario: Scenario, as taken by main.run
+    """
+    n_drones = max(2, n_agents // 20)
+    n_poachers = max(2, n_agents // 20)
+    n_herds = max(1, (n_agents - n_drones - n_poachers) // HERD_SIZE)
+    scale = max(1.0, math.sqrt(n_agents / DEFAULT_AGENTS))
+    return Scenario.generate(n_herds=n_herds, herd_size=HERD_SIZE, n_poachers=n_poachers, n_drones=n_drones,
+                             map_width=GAME_WIDTH * scale, map_height=HEIGHT * scale, seed=seed)
+
+
+def run_episode(optimizer_name, engine, scenario, ticks, seed, measure_memory=False):
+    """
+    Run one seeded headless episode of at most the given number of ticks
+    Returns:
+        result: dict, results of main.run with the wall time and optionally the peak memory in bytes
+    """
+    optimizer = OPTIMIZERS[optimizer_name](map_width=scenario.map_width, map_height=scenario.map_height)
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = run(optimizer, headless=True, engine=engine, scenario=scenario, max_steps=ticks, seed=seed)
+    result['wall_time'] = time.perf_counter() - start
+    if measure_memory:
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def scaling_exponent(sizes, tick_times):
+    """Slope of log(time per tick) over log(number of agents), 1 means linear scaling"""
+    if len(sizes) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(tick_times), 1)[0])
+
+
+def benchmark(sizes=DEFAULT_SIZES, ticks=50, optimizers=('pso', 'array_pso', 'rl'), engines=('objects', 'array'), seed=0,
+              repeats=1, memory=True, time_limit=60):
+    """
+    Benchmark all combinations of optimizer and engine over the scenario sizes
+    Args:
+        sizes: list of int, total number of agents per scenario
+        ticks: int, maximal number of ticks per episode, episodes can end earlier
+        optimizers: names of the optimizers in OPTIMIZERS
+        engines: engines of main.run
+        seed: int, seed of the scenarios and episodes
+        repeats: int, number of timed episodes per configuration, the fastest counts
+        memory: bool, measure the peak memory with tracemalloc in an extra episode (tracemalloc slows down the run)
+        time_limit: float, larger sizes are skipped once an episode of a combination took longer (seconds)
+    Returns:
+        report: dict with the configuration, one entry per episode configuration and the scaling exponents
+    """
+    results = []
+    scaling = {}
+    for optimizer_name in optimizers:
+        for engine in engines:
+            measured_sizes, tick_times = [], []
+            for size in sizes:
+                scenario = make_scenario(size, seed)
+                episodes = [run_episode(optimizer_name, engine, scenario, ticks, seed) for _ in range(repeats)]
+                fastest = min(episodes, key=lambda episode: episode['wall_time'])
+                entry = {
+                    'optimizer': optimizer_name,
+                    'engine': engine,
+                    'agents': size,
+                    'drones': len(scenario.drones),
+                    'animals': len(scenario.animals),
+                    'poachers': len(scenario.poachers),
+                    'map_size': list(scenario.map_size),
+                    'ticks': fastest['steps'],
+                    'outcome': fastest['outcome'],
+                    'wall_time': fastest['wall_time'],
+                    'ticks_per_sec': fastest['steps'] / fastest['wall_time'],
+                    'peak_memory': None
+                }
+                if memory:
+                    entry['peak_memory'] = run_episode(optimizer_name, engine, scenario, ticks, seed, measure_memory=True)['peak_memory']
+                results.append(entry)
+                measured_sizes.append(size)
+                tick_times.append(fastest['wall_time'] / fastest['steps'])
+                print(f"{optimizer_name:>9} {engine:>7} {size:>6} agents: {entry['ticks_per_sec']:9.1f} ticks/s, "
+                      f"{entry['wall_time']:7.2f} s" + (f", {entry['peak_memory'] / 2**20:8.1f} MiB peak" if memory else ""))
+                if fastest['wall_time'] > time_limit:
+                    print(f"{optimizer_name:>9} {engine:>7}: skipping larger sizes, episode took longer than {time_limit} s")
+                    break
+            scaling[f"{optimizer_name}/{engine}"] = scaling_exponent(measured_sizes, tick_times)
+
+    for combination, exponent in scaling.items():
+        print(f"Scaling exponent {combination}: {exponent:.2f}" if exponent is not None else f"Scaling exponent {combination}: -")
+
+    return {
+        'config': {
+            'sizes': list(sizes),
+            'ticks': ticks,
+            'seed': seed,
+            'repeats': repeats,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results,
+        'scaling_exponents': scaling
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the simulator tick")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="total number of agents per scenario")
+    parser.add_argument('--ticks', type=int, default=50, help="maximal number of ticks per episode")
+    parser.add_argument('--optimizers', nargs='+', default=list(OPTIMIZERS), choices=list(OPTIMIZERS))
+    parser.add_argument('--engines', nargs='+', default=['objects', 'array'], choices=['objects', 'array'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=1, help="timed episodes per configuration, the fastest counts")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc episode")
+    parser.add_argument('--time-limit', type=float, default=60, help="skip larger sizes after an episode took longer (seconds)")
+    parser.add_argument('--output', default='benchmark.json', help="JSON file for the results")
+    args = parser.parse_args()
+
+    report = benchmark(args.sizes, args.ticks, args.optimizers, args.engines, args.seed, args.repeats,
+                       not args.no_memory, args.time_limit)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,121 @@
+# Training checkpoints
+# A checkpoint stores a model as a compressed .npz file of NumPy arrays plus a JSON header with the format version and
+# the scalars of the model. Files are written to a temporary file, synced and renamed, so a checkpoint is either
+# complete or missing, even if training is killed while saving.
+# Checkpoints are versioned by the number of the last finished run (checkpoint-000120.npz) and the newest ones are kept.
+# On resume the newest checkpoint that can be read completely is used, damaged files are skipped.
+
+import os
+import json
+import zipfile
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_PREFIX = 'checkpoint-'
+
+
+def write_checkpoint(filename, arrays, header):
+    """
+    Atomically write a checkpoint file
+    Args:
+        filename: str, file of the checkpoint
+        arrays: dict {name: np.ndarray}
+        header: dict, JSON serializable scalars, stored with the format version
+    """
+    temporary = filename + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez_compressed(f, header=json.dumps({'version': CHECKPOINT_VERSION, **header}), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, filename)
+    return
+
+
+def read_checkpoint(filename):
+    """
+    Read a checkpoint file completely, every array is checked against the checksum of the file
+    Args:
+        filename: str, file written by write_checkpoint
+    Returns:
+        (arrays, header): dict {name: np.ndarray} and dict
+    Raises:
+        ValueError: if the file is damaged or of an unknown version
+    """
+    try:
+        with np.load(filename) as data:
+            arrays = {name: data[name] for name in data.files}
+        header = json.loads(str(arrays.pop('header')))
+    except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile) as error:
+        raise ValueError(f"Damaged checkpoint {filename}: {error}") from error
+    if header.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint {filename} has version {header.get('version')}, expected {CHECKPOINT_VERSION}")
+    return arrays, header
+
+
+class Checkpoints:
+    def __init__(self, directory, every=10, keep=3):
+        """
+        Args:
+            directory: str, directory of the checkpoints, created if missing
+            every: int, number of finished runs between checkpoints
+            keep: int, number of newest checkpoints kept
+        """
+        self.directory = directory
+        self.every = every
+        self.keep = keep
+        self.runs_since_save = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, run):
+        return os.path.join(self.directory, f"{CHECKPOINT_PREFIX}{run:06d}.npz")
+
+    def runs(self):
+        """Run numbers of the checkpoints in the directory, newest first"""
+        runs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(CHECKPOINT_PREFIX) and name.endswith('.npz'):
+                runs.append(int(name[len(CHECKPOINT_PREFIX):-len('.npz')]))
+        return sorted(runs, reverse=True)
+
+    def save(self, optimizer, run):
+        """
+        Checkpoint an optimizer and delete the checkpoints beyond the newest keep
+        Args:
+            optimizer: RLOptimizer, provides checkpoint_data
+            run: int, number of the last finished run
+        """
+        arrays, header = optimizer.checkpoint_data()
+        write_checkpoint(self.filename(run), arrays, {**header, 'run': run})
+        for old_run in self.runs()[self.keep:]:
+            os.remove(self.filename(old_run))
+        self.runs_since_save = 0
+        return
+
+    def update(self, optimizer, run, finished=1):
+        """Count finished runs and checkpoint when the cadence is reached"""
+        self.runs_since_save += finished
+        if self.runs_since_save >= self.every:
+            self.save(optimizer, run)
+        return
+
+    def restore_latest(self, optimizer):
+        """
+        Restore an optimizer from the newest readable checkpoint
+        Returns:
+            int, number of the last run of the checkpoint, None if there is no readable checkpoint
+        """
+        for run in self.runs():
+            try:
+                arrays, header = read_checkpoint(self.filename(run))
+            except ValueError as error:
+                print(f"Skipping checkpoint: {error}")
+                continue
+            optimizer.restore_checkpoint_data(arrays, header)
+            return header['run']
+        return None
+
+    def clear(self):
+        """Delete all checkpoints, e.g. when a new training starts"""
+        for run in self.runs():
+            os.remove(self.filename(run))
+        return
@@ -0,0 +1,114 @@
+# In-process event bus for simulation events
+# Replaces the global pygame event queue for the events defined in events.py. Every world owns its own bus,
+# so several simulations can run in one process without sharing events.
+# Events posted while the current events are handled are delivered with the next dispatch() or get(),
+# the same way main.run handled events posted to the pygame queue.
+# Events are typed: every event type has exactly two agents, named by events.EVENT_FIELDS and stored in fixed slots
+# instead of a dict. Handlers are registered per event type and called with both agents once per tick by dispatch(),
+# dispatched events are recycled for later posts, so handling an attack or a catch allocates nothing.
+
+from collections import defaultdict
+
+from events import EVENT_FIELDS
+
+
+class Event:
+    """Simulation event with the same interface as pygame.event.Event (type, dict and attributes named by the fields)"""
+    __slots__ = ('type', 'agent', 'other')
+
+    def __init__(self, type, dict=None, **data):
+        data = dict if dict is not None else data
+        first, second = EVENT_FIELDS[type]
+        self.type = type
+        self.agent = data.get(first)
+        self.other = data.get(second)
+
+    def __getattr__(self, name):
+        # Access event data by field name, like pygame events
+        fields = EVENT_FIELDS[object.__getattribute__(self, 'type')]
+        if name == fields[0]:
+            return self.agent
+        if name == fields[1]:
+            return self.other
+        raise AttributeError(name)
+
+    @property
+    def dict(self):
+        first, second = EVENT_FIELDS[self.type]
+        return {first: self.agent, second: self.other}
+
+    def __repr__(self):
+        return f"Event({self.type}, {self.dict})"
+
+
+class EventBus:
+    def __init__(self):
+        self.queue = []
+        self.handlers = defaultdict(list)  # {type: [handler(agent, other)]}
+        self.pool = []  # Dispatched events, reused by emit
+
+    def __len__(self):
+        return len(self.queue)
+
+    def subscribe(self, type, handler):
+        """
+        Register a handler called by dispatch for every event of a type, in the order of subscription
+        Args:
+            type: int, event type from events.py
+            handler: callable(agent, other), called with the agents of the event in the order of events.EVENT_FIELDS
+        """
+        self.handlers[type].append(handler)
+        return
+
+    def emit(self, type, agent, other):
+        """
+        Post an event with its agents in the order of events.EVENT_FIELDS, e.g. emit(ANIMAL_KILLED, animal, poacher)
+        """
+        event = self.pool.pop() if self.pool else Event.__new__(Event)
+        event.type, event.agent, event.other = type, agent, other
+        self.queue.append(event)
+        return
+
+    def post(self, type, **data):
+        """
+        Post an event to the bus.
+        Args:
+            type: int, event type from events.py
+            data: event data, e.g. animal=..., poacher=...
+        """
+        first, second = EVENT_FIELDS[type]
+        self.emit(type, data.get(first), data.get(second))
+        return
+
+    def dispatch(self):
+        """
+        Call the handlers of all queued events in posting order, events posted by handlers stay queued for the next tick
+        Returns:
+            int, number of dispatched events
+        """
+        events, self.queue = self.queue, []
+        handlers = self.handlers
+        for event in events:
+            for handler in handlers.get(event.type, ()):
+                handler(event.agent, event.other)
+        self.pool.extend(events)
+        return len(events)
+
+    def get(self, type=None):
+        """
+        Remove and return queued events without calling handlers, the events are not reused.
+        Args:
+            type: int (optional), only return events of this type, others stay queued
+        Returns:
+            events: list of Event in posting order
+        """
+        if type is None:
+            events, self.queue = self.queue, []
+            return events
+        events = [event for event in self.queue if event.type == type]
+        self.queue = [event for event in self.queue if event.type != type]
+        return events
+
+    def clear(self):
+        self.queue = []
+        return
@@ -1,20 +1,29 @@
-# Definition of pygame events
-
-import pygame
+# Definition of simulation events
+# Events are posted to the EventBus of a world (see event_bus.py) and don't depend on pygame
 
 # Define custom events for communication between agents
 # Poacher attacks an animal (event data: animal, poacher)
-POACHER_ATTACK_ANIMAL = pygame.USEREVENT + 7
+POACHER_ATTACK_ANIMAL = 7
 # Animal has been killed by a poacher (event data: animal, poacher)
-ANIMAL_KILLED = pygame.USEREVENT + 1
-# 2. Drone has detected a poacher
-DRONE_DETECTED_POACHER = pygame.USEREVENT + 2
-# 3. Drone has caught a poacher
-DRONE_CAUGHT_POACHER = pygame.USEREVENT + 3
-# 4. Drone has detected an animal
-DRONE_DETECTED_ANIMAL = pygame.USEREVENT + 4
-# 5. Drone has lost track of poacher
-DRONE_LOST_POACHER = pygame.USEREVENT + 5
-# 6. Drone has lost track of animal
-DRONE_LOST_ANIMAL = pygame.USEREVENT + 6
-    
+ANIMAL_KILLED = 1
+# 2. Drone has detected a poacher (event data: poacher, drone)
+DRONE_DETECTED_POACHER = 2
+# 3. Drone has caught a poacher (event data: poacher, drone)
+DRONE_CAUGHT_POACHER = 3
+# 4. Drone has detected an animal (event data: animal, drone)
+DRONE_DETECTED_ANIMAL = 4
+# 5. Drone has lost track of poacher (event data: poacher, drone)
+DRONE_LOST_POACHER = 5
+# 6. Drone has lost track of animal (event data: animal, drone)
+DRONE_LOST_ANIMAL = 6
+
+# Names of the two agents of every event type, stored in the agent and other slots of event_bus.Event
+EVENT_FIELDS = {
+    POACHER_ATTACK_ANIMAL: ('animal', 'poacher'),
+    ANIMAL_KILLED: ('animal', 'poacher'),
+    DRONE_DETECTED_POACHER: ('poacher', 'drone'),
+    DRONE_CAUGHT_POACHER: ('poacher', 'drone'),
+    DRONE_DETECTED_ANIMAL: ('animal', 'drone'),
+    DRONE_LOST_POACHER: ('poacher', 'drone'),
+    DRONE_LOST_ANIMAL: ('animal', 'drone')
+}
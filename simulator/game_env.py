@@ -1,100 +1,234 @@
 # handles additional rendering of the game environment, including the information panel and end simulation screen.
 
+from collections import OrderedDict
+
 import pygame
-from settings import WIDTH, HEIGHT
-
-def render_info_panel(screen, drones, animals, poachers, event_log, panel_rect):
-    """Render the information panel showing agent states and details"""
-    # Fill panel background with a slightly lighter color
-    pygame.draw.rect(screen, (50, 50, 50), panel_rect)
-    pygame.draw.line(screen, (100, 100, 100), (panel_rect.left, 0), (panel_rect.left, HEIGHT), 2)
-    # Set fonts
-    font = pygame.font.SysFont('Arial', 16)
-    title_font = pygame.font.SysFont('Arial', 20, bold=True)
-
-    # Panel title
-    title = title_font.render("Agent Information", True, (255, 255, 255))
-    screen.blit(title, (panel_rect.left + 10, 10))
-    
-    y_offset = 50  # Starting y position for text
-    table_width = panel_rect.width - 20
-    
-    # Helper function to render a table
-    def render_table(title_text, headers, data, row_height=25):
-        nonlocal y_offset
-        
-        # Render section title
-        section_title = title_font.render(title_text, True, (255, 255, 255))
-        screen.blit(section_title, (panel_rect.left + 10, y_offset))
-        y_offset += 30
-        
-        if not data:
-            empty_text = font.render(f"No {title_text.lower()} active", True, (200, 200, 200))
-            screen.blit(empty_text, (panel_rect.left + 20, y_offset))
-            y_offset += 30
-            return
-        
-        # Calculate column widths
-        col_widths = [table_width // len(headers)] * len(headers)
-
-        # Render headers
-        for i, header in enumerate(headers):
-            x_pos = panel_rect.left + 10 + sum(col_widths[:i])
-            header_text = font.render(header, True, (200, 200, 200))
-            screen.blit(header_text, (x_pos, y_offset))
-        
-        y_offset += row_height
-        
-        # Draw header separator line
-        pygame.draw.line(screen, (150, 150, 150), 
-                            (panel_rect.left + 10, y_offset - 5), 
-                            (panel_rect.left + 10 + table_width, y_offset - 5), 1)
-        
-        # Render data rows
-        for row_data in data:
-            for i, cell in enumerate(row_data):
-                x_pos = panel_rect.left + 10 + sum(col_widths[:i])
-                cell_text = font.render(str(cell), True, (255, 255, 255))
-                screen.blit(cell_text, (x_pos, y_offset))
-            y_offset += row_height
-        
-        y_offset += 15  # Add space after table
 
-    
-    # Render drone table
-    drone_data = [(drone.name, drone.active_state.__class__.__name__) for drone in drones]
-    render_table("Drones", ["Name", "State"], drone_data)
-    
-    # Render animal table
-    animal_data = [(animal.name, 
-                   animal.active_state.__class__.__name__,
-                   'Yes' if hasattr(animal, 'threat') and animal.threat else 'None') 
-                  for animal in animals]
-    render_table("Animals", ["Name", "State", "Threat"], animal_data)
-    
-    # Render poacher table
-    poacher_data = [(poacher.name,
-                    poacher.active_state.__class__.__name__,
-                    'Yes' if hasattr(poacher, 'target') and poacher.target else 'None')
-                   for poacher in poachers]
-    render_table("Poachers", ["Name", "State", "Target"], poacher_data)
-
-        
-    # Add event log section
-    if event_log:
-        y_offset += 20  # Add space between previous content and event log
-        
-        # Event log title
-        title_text = title_font.render("Event log", True, (255, 255, 255))
-        screen.blit(title_text, (panel_rect.x + 10, panel_rect.y + y_offset))
-        y_offset += 30
-        
-        # Display events (newest at the top)
-        for event_text, timestamp in list(event_log)[-10:]:  # Show last 10 events
-            time_str = f"{timestamp//1000:02d}:{(timestamp%1000)//10:02d}"  # Format as MM:SS
-            log_entry = font.render(f"{time_str} - {event_text}", True, (200, 200, 200))
-            screen.blit(log_entry, (panel_rect.x + 10, panel_rect.y + y_offset))
-            y_offset += 20
+
+class AgentSprite(pygame.sprite.Sprite):
+    """Pygame sprite rendering an agent, only created when a display exists"""
+    images = {}  # {color: Surface}, shared by all sprites of a color so large worlds don't need a surface per agent
+
+    def __init__(self, agent):
+        super().__init__()
+        self.agent = agent
+        if agent.color not in AgentSprite.images:
+            image = pygame.Surface((10, 10))
+            image.fill(agent.color)
+            AgentSprite.images[agent.color] = image
+        self.image = AgentSprite.images[agent.color]
+        self.rect = self.image.get_rect(center=tuple(agent.position))
+
+    def update(self):
+        # Follow the position of the agent
+        self.rect.center = tuple(self.agent.position)
+
+class InfoPanel:
+    """
+    Information panel showing agent states and the event log, rendered incrementally.
+    The panel is laid out as lines (titles, table headers, table rows, log entries). Only lines whose position or
+    contents changed since the last frame are cleared and redrawn, rendered texts are reused from an LRU cache and
+    lines below the panel are skipped. render returns the dirty rectangles for pygame.display.update.
+    """
+    background = (50, 50, 50)
+
+    def __init__(self, panel_rect, cache_size=1024):
+        """
+        Args:
+            panel_rect: pygame.Rect, area of the screen covered by the panel
+            cache_size: int, maximal number of rendered texts kept in the cache
+        """
+        self.panel_rect = panel_rect
+        self.fonts = {
+            'text': pygame.font.SysFont('Arial', 16),
+            'title': pygame.font.SysFont('Arial', 20, bold=True)
+        }
+        self.text_cache = OrderedDict()  # {(text, font, color): Surface}, least recently used first
+        self.cache_size = cache_size
+        self.lines = []  # Lines drawn in the last frame, (y, kind, content, height) tuples
+        self.initialized = False
+
+    def text(self, text, font, color):
+        """Rendered text surface, cached by (text, font, color)"""
+        key = (text, font, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = self.fonts[font].render(text, True, color)
+            self.text_cache[key] = surface
+            if len(self.text_cache) > self.cache_size:
+                self.text_cache.popitem(last=False)
+        else:
+            self.text_cache.move_to_end(key)
+        return surface
+
+    def layout(self, drones, animals, poachers, event_log):
+        """
+        Lines of the panel from top to bottom
+        Returns:
+            lines: list of (y, kind, content, height) tuples
+        """
+        lines = []
+        y_offset = 50  # Starting y position below the panel title
+
+        def add(kind, content, height):
+            nonlocal y_offset
+            lines.append((y_offset, kind, content, height))
+            y_offset += height
+
+        def table(title_text, headers, data):
+            nonlocal y_offset
+            add('title', title_text, 30)
+            if not data:
+                add('empty', f"No {title_text.lower()} active", 30)
+                return
+            add('header', tuple(headers), 25)
+            for row_data in data:
+                add('row', row_data, 25)
+            y_offset += 15  # Add space after table
+
+        table("Drones", ["Name", "State"], [(drone.name, drone.active_state.__class__.__name__) for drone in drones])
+        table("Animals", ["Name", "State", "Threat"],
+              [(animal.name, animal.active_state.__class__.__name__, 'Yes' if getattr(animal, 'threat', None) else 'None')
+               for animal in animals])
+        table("Poachers", ["Name", "State", "Target"],
+              [(poacher.name, poacher.active_state.__class__.__name__, 'Yes' if getattr(poacher, 'target', None) else 'None')
+               for poacher in poachers])
+
+        # Event log, last 10 events
+        if event_log:
+            y_offset += 20  # Add space between previous content and event log
+            add('title', "Event log", 30)
+            for event_text, timestamp in list(event_log)[-10:]:
+                time_str = f"{timestamp//1000:02d}:{(timestamp%1000)//10:02d}"  # Format as MM:SS
+                add('log', f"{time_str} - {event_text}", 20)
+        return lines
+
+    def line_rect(self, y, height):
+        # Lines span the panel right of its border line
+        return pygame.Rect(self.panel_rect.left + 2, self.panel_rect.top + y, self.panel_rect.width - 2, height).clip(self.panel_rect)
+
+    def draw_line(self, screen, y, kind, content):
+        left, top = self.panel_rect.left, self.panel_rect.top + y
+        if kind == 'title':
+            screen.blit(self.text(content, 'title', (255, 255, 255)), (left + 10, top))
+        elif kind == 'empty':
+            screen.blit(self.text(content, 'text', (200, 200, 200)), (left + 20, top))
+        elif kind == 'log':
+            screen.blit(self.text(content, 'text', (200, 200, 200)), (left + 10, top))
+        else:
+            # Table headers and rows, columns of equal width
+            table_width = self.panel_rect.width - 20
+            col_width = table_width // len(content)
+            color = (200, 200, 200) if kind == 'header' else (255, 255, 255)
+            for i, cell in enumerate(content):
+                screen.blit(self.text(str(cell), 'text', color), (left + 10 + i * col_width, top))
+            if kind == 'header':
+                # Header separator line
+                pygame.draw.line(screen, (150, 150, 150), (left + 10, top + 20), (left + 10 + table_width, top + 20), 1)
+
+    def render(self, screen, drones, animals, poachers, event_log):
+        """
+        Redraw the changed lines of the panel
+        Returns:
+            dirty_rects: list of pygame.Rect, areas of the screen changed by the panel
+        """
+        dirty_rects = []
+        if not self.initialized:
+            # Background, border and title are drawn once
+            pygame.draw.rect(screen, self.background, self.panel_rect)
+            screen.blit(self.text("Agent Information", 'title', (255, 255, 255)), (self.panel_rect.left + 10, self.panel_rect.top + 10))
+            dirty_rects.append(self.panel_rect.copy())
+            self.initialized = True
+
+        # The border line is shared with the game area, which is redrawn every frame
+        dirty_rects.append(pygame.draw.line(screen, (100, 100, 100), (self.panel_rect.left, 0),
+                                            (self.panel_rect.left, self.panel_rect.bottom), 2))
+
+        # Lines below the panel are not visible
+        visible = self.panel_rect.height
+        lines = [line for line in self.layout(drones, animals, poachers, event_log) if line[0] < visible]
+        new_lines = set(lines)
+
+        # Clear the lines of the last frame that moved, changed or disappeared
+        cleared = []
+        for y, kind, content, height in self.lines:
+            if (y, kind, content, height) not in new_lines:
+                rect = self.line_rect(y, height)
+                screen.fill(self.background, rect)
+                cleared.append(rect)
+
+        # Draw new lines and unchanged lines overlapping a cleared area
+        old_lines = set(self.lines)
+        for line in lines:
+            y, kind, content, height = line
+            rect = self.line_rect(y, height)
+            if line in old_lines and rect.collidelist(cleared) < 0:
+                continue
+            screen.fill(self.background, rect)
+            self.draw_line(screen, y, kind, content)
+            dirty_rects.append(rect)
+        dirty_rects.extend(cleared)
+
+        self.lines = lines
+        return dirty_rects
+
+
+class ScanRangeOverlay:
+    """
+    Translucent rings showing the scan ranges of the agents.
+    One ring surface is rendered per (color, radius) combination, radii only change with the scan_range_modifier of a
+    state, so every frame just blits the cached rings in one batch instead of drawing circles.
+    """
+
+    def __init__(self, game_rect):
+        """
+        Args:
+            game_rect: pygame.Rect, game area of the screen, rings are clipped to it
+        """
+        self.game_rect = game_rect
+        self.rings = {}  # {(color, radius): (Surface, offset of the center)}
+
+    def ring(self, color, radius):
+        """Cached ring surface and the offset of its center"""
+        key = (color, radius)
+        if key not in self.rings:
+            offset = int(radius) + 1
+            surface = pygame.Surface((2 * offset + 1, 2 * offset + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surface, (*color, 50), (offset, offset), radius, width=1)  # Agent color with 50 alpha
+            # Run-length encoding skips the transparent inside of the ring when blitting
+            surface.set_alpha(255, pygame.RLEACCEL)
+            self.rings[key] = (surface, offset)
+        return self.rings[key]
+
+    def draw(self, screen, agents):
+        """Blit the scan range rings of the given agents"""
+        rings = []
+        for agent in agents:
+            surface, offset = self.ring(agent.color, agent.scan_range * agent.active_state.scan_range_modifier)
+            rings.append((surface, (int(agent.position.x) - offset, int(agent.position.y) - offset)))
+        screen.blits(rings, doreturn=False)
+
+
+def render_frame(screen, scan_overlay, all_sprites, drones, animals, poachers, event_log, info_panel):
+    """
+    Render the game area with agents and their scan ranges and the information panel
+    Returns:
+        dirty_rects: list of pygame.Rect, changed areas of the screen to pass to pygame.display.update
+    """
+    game_rect = scan_overlay.game_rect
+    screen.set_clip(game_rect)  # Agents at the border must not draw over the panel
+    screen.fill((30, 30, 30), game_rect)  # Fill the game area with background color
+
+    # Draw the game elements
+    all_sprites.update()
+    all_sprites.draw(screen)
+
+    # Draw scan ranges for each agent on top
+    scan_overlay.draw(screen, (sprite.agent for sprite in all_sprites))
+    screen.set_clip(None)
+
+    # Render information panel, only its changed lines are redrawn
+    return [game_rect] + info_panel.render(screen, drones, animals, poachers, event_log)
 
 
 def end_simulation(screen, type, info):
@@ -103,8 +237,9 @@ def end_simulation(screen, type, info):
     # Clear previous events to prevent stacking
     pygame.event.clear()
 
-    # Create a semi-transparent dark overlay
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    # Create a semi-transparent dark overlay, the screen grows with the map of the scenario
+    width, height = screen.get_size()
+    overlay = pygame.Surface((width, height), pygame.SRCALPHA)
     overlay.fill((0, 0, 0, 150))
     screen.blit(overlay, (0, 0))
     
@@ -115,21 +250,21 @@ def end_simulation(screen, type, info):
     if type == "Victory":
         # Display victory message in center of screen
         victory_text = msg_font.render("VICTORY! All poachers have been caught", True, (255, 255, 255))
-        victory_rect = victory_text.get_rect(center=(WIDTH//2, HEIGHT//2))
+        victory_rect = victory_text.get_rect(center=(width//2, height//2))
         screen.blit(victory_text, victory_rect)
 
     elif type == "Defeat":
         # Display defeat message in center of screen
         defeat_text = msg_font.render("DEFEAT! All animals have been killed", True, (255, 0, 0))
-        defeat_rect = defeat_text.get_rect(center=(WIDTH//2, HEIGHT//2))
+        defeat_rect = defeat_text.get_rect(center=(width//2, height//2))
         screen.blit(defeat_text, defeat_rect)
 
     # Add instruction to continue
     insights_text = instr_font.render(f"Poachers caught: {info['poachers'] * 100}%, Animals still alive: {info['animals'] * 100}%, Time taken: {pygame.time.get_ticks()}ms", True, (200, 200, 200))
-    insights_rect = insights_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 50))
+    insights_rect = insights_text.get_rect(center=(width//2, height//2 + 50))
     screen.blit(insights_text, insights_rect)   
     continue_text = instr_font.render("Press any key to exit", True, (200, 200, 200))
-    continue_rect = continue_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 100))
+    continue_rect = continue_text.get_rect(center=(width//2, height//2 + 100))
     screen.blit(continue_text, continue_rect)   
     
     pygame.display.flip()
@@ -0,0 +1,302 @@
+# Incremental herd clustering
+# Herds are the connected groups of alive animals: two animals are linked when they are closer than the link range and
+# a herd is a connected component of the links, kept in a union-find structure. The links of an animal are updated
+# right after it moved. New links merge two herds at once, broken links only mark the herd as dirty, dirty herds are
+# split once per tick in refresh.
+# The links are found in candidate sets instead of a spatial query per move: every animal has an anchor, its position
+# when its candidates were last found, and the candidates of two animals contain each other while their anchors are
+# closer than the link range plus a skin. Animals are re-anchored once they moved more than half the skin away from
+# their anchor, so two animals closer than the link range always have anchors closer than the link range plus the
+# skin and the links are exact.
+# Every herd keeps its members, its size and the sum of the member positions, moves update the sum by the offset of the
+# animal, so the center of a herd is an O(1) lookup. refresh recomputes the sums of the herds that changed since the
+# last refresh exactly with math.fsum, so they don't drift and a restored world continues bit-exactly: fsum is
+# correctly rounded, the sum of an unchanged herd is the fsum of its current positions in any order. Animals also keep
+# the set of linked animals closer than the close range, which is all the separation force of AnimalIdle needs.
+
+import math
+
+from spatial_index import SpatialGrid
+from settings import ANIMAL_SCAN_RANGE, ANIMAL_SEPARATION
+
+
+class HerdTracker:
+    def __init__(self, link_range=ANIMAL_SCAN_RANGE, close_range=ANIMAL_SEPARATION, skin=None):
+        """
+        Args:
+            link_range: float, animals closer than this belong to the same herd
+            close_range: float, animals closer than this are kept as close neighbors, at most link_range
+            skin: float (optional), margin of the candidate sets, with a larger skin animals are re-anchored less
+                often but have more candidates, defaults to half the link range
+        """
+        self.link_range = link_range
+        self.close_range = close_range
+        self.skin = link_range / 2 if skin is None else skin
+        self.anchors = {}  # {animal: (x, y)}, position of the animal when its candidates were found
+        self.candidates = {}  # {animal: set of animals with anchors closer than link_range + skin}
+        self.parent = {}  # {animal: parent animal}, roots are their own parent
+        self.members = {}  # {root: list of animals}
+        self.sums = {}  # {root: [x, y]}, sum of the member positions
+        self.positions = {}  # {animal: (x, y)}, position of the animal at its last update
+        self.neighbors = {}  # {animal: set of linked animals}
+        self.close = {}  # {animal: set of linked animals closer than close_range}
+        self.dirty = set()  # Roots of herds with broken links or removed members
+        self.changed = set()  # Animals in herds whose sums changed since the last refresh
+        self.removed = []  # Removed animals still kept in the union-find until the next refresh
+
+    def __len__(self):
+        """Number of herds"""
+        return len(self.members)
+
+    def __contains__(self, animal):
+        return animal in self.positions
+
+    def rebuild(self, animals):
+        """
+        Build the herds from scratch, e.g. for a new or restored world
+        Args:
+            animals: iterable of alive animals
+        """
+        self.parent.clear()
+        self.members.clear()
+        self.sums.clear()
+        self.positions.clear()
+        self.neighbors.clear()
+        self.close.clear()
+        self.dirty.clear()
+        self.changed.clear()
+        self.removed.clear()
+        animals = list(animals)
+        for animal in animals:
+            self.parent[animal] = animal
+            self.members[animal] = [animal]
+            self.sums[animal] = [animal.position.x, animal.position.y]
+            self.positions[animal] = (animal.position.x, animal.position.y)
+            self.neighbors[animal] = set()
+            self.close[animal] = set()
+        self.anchors = dict(self.positions)
+        self.candidates = {animal: set() for animal in animals}
+        index = SpatialGrid(cell_size=self.link_range)
+        index.rebuild(animals)
+        for animal in animals:
+            self.anchor(animal, index)
+        for animal in animals:
+            self.link(animal, index)
+        self.refresh()
+        return
+
+    def find(self, animal):
+        """Root of the herd of an animal"""
+        parent = self.parent
+        while parent[animal] is not animal:
+            parent[animal] = parent[parent[animal]]  # Path halving
+            animal = parent[animal]
+        return animal
+
+    def union(self, a, b):
+        """Merge the herds of two linked animals, the larger herd absorbs the smaller one"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a is root_b:
+            return
+        if len(self.members[root_a]) < len(self.members[root_b]):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.members[root_a].extend(self.members.pop(root_b))
+        sum_a, sum_b = self.sums[root_a], self.sums.pop(root_b)
+        sum_a[0] += sum_b[0]
+        sum_a[1] += sum_b[1]
+        self.changed.add(root_a)
+        if root_b in self.dirty:
+            self.dirty.discard(root_b)
+            self.dirty.add(root_a)
+        return
+
+    def anchor(self, animal, index):
+        """
+        Anchor an animal at its current position and find its candidates
+        Args:
+            animal: Animal, tracked animal
+            index: SpatialGrid, index over the alive animals at their current positions
+        """
+        x, y = self.positions[animal]
+        radius = self.link_range + self.skin
+        squared_radius = radius * radius
+        anchors = self.anchors
+        anchors[animal] = (x, y)
+
+        # The other animals are at most half the skin away from their anchors
+        candidates = set()
+        for other in index.query((x, y), radius + self.skin / 2, ordered=False):
+            anchor = anchors.get(other)
+            if anchor is None or other is animal:
+                continue
+            dx, dy = anchor[0] - x, anchor[1] - y
+            if dx * dx + dy * dy < squared_radius:
+                candidates.add(other)
+
+        # Candidates are symmetric
+        old_candidates = self.candidates[animal]
+        for other in old_candidates - candidates:
+            self.candidates[other].discard(animal)
+        for other in candidates - old_candidates:
+            self.candidates[other].add(animal)
+        self.candidates[animal] = candidates
+        return
+
+    def link(self, animal, index):
+        """
+        Update the links of an animal at its current position
+        Args:
+            animal: Animal, tracked animal
+            index: SpatialGrid, index over the alive animals at their current positions
+        """
+        x, y = self.positions[animal]
+        link_range, close_range = self.link_range * self.link_range, self.close_range * self.close_range
+        neighbors, close = set(), set()
+        get_position, add_neighbor, add_close = self.positions.get, neighbors.add, close.add
+        for other in self.candidates[animal]:
+            # The tracked positions are the current ones, only the moving animal is updated at a time
+            position = get_position(other)
+            if position is None:
+                continue
+            dx, dy = position[0] - x, position[1] - y
+            distance = dx * dx + dy * dy  # Squared, compared with the squared ranges
+            if distance < link_range:
+                add_neighbor(other)
+                if distance < close_range:
+                    add_close(other)
+
+        # Links are symmetric, update the other side as well, most links don't change from one move to the next
+        # New links are merged in the order of the index, so the herd sums are added up reproducibly
+        old_neighbors, old_close = self.neighbors[animal], self.close[animal]
+        if neighbors != old_neighbors:
+            new_neighbors = neighbors - old_neighbors
+            if new_neighbors:
+                for other in sorted(new_neighbors, key=index.order.__getitem__):
+                    self.neighbors[other].add(animal)
+                    self.union(animal, other)
+            lost_neighbors = old_neighbors - neighbors
+            if lost_neighbors:
+                for other in lost_neighbors:
+                    self.neighbors[other].discard(animal)
+                self.dirty.add(self.find(animal))
+            self.neighbors[animal] = neighbors
+        if close != old_close:
+            for other in old_close - close:
+                self.close[other].discard(animal)
+            for other in close - old_close:
+                self.close[other].add(animal)
+            self.close[animal] = close
+        return
+
+    def update(self, animal, index):
+        """
+        Update the herds after an animal moved
+        Args:
+            animal: Animal, tracked animal at its new position
+            index: SpatialGrid, index over the alive animals, already updated to the new position
+        """
+        x, y = animal.position.x, animal.position.y
+        old_x, old_y = self.positions[animal]
+        if x != old_x or y != old_y:
+            herd_sum = self.sums[self.find(animal)]
+            herd_sum[0] += x - old_x
+            herd_sum[1] += y - old_y
+            self.positions[animal] = (x, y)
+            self.changed.add(animal)
+
+            # Re-anchor once the animal moved more than half the skin
+            anchor_x, anchor_y = self.anchors[animal]
+            dx, dy = x - anchor_x, y - anchor_y
+            if 4 * (dx * dx + dy * dy) > self.skin * self.skin:
+                self.anchor(animal, index)
+        self.link(animal, index)
+        return
+
+    def remove(self, animal):
+        """Remove an animal, e.g. when it was killed. Its herd is split in the next refresh."""
+        if animal not in self.positions:
+            return
+        for other in self.neighbors.pop(animal):
+            self.neighbors[other].discard(animal)
+        for other in self.close.pop(animal):
+            self.close[other].discard(animal)
+        for other in self.candidates.pop(animal):
+            self.candidates[other].discard(animal)
+        del self.anchors[animal]
+        root = self.find(animal)
+        self.members[root].remove(animal)
+        x, y = self.positions.pop(animal)
+        herd_sum = self.sums[root]
+        herd_sum[0] -= x
+        herd_sum[1] -= y
+        self.dirty.add(root)
+        self.removed.append(animal)  # Other members may still point to the animal until the herd is split
+        return
+
+    def refresh(self):
+        """Split the dirty herds into their connected components and recompute the position sums of changed herds exactly"""
+        # Herds that are split get new sums anyway
+        changed = {self.find(animal) for animal in self.changed} - self.dirty
+        self.changed.clear()
+        for root in self.dirty:
+            members = self.members.pop(root)
+            del self.sums[root]
+            for animal in members:
+                del self.parent[animal]
+
+            # Every connected component of the old herd becomes a herd
+            for animal in members:
+                if animal in self.parent:
+                    continue
+                self.parent[animal] = animal
+                component = [animal]
+                for member in component:
+                    for other in self.neighbors[member]:
+                        if other not in self.parent:
+                            self.parent[other] = animal
+                            component.append(other)
+                self.members[animal] = component
+                changed.add(animal)
+        self.dirty.clear()
+        for animal in self.removed:
+            del self.parent[animal]
+        self.removed.clear()
+
+        positions = self.positions
+        for root in changed:
+            members = self.members[root]
+            self.sums[root] = [math.fsum(positions[animal][0] for animal in members),
+                               math.fsum(positions[animal][1] for animal in members)]
+        return
+
+    def size(self, animal):
+        """Number of animals in the herd of an animal, including the animal"""
+        return len(self.members[self.find(animal)])
+
+    def herd(self, animal):
+        """Animals of the herd of an animal, including the animal"""
+        return self.members[self.find(animal)]
+
+    def center(self, animal, exclude=True):
+        """
+        Center of the herd of an animal
+        Args:
+            animal: Animal, tracked animal
+            exclude: bool, center of the other members, as the cohesion of AnimalIdle uses it
+        Returns:
+            (x, y) tuple, None if the animal is alone
+        """
+        root = self.find(animal)
+        size = len(self.members[root])
+        x, y = self.sums[root]
+        if exclude:
+            if size == 1:
+                return None
+            x, y = x - self.positions[animal][0], y - self.positions[animal][1]
+            size -= 1
+        return (x / size, y / size)
+
+    def sizes(self):
+        """Sizes of all herds, largest first"""
+        return sorted((len(members) for members in self.members.values()), reverse=True)
@@ -2,333 +2,392 @@
 # Call this script to start the simulator
 # Eventhandling
 
+import os
 import sys
-import pygame
-from collections import deque
+import time
+import glob
 import pickle
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-from settings import WIDTH, GAME_WIDTH, PANEL_WIDTH, HEIGHT, FPS
-from game_env import render_info_panel, end_simulation
-from events import POACHER_ATTACK_ANIMAL, ANIMAL_KILLED, DRONE_DETECTED_POACHER, DRONE_CAUGHT_POACHER, DRONE_DETECTED_ANIMAL, DRONE_LOST_POACHER, DRONE_LOST_ANIMAL
-from agents import Drone, Animal, Poacher
-from states import Terminal, DroneFastSearch, DroneDeepSearch
+from settings import GAME_WIDTH, PANEL_WIDTH, HEIGHT, RENDER_FPS
+from world import World, MAX_STEPS
 from pso_optimizer import PSOOptimizer
 from rl_optimizer import RLOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+from array_engine import ArrayWorld, BatchWorld
+from profiler import PhaseProfiler
+from recorder import TrajectoryRecorder
+from scenario import Scenario
+from results_log import ResultsLog, add_result
+from checkpoint import Checkpoints
+from random_stream import spawn_streams
 
 
 # Main game loop
-def run(optimizer=None, headless=False):
-    """Main function to run the simulation"""
-    
-    # Pygame setup if headless without display
-    if not headless:
-        # Initialize pygame
-        pygame.init()
-        # Set up the display
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("Wildlife Protection Simulator")
-        # Set up the clock for controlling frame rate
-        clock = pygame.time.Clock()
-        # Create rectangle for panel
-        panel_rect = pygame.Rect(GAME_WIDTH, 0, PANEL_WIDTH, HEIGHT)
-        # Create a transparent surface to visualize the scan range of agents
-        transparent_surface = pygame.Surface((GAME_WIDTH, HEIGHT), pygame.SRCALPHA)
-        # Initialize fonts
-        pygame.font.init()
-    else:
-        # Initialize pygame without display
-        pygame.init()
-        screen = pygame.Surface((WIDTH, HEIGHT))
+def run(optimizer=None, headless=False, engine='objects', scenario=None, max_steps=MAX_STEPS, profile=False, profile_file=None,
+        speed=1, seed=None, record=None, herding='components'):
+    """
+    Main function to run the simulation
+    Args:
+        optimizer: DroneOptimizer (optional), controls the drones, defaults to PSOOptimizer
+        headless: bool, run without display, pygame is neither initialized nor used
+        engine: str, 'objects' for the agent object loop or 'array' for the vectorized ArrayWorld
+        scenario: Scenario or tuple (optional), (drones, animals, poachers) lists of (name, x, y) tuples, defaults to the
+                  default scenario, a Scenario also sets the map size
+        max_steps: int, number of steps after which the simulation ends with a timeout
+        profile: bool, time the phases of every tick and add the report as 'profile' to the results
+        profile_file: str (optional), file to write the profile report to as JSON, enables profiling
+        speed: float or None, initial simulation speed of the display as multiple of FPS steps per second, None for max
+               speed, changed at runtime with the keys of playback.Playback
+        seed: int (optional), seed of the episode, the world and the optimizer get independent streams spawned from it,
+              None seeds the world freshly and leaves the stream of the optimizer as it is
+        record: str (optional), directory to record the trajectory of the episode to, loaded with recorder.Trajectory
+        herding: str, objects engine only: 'components' for herds tracked as connected groups or 'neighbors' (see World)
+    """
+    # Tuples describe agents on the default map
+    scenario = scenario or Scenario()
+    map_width, map_height = scenario.map_size if isinstance(scenario, Scenario) else (GAME_WIDTH, HEIGHT)
 
-    
     # Load default optimizer if none is provided
     if optimizer is None:
-        optimizer = PSOOptimizer()
+        optimizer = PSOOptimizer(map_width=map_width, map_height=map_height)
     # Check if provided optimizer is correct instance
-    elif isinstance(optimizer, PSOOptimizer) or isinstance(optimizer, RLOptimizer):
+    elif isinstance(optimizer, (PSOOptimizer, ArrayPSOOptimizer, RLOptimizer)):
         pass
     else:
         raise ValueError(f"Unknown optimizer: {optimizer}")
-    
-    # Track simulation progress
-    simulation_steps = 0
-    outcome = None
-    
-    # Event log for displaying recent events (max 15 events)
-    event_log = deque(maxlen=15)
-    event_log.append(("Simulation started", pygame.time.get_ticks()))
 
-    # Create agents
-    drones = [Drone('good boy1', 100, 100), Drone('good boy2', 700, 100), Drone('good boy3', 100, 400)]
-    animals = [Animal('elephant1', 400, 300), Animal('elephant2', 410, 300), Animal('elephant3', 400, 310), Animal('elephant4', 410, 310), 
-               Animal('giraffe1', 700, 300), Animal('giraffe2', 710, 300), Animal('giraffe3', 700, 300), Animal('giraffe4', 710, 310)]
-    poachers = [Poacher('bad boy1', 400, 500), Poacher('bad boy2', 650, 500)]
+    # Independent random streams of the world and the optimizer, equal seeds give equal episodes
+    world_seed, optimizer_seed = spawn_streams(seed, 2)
+    if seed is not None:
+        optimizer.set_rng(optimizer_seed)
 
-    all_sprites = pygame.sprite.Group(drones + animals + poachers)
-    
-    # Handle agents in separate groups for easier access
-    animals_sprites = pygame.sprite.Group(animals)
-    poachers_sprites = pygame.sprite.Group(poachers)
-    drones_sprites = pygame.sprite.Group(drones)
-
-    # Track alive agents seperately,
-    # if any of these alive groups is empty, the game is over
-    alive_animal_sprites = pygame.sprite.Group(animals)
-    alive_poacher_sprites = pygame.sprite.Group(poachers)
-    
-    # Handle drone search globally since drones can communicate
-    detected_animal_sprites = pygame.sprite.Group()
-    detected_poacher_sprites = pygame.sprite.Group()
-
-    # Main loop
-    running = True
-    while running:
-        simulation_steps += 1
-        
-        # Early termination to prevent hanging
-        if simulation_steps > 2000:
-            outcome = "timeout"
-            running = False
+    # Profiling is opt-in, without a profiler the worlds skip all measurements
+    profiler = PhaseProfiler() if profile or profile_file else None
+    # Recording is opt-in as well
+    recorder = TrajectoryRecorder(record) if record else None
 
-        # Event handling
-        for event in pygame.event.get():
+    # Create the world
+    if engine == 'objects':
+        world = World(*scenario, log_transitions=not headless, max_steps=max_steps, profiler=profiler,
+                      map_size=(map_width, map_height), seed=world_seed, recorder=recorder, herding=herding)
+    elif engine == 'array':
+        world = ArrayWorld(*scenario, seed=world_seed, log_transitions=not headless, max_steps=max_steps,
+                           profiler=profiler, map_size=(map_width, map_height), recorder=recorder)
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    # Headless runs only step the simulation core
+    if headless:
+        return finish_results(world.run(optimizer), profiler, profile_file, recorder)
+
+    # Pygame is only imported when a display is used, headless runs don't pay its startup
+    import pygame
+    from game_env import AgentSprite, InfoPanel, ScanRangeOverlay, render_frame, end_simulation
+    from playback import Playback
 
-            # Pygame quit event
+    # Initialize pygame
+    pygame.init()
+    # Set up the display, the game area has the size of the map
+    screen = pygame.display.set_mode((map_width + PANEL_WIDTH, map_height))
+    # Playback controls, the simulation speed is independent of the frame rate
+    playback = Playback(speed)
+    pygame.display.set_caption(f"Wildlife Protection Simulator - {playback.label()}")
+    # Set up the clock for controlling frame rate
+    clock = pygame.time.Clock()
+    # Create rectangle for panel
+    panel_rect = pygame.Rect(map_width, 0, PANEL_WIDTH, map_height)
+    # Create the overlay visualizing the scan range of agents
+    scan_overlay = ScanRangeOverlay(pygame.Rect(0, 0, map_width, map_height))
+    # Initialize fonts, the panel creates its fonts once
+    pygame.font.init()
+    info_panel = InfoPanel(panel_rect)
+
+    # Sprites for rendering the agents
+    all_sprites = pygame.sprite.Group([AgentSprite(agent) for agent in world.all_agents()])
+
+    # Main loop, one iteration per rendered frame
+    elapsed = 0.0
+    while world.running:
+        if profiler is not None:
+            start = profiler.start()
+
+        # Pygame quit event & playback controls
+        for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
-                break
-            
-            # animal attacked by poacher
-            if event.type == POACHER_ATTACK_ANIMAL:
-                animal = event.dict['animal']
-                poacher = event.dict['poacher']
-                
-                # Reduce animal health
-                animal.health -= poacher.attack_damage
-                
-                # if animal is dead, post animal killed event
-                if animal.health <= 0:
-                    pygame.event.post(pygame.event.Event(ANIMAL_KILLED, animal=animal, poacher=poacher))
-            
-            # animal killed event
-            if event.type == ANIMAL_KILLED:
-                animal = event.dict['animal']
-                poacher = event.dict['poacher']
-                
-                # Set animal to terminal state & remove from alive sprites
-                animal.set_state(Terminal())
-                alive_animal_sprites.remove(animal)
-                
-                # Delete target from poacher
-                poacher.target = None
-                
-                # Log the event
-                event_log.append((f"Poacher {poacher.name} killed {animal.name}", pygame.time.get_ticks()))
-                
-                # Check if all animals are dead to end the game
-                if len(alive_animal_sprites) == 0:
-                    outcome = "defeat"
-                    if not headless:
-                        end_simulation(screen, "Defeat", {"poachers": 1 - len(alive_poacher_sprites) / len(poachers_sprites), "animals": len(alive_animal_sprites) / len(animals_sprites)})
-                    running = False
-                    continue  # Skip the rest of the loop since the game is over
-                
-            # poacher caught by drone
-            if event.type == DRONE_CAUGHT_POACHER:
-                poacher = event.dict['poacher']
-                
-                # Set poacher to terminal state & remove from alive sprites
-                poacher.set_state(Terminal())
-                alive_poacher_sprites.remove(poacher)
-                
-                # Log the event
-                event_log.append((f"Drone caught poacher {poacher.name}", pygame.time.get_ticks()))
-                
-                # End simulation if all poachers are caught
-                if len(alive_poacher_sprites) == 0:
-                    outcome = "victory"
-                    if not headless:
-                        end_simulation(screen, "Victory", {"poachers": 1 - len(alive_poacher_sprites) / len(poachers_sprites), "animals": len(alive_animal_sprites) / len(animals_sprites)})
-                    running = False
-                    continue  # Skip the rest of the loop since the game is over
-                
-        # Update animals
-        for animal in alive_animal_sprites:
-
-            # Scan surroundings for poachers
-            detected_poacher = animal.scan_surroundings(agents=alive_poacher_sprites, mode='nearest')
-
-            # Update threat
-            animal.threat = detected_poacher[2] if detected_poacher else None
-            
-            # Update my current herd
-            animal.herd = [a[2] for a in animal.scan_surroundings(agents=alive_animal_sprites, mode='all')]
-            
-            # Check state transitions
-            state = animal.active_state.check_transition()
-            if state:
-                animal.set_state(state)
-                event_log.append((f"{animal.name} changed state to {state.__class__.__name__}", pygame.time.get_ticks()))
-            
-            # Perform the action of the current state
-            animal.active_state.action()
+                world.running = False
+            elif event.type == pygame.KEYDOWN and playback.handle_key(event.key):
+                pygame.display.set_caption(f"Wildlife Protection Simulator - {playback.label()}")
+        if profiler is not None:
+            profiler.stop('pygame_events', start)
 
-        # Update poachers
-        for poacher in alive_poacher_sprites:
-            
-            # Scan surroundings for the closest animal
-            detected_agents = poacher.scan_surroundings(agents=alive_animal_sprites, mode='all')
-
-            if detected_agents:
-                # Update target if one is found and there is no current target
-                target = detected_agents.pop()[2]
-                poacher.target = target if poacher.target is None else poacher.target
-                
-                # Update memory of animal sightings with the closest animals
-                temp_agents = sorted(detected_agents, key=lambda x: x[0], reverse=True) # Sort by distance
-                for _, _, agent in temp_agents:
-                    new_memory = ('animal', agent.position)
-                    poacher.memory.appendleft(new_memory)
-            
-            else:
-                poacher.target = None
-            
-            # Check state transitions
-            state = poacher.active_state.check_transition()
-            if state:
-                poacher.set_state(state)
-                event_log.append((f"{poacher.name} changed state to {state.__class__.__name__}", pygame.time.get_ticks()))
-
-            # Perform the action of the current state
-            poacher.active_state.action()
-
-        # Update drones
-        # 1. Update current sightings of animals and poachers
-        detected_animal_sprites.empty()
-        detected_poacher_sprites.empty()
-        
-        for drone in drones_sprites:
-            # Scan surroundings for animals & add to detected
-            detected_agents = drone.scan_surroundings(agents=animals_sprites, mode='all')
-            for (_, _, agent) in detected_agents:
-                detected_animal_sprites.add(agent)
-            
-            # If drone state is Low Altitude, also check for poachers & add to detected
-            if isinstance(drone.active_state, DroneDeepSearch):
-                detected_agents = drone.scan_surroundings(agents=alive_poacher_sprites, mode='all')
-                for (_, _, agent) in detected_agents:
-                    detected_poacher_sprites.add(agent)
-            
-        # 2. Push current state to optimizer and get drone actions
-        drone_actions = optimizer.optimize(drones_sprites, detected_animal_sprites, detected_poacher_sprites)
-        
-        # Apply drone actions
-        for drone, action in drone_actions.items():
-            # Update drone state if needed
-            if action['state']:
-                drone.set_state(action['state'])
-                event_log.append((f"{drone.name} changed state to {action['state'].__class__.__name__}", pygame.time.get_ticks()))
-            
-            # Set closest poacher as target to catch
-            poacher = drone.scan_surroundings(agents=detected_poacher_sprites, mode='nearest')
-            drone.target = poacher[2] if poacher else None
-            
-            # Perform state action with given parameters
-            drone.active_state.action(action['direction'], action['speed_modifier'])
+        # Advance the simulation by the steps due in this frame
+        steps = None if playback.skip_to_end else playback.steps_due(elapsed)
+        if steps is None:
+            # Max speed: step until the time of the frame is used up
+            deadline = time.perf_counter() + playback.frame_budget()
+            while world.running and time.perf_counter() < deadline:
+                world.step(optimizer)
+        else:
+            for _ in range(steps):
+                if not world.running:
+                    break
+                world.step(optimizer)
+
+        # Skipping to the end only renders the last frame
+        if playback.skip_to_end and world.running:
+            elapsed = clock.tick() / 1000
+            continue
 
-            
         # Update screen
-        if not headless:
-            clock.tick(FPS)
-            screen.fill((30, 30, 30))  # Fill the entire screen with background color
-            
-            # Draw the game area
-            # Clear the transparent surface
-            transparent_surface.fill((0, 0, 0, 0))  # Completely transparent
-        
-            # Draw scan ranges for each agent type
-            for agent in all_sprites:
-                # Draw a circle on the transparent surface
-                pygame.draw.circle(
-                    surface=transparent_surface,
-                    color=(*agent.image.get_at((5, 5))[:3], 50),  # Get agent color with 50 alpha
-                    center=(int(agent.position.x), int(agent.position.y)),
-                    radius=agent.scan_range * agent.active_state.scan_range_modifier,  # Scan range
-                    width=1  # Line width
-                )
-
-            # Draw the game elements
-            all_sprites.draw(screen)
-
-            # Blit the transparent surface on top
-            screen.blit(transparent_surface, (0, 0))
-            
-            # Render information panel
-            render_info_panel(screen, drones_sprites, alive_animal_sprites, 
-                            alive_poacher_sprites, event_log, panel_rect)
-        
-            pygame.display.flip()
-    
-    # Close pygame if not headless
-    if not headless:
-        pygame.quit()
-        
+        if profiler is not None:
+            start = profiler.start()
+        drones, animals, poachers = world.agents_by_type()
+        dirty_rects = render_frame(screen, scan_overlay, all_sprites, drones, animals, poachers, world.event_log, info_panel)
+        pygame.display.update(dirty_rects)
+        if profiler is not None:
+            start = profiler.stop('render', start)
+
+        # Cap the frame rate
+        elapsed = clock.tick(RENDER_FPS) / 1000
+        if profiler is not None:
+            profiler.stop('frame_wait', start)
+
+    # Show end screen if the game is over
+    results = world.results()
+    if world.outcome in ("victory", "defeat"):
+        end_simulation(screen, world.outcome.capitalize(), {"poachers": results['poachers_caught_pct'], "animals": results['animals_alive_pct']})
+
+    # Close pygame
+    pygame.quit()
+
     # return simulation results for analysis
-    return {
-        'outcome': outcome,
-        'steps': simulation_steps,
-        'poachers_caught_pct': 1 - len(alive_poacher_sprites) / len(poachers_sprites),
-        'animals_alive_pct': len(alive_animal_sprites) / len(animals_sprites)
-    }
+    return finish_results(results, profiler, profile_file, recorder)
+
+
+def finish_results(results, profiler, profile_file, recorder):
+    """Close the recording and add the profile report to the results, written to the profile file if given"""
+    if recorder is not None:
+        recorder.close(results)
+    if profiler is None:
+        return results
+    results['profile'] = profiler.report()
+    if profile_file:
+        profiler.dump(profile_file)
+    return results
 
 
-def train_optimizer(num_runs=50, optimizer_type='rl', model_filename='rl_model.pkl'):
-    """Run multiple simulations to train & evaluate the optimizers"""
-    # Statistics tracking
-    stats = {
-        'results': [],
-        'poachers_caught_pct': [],
-        'animals_alive_pct': [],
-        'steps_per_run': [],
-        'victories': 0,
-        'defeats': 0,
-        'timeouts': 0
+def map_kwargs(scenario, optimizer_kwargs=None):
+    """Arguments of an optimizer for the map of a scenario, explicit optimizer arguments take precedence"""
+    return {'map_width': scenario.map_width, 'map_height': scenario.map_height, **(optimizer_kwargs or {})}
+
+
+# Model file of the current training round and its pickled bytes, read once per round by every worker process
+worker_model = (None, None)
+
+
+def load_worker_model(model_file):
+    """
+    Model an episode of a training worker starts from, the file of a round is read only by the first episode of the
+    worker in that round. Every episode unpickles its own copy, the episodes change the model they act with.
+    """
+    global worker_model
+    if worker_model[0] != model_file:
+        with open(model_file, 'rb') as file:
+            worker_model = (model_file, file.read())
+    return pickle.loads(worker_model[1])
+
+
+def run_episode(task):
+    """
+    Run one seeded headless episode, used as the task of a training worker process
+    Args:
+        task: dict with
+            'optimizer_type': str, 'rl', 'pso' or 'array_pso'
+            'seed': int, seed of the episode
+            'optimizer_kwargs': dict, arguments of the optimizer
+            'model_data': dict (RL only), model of the training process as returned by RLOptimizer.get_worker_data
+            'model_file': str (RL only), instead of model_data: pickle file of the model data, written once per round
+                by train_parallel
+            'scenario': Scenario (optional), scenario of the episode, defaults to the default scenario
+    Returns:
+        result: dict, simulation results of run() with an additional 'rollout' for RL (see RLOptimizer.merge_rollout)
+    """
+    scenario = task.get('scenario') or Scenario()
+    optimizer_kwargs = map_kwargs(scenario, task['optimizer_kwargs'])
+    if task['optimizer_type'] == 'pso':
+        return run(PSOOptimizer(**optimizer_kwargs), headless=True, scenario=scenario, seed=task['seed'])
+    if task['optimizer_type'] == 'array_pso':
+        return run(ArrayPSOOptimizer(**optimizer_kwargs), headless=True, scenario=scenario, seed=task['seed'])
+
+    # Start from the model of the training process and record all experiences of the episode
+    optimizer = RLOptimizer(**optimizer_kwargs)
+    optimizer.set_model_data(task['model_data'] if 'model_data' in task else load_worker_model(task['model_file']))
+    visits_before = optimizer.grid_exploration_count.to_dict()
+    rewards_before = len(optimizer.rewards_history)
+    optimizer.experience_log = []
+
+    result = run(optimizer, headless=True, scenario=scenario, seed=task['seed'])
+
+    result['rollout'] = {
+        'experiences': optimizer.experience_log,
+        'grid_visits': {location: count - visits_before.get(location, 0)
+                        for location, count in optimizer.grid_exploration_count.items()
+                        if count != visits_before.get(location, 0)},
+        'rewards': optimizer.rewards_history[rewards_before:],
+        'optimize_steps': result['steps']  # The drones are optimized once per step
     }
-    
+    return result
+
+
+def default_results_filename(prefix, resume):
+    """
+    Results log of a training started with train_optimizer without results_filename, every training gets a log of its
+    own named after the start time, e.g. rl_model_results_20240601-120000.jsonl
+    Args:
+        prefix: str, start of the file name, the model file without extension for RL, else the optimizer type
+        resume: bool, the last written log of the prefix is resumed, a new log is started if there is none
+    """
+    if resume:
+        logs = glob.glob(glob.escape(prefix) + '_results_*.jsonl')
+        if logs:
+            return max(logs, key=os.path.getmtime)
+    filename = f"{prefix}_results_{time.strftime('%Y%m%d-%H%M%S')}"
+    number = 1
+    while os.path.exists(f"{filename}.jsonl" if number == 1 else f"{filename}-{number}.jsonl"):
+        number += 1  # Trainings started in the same second
+    return f"{filename}.jsonl" if number == 1 else f"{filename}-{number}.jsonl"
+
+
+def train_optimizer(num_runs=50, optimizer_type='rl', model_filename='rl_model.pkl', workers=1, seed=None, sync_every=None,
+                    optimizer_kwargs=None, batch_worlds=1, results_filename=None, resume=False, overwrite=False,
+                    checkpoint_every=10, checkpoint_dir=None, scenario=None):
+    """
+    Run multiple simulations to train & evaluate the optimizers
+    Args:
+        num_runs: int, number of episodes
+        optimizer_type: str, 'rl', 'pso' or 'array_pso'
+        model_filename: str, file of the RL model, loaded at the start of a new training and saved at its end
+        workers: int, number of worker processes, 1 runs all episodes in this process
+        seed: int (optional), base seed, episode n is seeded with seed + n
+        sync_every: int (optional), RL with workers only: number of episodes after which the experiences
+            of the workers are merged into the model, defaults to the number of workers
+        optimizer_kwargs: dict (optional), arguments of the optimizer, e.g. {'dense_q_table': True} for RL
+        batch_worlds: int, without workers: number of episodes advanced in lockstep in one BatchWorld (vectorized engine)
+        results_filename: str (optional), append-only log of the episode results, written as each episode finishes
+            (see results_log.py), defaults to a new log per training named after the model file and the start time,
+            see default_results_filename
+        resume: bool, continue an interrupted training: runs found in the results log are skipped and the log is appended to,
+            use the same arguments as the interrupted training, without results_filename the newest log is resumed.
+            RL continues from the newest readable checkpoint, runs after it are repeated, without a checkpoint the training
+            starts anew from the model file and the log is reset.
+            In-process PSO optimizers start with a new swarm, their episodes don't continue exactly
+        overwrite: bool, replace the results log and the checkpoints of an earlier training, without it a new training
+            raises FileExistsError if they exist
+        checkpoint_every: int, RL only: number of runs between checkpoints of the model, the model stays in memory in between
+        checkpoint_dir: str (optional), RL only: directory of the checkpoints, defaults to <results_filename>_checkpoints,
+            so every training keeps its own checkpoints
+        scenario: Scenario (optional), scenario of every episode, defaults to the default scenario, the optimizers get its map size
+    """
+    # Never overwrite the results or checkpoints of an earlier training unless asked to
+    if results_filename is None:
+        results_filename = default_results_filename(
+            os.path.splitext(model_filename)[0] if optimizer_type == 'rl' else optimizer_type, resume)
+    checkpoint_dir = checkpoint_dir or os.path.splitext(results_filename)[0] + '_checkpoints'
+    if not resume and not overwrite:
+        if os.path.exists(results_filename):
+            raise FileExistsError(f"{results_filename} already exists, resume the training, pass overwrite or move the "
+                                  f"results of the earlier training")
+        if optimizer_type == 'rl' and os.path.isdir(checkpoint_dir) and Checkpoints(checkpoint_dir).runs():
+            raise FileExistsError(f"{checkpoint_dir} has checkpoints of an earlier training, resume the training, pass "
+                                  f"overwrite or use another checkpoint_dir")
+    optimizer_kwargs = optimizer_kwargs or {}
+    scenario = scenario or Scenario()
     if optimizer_type == 'rl':
         # Load RL optimizer
-        optimizer = RLOptimizer()
+        optimizer = RLOptimizer(**map_kwargs(scenario, optimizer_kwargs))
     elif optimizer_type == 'pso':
         # Load PSO optimizer
-        optimizer = PSOOptimizer()
-        
-    for run_num in range(1, num_runs+1):
-        print(f"\n--- Starting Run {run_num}/{num_runs} ---")
-        
-        # load model if optimizer is RL and model exists
-        if optimizer_type == 'rl':
+        optimizer = PSOOptimizer(**map_kwargs(scenario, optimizer_kwargs))
+    elif optimizer_type == 'array_pso':
+        # Load vectorized PSO optimizer
+        optimizer = ArrayPSOOptimizer(**map_kwargs(scenario, optimizer_kwargs))
+    
+    # The RL model is loaded once and kept in memory, checkpoints are written atomically every checkpoint_every runs
+    checkpoints, last_run, restart = None, None, False
+    if optimizer_type == 'rl':
+        checkpoints = Checkpoints(checkpoint_dir, checkpoint_every)
+        if resume:
+            last_run = checkpoints.restore_latest(optimizer)
+            if last_run is None:
+                # Interrupted before the first checkpoint, the model file is still the one the training started from
+                print("No checkpoint found, restarting the training from the model file")
+                resume, restart = False, True
+            else:
+                print(f"Resuming the model from run {last_run}")
+        if not resume:
+            # Only checkpoints of the restarted training or of a training to overwrite are left here
+            checkpoints.clear()
             optimizer.load_model(model_filename)
-        
-        # Track current run performance 
-        result = run(optimizer, headless=True)
-        
-        # Update statistics
-        stats['results'].append(result['outcome'])
-        stats['poachers_caught_pct'].append(result['poachers_caught_pct'])
-        stats['animals_alive_pct'].append(result['animals_alive_pct'])
-        stats['steps_per_run'].append(result['steps'])
-        
-        if optimizer_type == 'rl':
-            optimizer.save_model(model_filename)
-        
-        # Print statistics so far
-        print(f"Run {run_num} complete - {result['outcome']} in {result['steps']} steps")
-        
-    # Calculate final statistics
-    stats['victories'] = stats['results'].count('victory')
-    stats['defeats'] = stats['results'].count('defeat')
-    stats['timeouts'] = stats['results'].count('timeout')
     
+    # Statistics tracking, every result is also appended to the results log, RL runs after the checkpoint are repeated,
+    # the log of an RL training restarted without checkpoint is replaced
+    results_log = ResultsLog(results_filename, resume=resume, last_run=last_run, overwrite=restart or overwrite)
+    stats = results_log.stats
+    completed = results_log.completed_runs()
+    runs = [run_num for run_num in range(1, num_runs+1) if run_num not in completed]
+    if completed:
+        print(f"Resuming training, {len(completed)} of {num_runs} runs found in {results_filename}")
+    
+    # Configuration stored with every result
+    config = {'optimizer_type': optimizer_type, 'optimizer_kwargs': optimizer_kwargs}
+
+    if workers > 1:
+        train_parallel(stats, results_log, config, optimizer, runs, num_runs, checkpoints, workers, seed, sync_every, scenario)
+    elif batch_worlds > 1:
+        for batch in range(0, len(runs), batch_worlds):
+            run_nums = runs[batch:batch + batch_worlds]
+            print(f"\n--- Starting Runs {run_nums[0]}-{run_nums[-1]}/{num_runs} in lockstep ---")
+            
+            # Seed the batch if requested
+            batch_seed = None if seed is None else seed + run_nums[0]
+            world_seed, optimizer_seed = spawn_streams(batch_seed, 2)
+            if seed is not None:
+                optimizer.set_rng(optimizer_seed)
+            
+            # One tick advances all episodes of the batch
+            start = time.perf_counter()
+            world = BatchWorld([tuple(scenario)] * len(run_nums), seed=world_seed, map_size=scenario.map_size)
+            results = world.run(optimizer)
+            duration = (time.perf_counter() - start) / len(run_nums)
+            for run_num, result in zip(run_nums, results):
+                record_result(stats, results_log, run_num, result, config, batch_seed, duration)
+            
+            if checkpoints is not None:
+                checkpoints.update(optimizer, run_nums[-1], len(run_nums))
+    else:
+        for run_num in runs:
+            print(f"\n--- Starting Run {run_num}/{num_runs} ---")
+            
+            # Track current run performance, seeded if requested
+            run_seed = None if seed is None else seed + run_num
+            start = time.perf_counter()
+            result = run(optimizer, headless=True, scenario=scenario, seed=run_seed)
+            record_result(stats, results_log, run_num, result, config, run_seed, time.perf_counter() - start)
+            
+            if checkpoints is not None:
+                checkpoints.update(optimizer, run_num)
+    results_log.close()
+    
+    # Final checkpoint and model file
+    if optimizer_type == 'rl':
+        if checkpoints.runs_since_save:
+            checkpoints.save(optimizer, num_runs)
+        optimizer.save_model(model_filename)
+        
     # Print final statistics
     print("\n=== Training Complete ===")
     print(f"Total runs: {num_runs}")
@@ -346,24 +405,97 @@ def train_optimizer(num_runs=50, optimizer_type='rl', model_filename='rl_model.p
     return
 
 
+def train_parallel(stats, results_log, config, optimizer, runs, num_runs, checkpoints, workers, seed, sync_every, scenario):
+    """
+    Run the episodes of train_optimizer on a pool of worker processes.
+    PSO episodes are independent, every episode uses a new optimizer.
+    RL episodes are run in rounds of sync_every episodes, all episodes of a round start from the same model
+    and their experiences are merged into the model at the end of the round, checkpoints are written between rounds.
+    The model of a round is shared through a temporary file, see load_worker_model.
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    optimizer_type = config['optimizer_type']
+    sync_every = sync_every or workers
+
+    model_dir = tempfile.mkdtemp(prefix='training_model_') if optimizer_type == 'rl' else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for round_num, round_start in enumerate(range(0, len(runs), sync_every)):
+                run_nums = runs[round_start:round_start + sync_every]
+                print(f"\n--- Starting Runs {run_nums[0]}-{run_nums[-1]}/{num_runs} on {workers} workers ---")
+
+                # The model is written once per round and read once by every worker, the tasks only carry the file name.
+                # Every episode of the round starts from it, the rewards history stays here
+                model_file = None
+                if optimizer_type == 'rl':
+                    model_file = os.path.join(model_dir, f"round_{round_num}.pkl")
+                    with open(model_file, 'wb') as file:
+                        pickle.dump(optimizer.get_worker_data(), file, protocol=pickle.HIGHEST_PROTOCOL)
+                tasks = [{'optimizer_type': optimizer_type, 'seed': seed + run_num, 'optimizer_kwargs': config['optimizer_kwargs'],
+                          'model_file': model_file, 'scenario': scenario} for run_num in run_nums]
+
+                # Results are returned in order of the runs
+                start = time.perf_counter()
+                results = list(executor.map(run_episode, tasks))
+                duration = (time.perf_counter() - start) / len(run_nums)
+                if model_file is not None:
+                    os.remove(model_file)
+                for run_num, result in zip(run_nums, results):
+                    if optimizer_type == 'rl':
+                        optimizer.merge_rollout(result.pop('rollout'))
+                    record_result(stats, results_log, run_num, result, config, seed + run_num, duration)
+
+                if checkpoints is not None:
+                    checkpoints.update(optimizer, run_nums[-1], len(run_nums))
+    finally:
+        if model_dir is not None:
+            shutil.rmtree(model_dir, ignore_errors=True)
+    return
+
+
+def record_result(stats, results_log, run_num, result, config, seed, duration):
+    """
+    Add the results of a run to the statistics of train_optimizer and append them to the results log
+    Args:
+        duration: float, seconds of the episode, for lockstep batches and worker rounds the share of the wall time
+    """
+    add_result(stats, result)
+    results_log.append({'run': run_num, 'seed': seed, **config, 'outcome': result['outcome'], 'steps': result['steps'],
+                        'poachers_caught_pct': result['poachers_caught_pct'],
+                        'animals_alive_pct': result['animals_alive_pct'], 'time': duration, 'finished': time.time()})
+    
+    # Print statistics so far
+    print(f"Run {run_num} complete - {result['outcome']} in {result['steps']} steps")
+    return
+
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         if sys.argv[1].lower() == "train":
             type = sys.argv[2].lower() if len(sys.argv) > 2 else 'rl'
             num_runs = int(sys.argv[3]) if len(sys.argv) > 3 else 50
-            train_optimizer(num_runs=num_runs, optimizer_type=type)
-        elif sys.argv[1].lower() in ["pso", "rl"]:
-            # Regular single-run mode
+            workers = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+            mode = sys.argv[5].lower() if len(sys.argv) > 5 else None  # 'resume' or 'overwrite'
+            train_optimizer(num_runs=num_runs, optimizer_type=type, workers=workers, resume=mode == 'resume',
+                            overwrite=mode == 'overwrite')
+        elif sys.argv[1].lower() in ["pso", "array_pso", "rl"]:
+            # Regular single-run mode, optionally on a scenario file (see scenario.py)
+            scenario = Scenario.load(sys.argv[2]) if len(sys.argv) > 2 else Scenario()
             if sys.argv[1].lower() == "pso":
                 print("Running with PSO optimizer")
-                optimizer = PSOOptimizer()
+                optimizer = PSOOptimizer(map_width=scenario.map_width, map_height=scenario.map_height)
+            elif sys.argv[1].lower() == "array_pso":
+                print("Running with vectorized PSO optimizer")
+                optimizer = ArrayPSOOptimizer(map_width=scenario.map_width, map_height=scenario.map_height)
             else:
                 print("Running with RL optimizer")
-                optimizer = RLOptimizer()
+                optimizer = RLOptimizer(map_width=scenario.map_width, map_height=scenario.map_height)
                 optimizer.load_model('rl_model.pkl')
-            run(optimizer)
+            run(optimizer, scenario=scenario)
         else:
-            print("Usage: python main.py [train] [num_runs] [pso|rl]")
+            print("Usage: python main.py [train] [pso|array_pso|rl] [num_runs] [workers] [resume]")
+            print("       python main.py [pso|array_pso|rl] [scenario.json]")
     else:
         # Default to PSO
         run()
\ No newline at end of file
@@ -1,29 +1,115 @@
 from abc import ABC, abstractmethod
+from random_stream import RandomStream
 
 class DroneOptimizer(ABC):
     """
     Abstract base class for drone optimization algorithms.
     Any optimizer must implement the optimize method.
+    Optimizers that keep their own view of the detected agents set tracks_detections, the world then passes the changes
+    of the detected agents to update_detections and calls optimize without the detected groups. The worlds set
+    detection_view to tell whose detected agents the view holds, an optimizer shared by several worlds gets a reset
+    from every world that didn't send the last changes.
+    Optimizers that set optimizes_arrays implement optimize_arrays, array_engine then passes its arrays directly
+    instead of agent views or the changes of the detected agents.
     """
     
+    tracks_detections = False
+    optimizes_arrays = False
+    detection_view = None
+    
     @abstractmethod
     def optimize(self, drones, detected_animals, detected_poachers):
         """
         Determine optimal drone actions based on current simulation state.
         
         Args:
-            drones: pygame.sprite.Group - All drone sprites
-            detected_animals: pygame.sprite.Group - All detected animal sprites
-            detected_poachers: pygame.sprite.Group - All detected poacher sprites
+            drones: iterable of Drone agents - All drones
+            detected_animals: iterable of Animal agents - All detected animals, None if the optimizer tracks detections
+            detected_poachers: iterable of Poacher agents - All detected poachers, None if the optimizer tracks detections
             
         Returns:
             dict: Dictionary mapping drone objects to their action parameters:
                 {
                     drone_object: {
                         'state': DroneState object or None,
-                        'direction': pygame.Vector2 position vector,
+                        'direction': Vector2 direction vector,
                         'speed_modifier': float, 0.0 <= speed_modifier <= 1.0
                     }
                 }
         """
-        pass
\ No newline at end of file
+        pass
+    
+    def optimize_batch(self, drones, detected_animals, detected_poachers):
+        """
+        Determine drone actions for a batch of independent worlds advanced in lockstep (see array_engine.BatchWorld).
+        The default implementation calls optimize once per world, optimizers can override it with a vectorized version.
+        Drone names are unique across the worlds of a batch.
+        
+        Args:
+            drones: list with one iterable of Drone agents per world
+            detected_animals: list with one iterable of detected Animal agents per world
+            detected_poachers: list with one iterable of detected Poacher agents per world
+            
+        Returns:
+            list: one action dictionary per world, in the format of optimize
+        """
+        return [self.optimize(*world) for world in zip(drones, detected_animals, detected_poachers)]
+    
+    def optimize_arrays(self, names, drone_positions, drone_scan_ranges, drone_states, drone_world, n_worlds,
+                        animal_positions, animal_scan_ranges, animal_world, poacher_positions, poacher_world):
+        """
+        Array version of optimize_batch for optimizers with optimizes_arrays, used by ArrayWorld and BatchWorld.
+        The detected agents of all worlds are concatenated, the world arrays tell the world of every row.
+        
+        Args:
+            names: list of str - Names of all drones, unique across the worlds
+            drone_positions: np.ndarray (drones, 2), positions of the drones
+            drone_scan_ranges: np.ndarray (drones,), scan ranges of the drones
+            drone_states: np.ndarray (drones,), state codes of the drones
+            drone_world: np.ndarray (drones,), world index of every drone
+            n_worlds: int, number of worlds
+            animal_positions: np.ndarray (animals, 2), positions of the detected animals
+            animal_scan_ranges: np.ndarray (animals,), scan ranges of the detected animals
+            animal_world: np.ndarray (animals,), world index of every detected animal
+            poacher_positions: np.ndarray (poachers, 2), positions of the detected poachers
+            poacher_world: np.ndarray (poachers,), world index of every detected poacher
+            
+        Returns:
+            direction: np.ndarray (drones, 2), direction vectors
+            state: np.ndarray (drones,), code of the new state, -1 to keep the current state
+            speed_modifier: np.ndarray (drones,), 0.0 <= speed_modifier <= 1.0
+        """
+        raise NotImplementedError("Optimizers with optimizes_arrays must implement optimize_arrays")
+    
+    def update_detections(self, detected_animals, lost_animals, detected_poachers, lost_poachers, reset=False):
+        """
+        Changes of the detected agents since the last tick, called before optimize for optimizers with tracks_detections
+        whenever an agent was detected or lost. World appends the detected agents to its detected groups in the same
+        order, so a view kept as ordered set has the order of the groups. Batches of worlds don't support it.
+        
+        Args:
+            detected_animals: list of Animal agents - Animals detected in this tick, not detected in the last tick
+            lost_animals: list of Animal agents - Animals detected in the last tick, not detected anymore
+            detected_poachers: list of Poacher agents - Poachers detected in this tick, not detected in the last tick
+            lost_poachers: list of Poacher agents - Poachers detected in the last tick, not detected anymore
+            reset: bool, forget the current view, the detected lists are all detected agents. Sent in the first tick of
+                the optimizer in a world, after the world was restored from a snapshot and when another world sent
+                the last changes.
+        """
+        raise NotImplementedError("Optimizers with tracks_detections must implement update_detections")
+    
+    def end_batch(self):
+        """
+        Called by BatchWorld.run after the last world of the batch has finished, e.g. to update schedules that count
+        the steps of every world-episode. Does nothing by default.
+        """
+        pass
+    
+    def set_rng(self, seed):
+        """
+        Reseed the random stream of the optimizer, main.run passes a child seed of the episode seed.
+        
+        Args:
+            seed: int, np.random.SeedSequence or None for a fresh seed
+        """
+        self.rng = RandomStream(seed)
@@ -0,0 +1,73 @@
+# Playback control of the visual simulation
+# Decouples simulation steps from rendered frames: the simulation advances with a fixed timestep of FPS steps per second
+# times the speed factor, independent of the display rate, which is capped at RENDER_FPS. At max speed the simulation
+# steps as often as fits into a frame. Keys:
+#   Space        pause / resume
+#   Right arrow  single step while paused
+#   1 / 2 / 3    1x / 10x / max speed
+#   End          skip to the end of the episode without rendering
+
+import pygame
+
+from settings import FPS, RENDER_FPS
+
+SPEEDS = {pygame.K_1: 1, pygame.K_2: 10, pygame.K_3: None}  # None steps as fast as possible
+
+
+class Playback:
+    def __init__(self, speed=1):
+        """
+        Args:
+            speed: float or None, simulation steps per second as multiple of FPS, None for max speed
+        """
+        self.speed = speed
+        self.paused = False
+        self.skip_to_end = False
+        self.pending_steps = 0  # Single steps requested while paused
+        self.accumulator = 0.0  # Simulation time due but not yet stepped, in steps
+
+    def handle_key(self, key):
+        """Apply a pressed key, returns whether the playback state changed"""
+        if key == pygame.K_SPACE:
+            self.paused = not self.paused
+        elif key == pygame.K_RIGHT and self.paused:
+            self.pending_steps += 1
+        elif key in SPEEDS:
+            self.speed = SPEEDS[key]
+            self.accumulator = 0.0
+        elif key == pygame.K_END:
+            self.skip_to_end = True
+        else:
+            return False
+        return True
+
+    def steps_due(self, elapsed):
+        """
+        Number of simulation steps to run in this frame
+        Args:
+            elapsed: float, seconds since the last frame
+        Returns:
+            int, or None for as many steps as fit into the frame (max speed)
+        """
+        if self.paused:
+            steps, self.pending_steps = self.pending_steps, 0
+            return steps
+        if self.speed is None:
+            return None
+        # Fixed timestep, at most one second of simulation time per frame so a slow frame can't snowball
+        self.accumulator = min(self.accumulator + elapsed * FPS * self.speed, FPS * self.speed)
+        steps = int(self.accumulator)
+        self.accumulator -= steps
+        return steps
+
+    def frame_budget(self):
+        """Seconds available for stepping in one frame at max speed"""
+        return 1 / RENDER_FPS
+
+    def label(self):
+        """Playback state shown in the window caption"""
+        if self.skip_to_end:
+            return "skipping to end"
+        if self.paused:
+            return "paused (space: resume, right: step)"
+        return "max speed" if self.speed is None else f"{self.speed:g}x"
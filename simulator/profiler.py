@@ -0,0 +1,70 @@
+# Per-phase profiling of the simulation loop
+# Opt-in instrumentation for main.run: the worlds time their phases (events, animals, poachers, drone sensing,
+# optimizer, drone actions) and count scans, scanned agents, state transitions and dispatched events, main.run adds
+# the pygame phases. Times and counters are aggregated over an episode and returned in the results of main.run.
+# Without a profiler the worlds skip all measurements.
+
+import json
+import time
+from collections import defaultdict
+
+
+class PhaseProfiler:
+    def __init__(self):
+        self.phase_times = defaultdict(float)  # {phase: seconds}
+        self.counters = defaultdict(int)  # {counter: count}
+        self.ticks = 0
+
+    @staticmethod
+    def start():
+        """Timestamp to pass to stop"""
+        return time.perf_counter()
+
+    def stop(self, phase, start):
+        """Add the time since start to a phase, returns the current timestamp to start the next phase"""
+        now = time.perf_counter()
+        self.phase_times[phase] += now - start
+        return now
+
+    def count(self, counter, amount=1):
+        self.counters[counter] += amount
+        return
+
+    def tick(self):
+        self.ticks += 1
+        return
+
+    def report(self):
+        """
+        Aggregated measurements of the episode
+        Returns:
+            dict with
+                'ticks': int, number of profiled ticks
+                'total_time': float, seconds spent in all phases
+                'phases': {phase: {'time': seconds, 'ms_per_tick': float, 'share': fraction of total_time}}
+                'counters': {counter: {'total': int, 'per_tick': float}}
+        """
+        total_time = sum(self.phase_times.values())
+        ticks = max(1, self.ticks)
+        return {
+            'ticks': self.ticks,
+            'total_time': total_time,
+            'phases': {
+                phase: {
+                    'time': seconds,
+                    'ms_per_tick': seconds / ticks * 1000,
+                    'share': seconds / total_time if total_time > 0 else 0.0
+                }
+                for phase, seconds in sorted(self.phase_times.items(), key=lambda x: x[1], reverse=True)
+            },
+            'counters': {
+                counter: {'total': count, 'per_tick': count / ticks}
+                for counter, count in self.counters.items()
+            }
+        }
+
+    def dump(self, filename):
+        """Write the report as JSON"""
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return
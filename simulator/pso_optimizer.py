@@ -1,13 +1,16 @@
-import pygame
-import random
+from vector import Vector2
 from optimizer import DroneOptimizer
 from states import DroneFastSearch, DroneDeepSearch
+from random_stream import RandomStream
 
 class PSOOptimizer(DroneOptimizer):
     """Particle Swarm Optimization for drone control"""
     
-    def __init__(self, particles_per_drone=20, w=0.5, c1=1.5, c2=1.5):
+    def __init__(self, particles_per_drone=20, w=0.5, c1=1.5, c2=1.5, map_width=800, map_height=600, seed=None):
         self.particles_per_drone = particles_per_drone
+        self.map_width = map_width
+        self.map_height = map_height
+        self.rng = RandomStream(seed)
         self.w = w  # Inertia weight
         self.c1 = c1  # Cognitive parameter
         self.c2 = c2  # Social parameter
@@ -22,8 +25,8 @@ class PSOOptimizer(DroneOptimizer):
             for _ in range(self.particles_per_drone):
                 # Random position in the game area
                 particle = {
-                    'position': pygame.Vector2(random.uniform(0, 800), random.uniform(0, 600)),
-                    'velocity': pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1)),
+                    'position': Vector2(self.rng.uniform(0, self.map_width), self.rng.uniform(0, self.map_height)),
+                    'velocity': Vector2(self.rng.uniform(-1, 1), self.rng.uniform(-1, 1)),
                     'fitness': 0,
                     'last_position': None,
                     'stagnation_count': 0 
@@ -116,7 +119,7 @@ class PSOOptimizer(DroneOptimizer):
                 
                 """The cognitive parameter influences how much the drone is influenced by its own best position"""
                 # Update velocity and position
-                r1, r2 = random.random(), random.random()
+                r1, r2 = self.rng.random(), self.rng.random()
                 cognitive = self.c1 * r1 * (self.best_positions[drone.name] - particle['position'])
                 social = self.c2 * r2 * (self.global_best[drone.name] - particle['position'])
                 
@@ -128,8 +131,8 @@ class PSOOptimizer(DroneOptimizer):
                 particle['position'] += particle['velocity']
                 
                 # Keep within bounds
-                particle['position'].x = max(0, min(800, particle['position'].x))
-                particle['position'].y = max(0, min(600, particle['position'].y))
+                particle['position'].x = max(0, min(self.map_width, particle['position'].x))
+                particle['position'].y = max(0, min(self.map_height, particle['position'].y))
 
                 # Track how long the particle has stayed in a similar position
                 if particle['last_position'] is not None:
@@ -146,7 +149,7 @@ class PSOOptimizer(DroneOptimizer):
             
             # Determine drone actions based on global best
             direction = (self.global_best[drone.name] - drone.position).normalize() if (
-                self.global_best[drone.name] - drone.position).length() > 0 else pygame.Vector2(0, 0)
+                self.global_best[drone.name] - drone.position).length() > 0 else Vector2(0, 0)
             
             # Determine state based on detected entities
             new_state = None
@@ -0,0 +1,150 @@
+# Dense Q-table for the RLOptimizer
+# Stores the Q-values of all (state, action) pairs in one ndarray indexed by the integer components of the
+# state key (grid_x, grid_y, animals_detected, poachers_detected, altitude) and the action index.
+# Pairs that have never been updated hold -inf, so the table behaves like the dict Q-table of the RLOptimizer
+# (states without values have no best action and a max Q-value of 0) and max/argmax need no masking.
+# A second array keeps the rank of every action in the order its value was first set in the state, the order in
+# which the dict Q-table holds its actions. Ties and the exploration noise follow that order, so both Q-tables pick
+# the same actions.
+# The values are saved as a single .npy file that can be memory-mapped when loading, the ranks as a second one.
+
+import os
+
+import numpy as np
+
+
+class DenseQTable:
+    def __init__(self, grid_x_divisions, grid_y_divisions, actions, values=None, order=None):
+        """
+        Args:
+            grid_x_divisions: int, number of horizontal grid divisions
+            grid_y_divisions: int, number of vertical grid divisions
+            actions: list of action tuples, the position in the list is the action index
+            values: np.ndarray (optional), existing Q-values of shape (grid_x, grid_y, 2, 2, 2, actions)
+            order: np.ndarray (optional), insertion ranks of the existing Q-values, same shape as values.
+                By action index if not given.
+        """
+        self.actions = list(actions)
+        self.action_index = {action: index for index, action in enumerate(self.actions)}
+        shape = (grid_x_divisions, grid_y_divisions, 2, 2, 2, len(self.actions))
+        if values is None:
+            values = np.full(shape, -np.inf)
+        elif values.shape != shape:
+            raise ValueError(f"Q-table of shape {values.shape} doesn't match the configuration {shape}")
+        if order is None:
+            order = np.broadcast_to(np.arange(len(self.actions), dtype=np.int16), shape).copy()
+        elif order.shape != shape:
+            raise ValueError(f"Action order of shape {order.shape} doesn't match the configuration {shape}")
+        self.values = values
+        self.order = order  # Rank of every action in the order its value was first set in the state
+
+    def __len__(self):
+        """Number of states with at least one Q-value"""
+        return int((self.values.max(axis=-1) > -np.inf).sum())
+
+    def has_values(self, state):
+        return self.values[state].max() > -np.inf
+
+    def get(self, state, action, default=0.0):
+        value = self.values[state + (self.action_index[action],)]
+        return default if value == -np.inf else float(value)
+
+    def set(self, state, action, value):
+        index = state + (self.action_index[action],)
+        if self.values[index] == -np.inf:
+            # First value of the action, ranked after the actions the state already has
+            self.order[index] = (self.values[state] > -np.inf).sum()
+        self.values[index] = value
+        return
+
+    def known_actions(self, state):
+        """Indexes of the actions with values in a state, in the order their values were first set"""
+        known = np.flatnonzero(self.values[state] > -np.inf)
+        return known[np.argsort(self.order[state][known], kind='stable')]
+
+    def max_value(self, state):
+        """Largest Q-value of a state, 0 if the state has no values"""
+        value = self.values[state].max()
+        return 0.0 if value == -np.inf else float(value)
+
+    def best_action(self, state, noise=None):
+        """
+        Action with the largest Q-value among the actions with values, None if the state has no values.
+        Ties go to the action whose value was set first, like max over the dict Q-table.
+        Args:
+            state: tuple, state key
+            noise: np.ndarray (optional), added to the Q-values of the actions with values in the order of known_actions
+        """
+        known = self.known_actions(state)
+        if len(known) == 0:
+            return None
+        q_values = self.values[state][known]
+        if noise is not None:
+            q_values = q_values + noise
+        return self.actions[known[q_values.argmax()]]
+
+    def max_values(self, states):
+        """
+        Vectorized max Q-value of many states.
+        Args:
+            states: np.ndarray (n, 5), integer state keys
+        Returns:
+            np.ndarray (n,), largest Q-value per state, 0 for states without values
+        """
+        max_values = self.values[tuple(np.asarray(states).T)].max(axis=-1)
+        return np.where(max_values > -np.inf, max_values, 0.0)
+
+    def best_actions(self, states):
+        """
+        Vectorized best action index of many states, ties go to the action whose value was set first.
+        Args:
+            states: np.ndarray (n, 5), integer state keys
+        Returns:
+            np.ndarray (n,), index of the best action per state, -1 for states without values
+        """
+        index = tuple(np.asarray(states).T)
+        q_values, order = self.values[index], self.order[index]
+        max_values = q_values.max(axis=-1)
+        ranks = np.where(q_values == max_values[:, None], order, len(self.actions))
+        return np.where(max_values > -np.inf, ranks.argmin(axis=-1), -1)
+
+    def to_dict(self):
+        """Q-values in the dict format of the RLOptimizer, {state_key: {action_key: q_value}}"""
+        q_table = {}
+        for state in zip(*np.nonzero(self.values.max(axis=-1) > -np.inf)):
+            state = tuple(int(i) for i in state)
+            q_table[state] = {self.actions[action]: float(self.values[state + (action,)])
+                              for action in self.known_actions(state)}
+        return q_table
+
+    @classmethod
+    def from_dict(cls, q_table, grid_x_divisions, grid_y_divisions, actions):
+        """Create a dense Q-table from the dict format of the RLOptimizer"""
+        table = cls(grid_x_divisions, grid_y_divisions, actions)
+        for state, q_values in q_table.items():
+            for action, value in q_values.items():
+                table.set(state, action, value)
+        return table
+
+    @staticmethod
+    def order_filename(filename):
+        """File of the action ranks next to the Q-values, <filename without extension>_order.npy"""
+        return os.path.splitext(filename)[0] + '_order.npy'
+
+    def save(self, filename):
+        np.save(filename, self.values)
+        np.save(self.order_filename(filename), self.order)
+        return
+
+    @classmethod
+    def load(cls, filename, grid_x_divisions, grid_y_divisions, actions, mmap_mode=None):
+        """
+        Load Q-values saved with save, without a file of action ranks the actions are ranked by their index.
+        Args:
+            mmap_mode: str (optional), passed to np.load. 'c' maps a large table copy-on-write: only the pages that are
+                updated are copied into memory and the file stays unchanged, as needed by a RLOptimizer that updates its
+                Q-table every step. 'r' maps it read-only, for analysis only, set raises on a read-only table.
+        """
+        order_filename = cls.order_filename(filename)
+        order = np.load(order_filename, mmap_mode=mmap_mode) if os.path.exists(order_filename) else None
+        return cls(grid_x_divisions, grid_y_divisions, actions, np.load(filename, mmap_mode=mmap_mode), order)
@@ -0,0 +1,71 @@
+# Seedable random number streams
+# Every world and optimizer draws from its own stream instead of the global random module, so an episode is reproduced
+# exactly by its seed, also when episodes run in parallel processes or in a different order.
+# A stream wraps a NumPy Generator and pre-draws uniform doubles in blocks with one vectorized call. The scalar draws of
+# the agent loop are served from the block, integers and choices are derived from a single double each, so the values
+# don't depend on the block size. Vectorized code uses the generator directly.
+# Streams of an episode are spawned from one np.random.SeedSequence (see spawn_streams).
+
+import copy
+import numpy as np
+
+BLOCK_SIZE = 4096
+
+
+class RandomStream:
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        """
+        Args:
+            seed: int, np.random.SeedSequence or None, None draws a fresh seed from the OS
+            block_size: int, number of doubles drawn per block
+        """
+        self.generator = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.values = iter(())  # Iterator over the rest of the current block
+
+    def random(self):
+        """Uniform double in [0, 1)"""
+        try:
+            return next(self.values)
+        except StopIteration:
+            self.values = iter(self.generator.random(self.block_size).tolist())
+            return next(self.values)
+
+    def uniform(self, low, high):
+        """Uniform double in [low, high)"""
+        return low + (high - low) * self.random()
+
+    def randint(self, low, high):
+        """Uniform integer in [low, high], both included like random.randint"""
+        return low + int(self.random() * (high - low + 1))
+
+    def choice(self, sequence):
+        """Uniformly chosen element of a non-empty sequence"""
+        return sequence[int(self.random() * len(sequence))]
+
+    def get_state(self):
+        """State of the stream, the generator state and the rest of the current block"""
+        return {'generator': self.generator.bit_generator.state, 'values': list(copy.copy(self.values))}
+
+    def set_state(self, state):
+        """Continue the stream from a state returned by get_state"""
+        self.generator.bit_generator.state = state['generator']
+        self.values = iter(state['values'])
+
+
+def spawn_streams(seed, n):
+    """
+    Independent child seeds of one episode seed
+    Args:
+        seed: int, np.random.SeedSequence or None, None draws a fresh seed from the OS
+        n: int, number of child seeds
+    Returns:
+        list of np.random.SeedSequence, to seed RandomStreams or NumPy Generators
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return seed.spawn(n)
+
+
+# Stream of agents and optimizers created without one, e.g. outside of a world
+default_stream = RandomStream()
@@ -0,0 +1,218 @@
+# Trajectory recording
+# Opt-in per-tick recording of an episode for analysis: positions, state codes and health of all agents and the events
+# raised in every tick. The worlds write each tick directly into preallocated chunk buffers, full chunks are appended to
+# raw binary files with one write per array, so recording costs a few array copies per tick.
+# An episode is stored as a directory with one file per array and meta.json describing dtypes, shapes, agent names and
+# the results. Trajectory maps the files with np.memmap on first access, so notebooks can list thousands of episodes
+# and only read the ticks they use.
+# State codes are the codes of array_engine (states.STATES), agents are indexed in the order of
+# all_agents(): drones, animals, poachers. Tick 0 is the initial state of the world.
+
+import os
+import json
+import numpy as np
+
+CHUNK_SIZE = 256  # Ticks buffered in memory before they are written
+
+# Arrays recorded once per tick: (dtype, shape per agent, None for one value per tick)
+TICK_ARRAYS = {
+    'steps': (np.int32, None),
+    'position': (np.float32, (2,)),
+    'state': (np.int8, ()),
+    'health': (np.float32, ())
+}
+# Events raised in a tick, agent and other are the two agents named by events.EVENT_FIELDS, e.g. animal and attacking
+# poacher, caught poacher and drone, or detected/lost animal or poacher and drone
+EVENT_DTYPE = np.dtype([('step', np.int32), ('type', np.int16), ('agent', np.int32), ('other', np.int32)])
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            path: str, directory of the recording, created if missing
+            chunk_size: int, number of ticks buffered in memory before they are written
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.meta = None
+        self.buffers = {}
+        self.files = {}
+        self.events = []  # (step, type, agent, other) tuples of the current chunk
+        self.rows = 0  # Filled rows of the current chunk
+        self.n_ticks = 0
+        self.n_events = 0
+
+    def open(self, names, types, map_size, **metadata):
+        """
+        Allocate the chunk buffers and create the files, called by the world that is recorded
+        Args:
+            names: list of str, names of all agents in recording order
+            types: list of (type, count) tuples, e.g. [('drones', 3), ('animals', 8), ('poachers', 2)]
+            map_size: tuple (width, height), boundaries of the map
+            metadata: JSON serializable values stored in meta.json, e.g. engine='array'
+        """
+        os.makedirs(self.path, exist_ok=True)
+        n = len(names)
+        self.meta = {'names': list(names), 'types': [list(t) for t in types], 'map_size': list(map_size), **metadata}
+        for name, (dtype, shape) in TICK_ARRAYS.items():
+            shape = () if shape is None else (n, *shape)
+            self.buffers[name] = np.zeros((self.chunk_size, *shape), dtype=dtype)
+            self.files[name] = open(os.path.join(self.path, f"{name}.bin"), 'wb')
+        self.files['events'] = open(os.path.join(self.path, 'events.bin'), 'wb')
+        return
+
+    def tick(self, step):
+        """
+        Rows of the next tick, the world fills them in place
+        Args:
+            step: int, simulation step of the tick
+        Returns:
+            (position, state, health): np.ndarray views (n, 2), (n,) and (n,)
+        """
+        if self.rows == self.chunk_size:
+            self.flush()
+        row = self.rows
+        self.rows += 1
+        self.n_ticks += 1
+        buffers = self.buffers
+        buffers['steps'][row] = step
+        return buffers['position'][row], buffers['state'][row], buffers['health'][row]
+
+    def add_events(self, step, events):
+        """
+        Args:
+            step: int, simulation step the events were raised in
+            events: iterable of (type, agent, other) tuples, agent indices in recording order, -1 if unknown
+        """
+        self.events.extend((step, type, agent, other) for type, agent, other in events)
+        return
+
+    def flush(self):
+        """Append the buffered ticks and events to the files"""
+        for name, buffer in self.buffers.items():
+            buffer[:self.rows].tofile(self.files[name])
+        if self.events:
+            np.array(self.events, dtype=EVENT_DTYPE).tofile(self.files['events'])
+            self.n_events += len(self.events)
+            self.events = []
+        self.rows = 0
+        return
+
+    def close(self, results=None):
+        """
+        Write the remaining ticks and meta.json
+        Args:
+            results: dict (optional), results of the episode stored in the metadata
+        """
+        if self.meta is None:
+            return
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        self.meta.update({
+            'n_ticks': self.n_ticks,
+            'n_events': self.n_events,
+            'results': results,
+            'dtypes': {name: np.dtype(dtype).str for name, (dtype, _) in TICK_ARRAYS.items()}
+        })
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        self.files = {}
+        return
+
+
+class Trajectory:
+    """Recorded episode, the arrays are memory-mapped on first access"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: str, directory written by a TrajectoryRecorder
+        """
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.arrays = {}
+
+    def __repr__(self):
+        return f"Trajectory({self.path!r}, {self.n_ticks} ticks, {len(self.names)} agents, {self.meta['n_events']} events)"
+
+    @property
+    def names(self):
+        return self.meta['names']
+
+    @property
+    def n_ticks(self):
+        return self.meta['n_ticks']
+
+    @property
+    def results(self):
+        return self.meta['results']
+
+    def array(self, name):
+        """
+        Memory-mapped array of the recording
+        Args:
+            name: str, 'steps' (ticks,), 'position' (ticks, n, 2), 'state' (ticks, n), 'health' (ticks, n) or 'events'
+        Returns:
+            np.ndarray (read-only memmap), events as structured array with the fields of EVENT_DTYPE
+        """
+        if name not in self.arrays:
+            if name == 'events':
+                dtype, shape = EVENT_DTYPE, (self.meta['n_events'],)
+            else:
+                dtype, shape = np.dtype(self.meta['dtypes'][name]), TICK_ARRAYS[name][1]
+                shape = (self.n_ticks,) if shape is None else (self.n_ticks, len(self.names), *shape)
+            if shape[0] == 0:
+                self.arrays[name] = np.empty(shape, dtype=dtype)  # Empty files can't be mapped
+            else:
+                self.arrays[name] = np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode='r', shape=shape)
+        return self.arrays[name]
+
+    @property
+    def steps(self):
+        return self.array('steps')
+
+    @property
+    def position(self):
+        return self.array('position')
+
+    @property
+    def state(self):
+        return self.array('state')
+
+    @property
+    def health(self):
+        return self.array('health')
+
+    @property
+    def events(self):
+        return self.array('events')
+
+    def agents(self, agent_type):
+        """
+        Indices of the agents of one type
+        Args:
+            agent_type: str, 'drones', 'animals' or 'poachers'
+        Returns:
+            slice into the agent axis of the arrays
+        """
+        start = 0
+        for name, count in self.meta['types']:
+            if name == agent_type:
+                return slice(start, start + count)
+            start += count
+        raise KeyError(agent_type)
+
+
+def load_trajectories(directory):
+    """
+    Lazily load all recordings in a directory, e.g. one subdirectory per episode
+    Args:
+        directory: str, parent directory of the recordings
+    Returns:
+        list of Trajectory, sorted by directory name, no array is read until it is accessed
+    """
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+    return [Trajectory(path) for path in paths if os.path.isfile(os.path.join(path, 'meta.json'))]
@@ -0,0 +1,54 @@
+# Experience replay buffer for the RLOptimizer
+# Preallocated ring buffer of (state, action, reward, next_state) experiences stored as NumPy arrays,
+# states as integer state keys and actions as action indexes of the dense Q-table (see q_table.py).
+# Once the buffer is full, new experiences overwrite the oldest ones.
+
+import numpy as np
+
+
+class ReplayBuffer:
+    def __init__(self, capacity, state_size=5):
+        """
+        Args:
+            capacity: int, maximum number of stored experiences
+            state_size: int, number of components of a state key
+        """
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_size), dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.int64)
+        self.position = 0  # Index of the next write
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state):
+        """
+        Store an experience, overwrites the oldest one if the buffer is full
+        Args:
+            state: tuple, state key
+            action: int, action index
+            reward: float
+            next_state: tuple, state key
+        """
+        self.states[self.position] = state
+        self.actions[self.position] = action
+        self.rewards[self.position] = reward
+        self.next_states[self.position] = next_state
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return
+
+    def sample(self, batch_size, rng):
+        """
+        Sample a mini-batch uniformly with replacement
+        Args:
+            batch_size: int
+            rng: np.random.Generator
+        Returns:
+            states, actions, rewards, next_states: arrays of batch_size experiences
+        """
+        index = rng.integers(0, self.size, batch_size)
+        return self.states[index], self.actions[index], self.rewards[index], self.next_states[index]
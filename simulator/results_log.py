@@ -0,0 +1,128 @@
+# Append-only results log of train_optimizer
+# Every finished episode is appended as one JSON line (outcome, steps, percentages, optimizer config, seed, timing)
+# and flushed right away, so a crash only loses the episodes in progress and an interrupted training can be resumed.
+# ResultsReader aggregates the log incrementally: each update only parses the lines appended since the last one, a
+# line still being written (no trailing newline yet) is left for the next update.
+# The aggregated statistics have the format of training_stats.pkl as used by result_analysis.ipynb.
+
+import os
+import json
+
+OUTCOMES = {'victory': 'victories', 'defeat': 'defeats', 'timeout': 'timeouts'}
+
+
+def new_stats():
+    """Empty statistics in the format of training_stats.pkl"""
+    return {
+        'results': [],
+        'poachers_caught_pct': [],
+        'animals_alive_pct': [],
+        'steps_per_run': [],
+        'victories': 0,
+        'defeats': 0,
+        'timeouts': 0
+    }
+
+
+def add_result(stats, result):
+    """Add the results of an episode (results of main.run or a log record) to the statistics"""
+    stats['results'].append(result['outcome'])
+    stats['poachers_caught_pct'].append(result['poachers_caught_pct'])
+    stats['animals_alive_pct'].append(result['animals_alive_pct'])
+    stats['steps_per_run'].append(result['steps'])
+    if result['outcome'] in OUTCOMES:
+        stats[OUTCOMES[result['outcome']]] += 1
+    return
+
+
+class ResultsReader:
+    def __init__(self, filename):
+        """
+        Args:
+            filename: str, results log written by ResultsLog
+        """
+        self.filename = filename
+        self.offset = 0  # Bytes of the log read so far, always at the end of a complete line
+        self.records = []
+        self.stats = new_stats()
+
+    def update(self, last_run=None):
+        """
+        Read the records appended since the last update and add them to the statistics
+        Args:
+            last_run: int (optional), stop before the first record of a later run
+        Returns:
+            list of dict, the new records
+        """
+        if not os.path.exists(self.filename):
+            return []
+        with open(self.filename, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        records, end = [], 0
+        for line in data[:data.rfind(b'\n') + 1].splitlines(keepends=True):  # Ignore an incomplete last line
+            if line.strip():
+                record = json.loads(line)
+                if last_run is not None and record['run'] > last_run:
+                    break
+                records.append(record)
+            end += len(line)
+        self.offset += end
+        for record in records:
+            add_result(self.stats, record)
+        self.records.extend(records)
+        return records
+
+    def completed_runs(self):
+        """Run numbers of the episodes in the log"""
+        return {record['run'] for record in self.records}
+
+
+class ResultsLog:
+    def __init__(self, filename, resume=False, last_run=None, overwrite=False):
+        """
+        Args:
+            filename: str, file of the log
+            resume: bool, keep the records of an existing log and append to it, otherwise a new log is started
+            last_run: int (optional), when resuming: drop the records of later runs, e.g. runs after the last checkpoint
+            overwrite: bool, without resume: replace an existing log, otherwise FileExistsError is raised
+        """
+        self.filename = filename
+        self.reader = ResultsReader(filename)
+        if resume:
+            # Drop a line that was cut off by a crash, the next record starts on a new line
+            self.reader.update(last_run)
+            if os.path.exists(filename):
+                os.truncate(filename, self.reader.offset)
+        self.file = open(filename, 'a' if resume else 'w' if overwrite else 'x')
+
+    @property
+    def stats(self):
+        """Statistics of the records of a resumed log, the caller adds new records with add_result"""
+        return self.reader.stats
+
+    def completed_runs(self):
+        return self.reader.completed_runs()
+
+    def append(self, record):
+        """Write a record and flush it to the file"""
+        self.file.write(json.dumps(record, default=repr) + '\n')
+        self.file.flush()
+        return
+
+    def close(self):
+        self.file.close()
+        return
+
+
+def load_stats(filename):
+    """
+    Statistics of a results log in the format of training_stats.pkl
+    Args:
+        filename: str, results log written by ResultsLog
+    Returns:
+        stats: dict, see new_stats
+    """
+    reader = ResultsReader(filename)
+    reader.update()
+    return reader.stats
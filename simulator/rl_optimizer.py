@@ -1,12 +1,15 @@
-import pygame
-import random
 import numpy as np
 import pickle
 import os
 from collections import deque
+from vector import Vector2
 from optimizer import DroneOptimizer
 from states import DroneFastSearch, DroneDeepSearch
 from events import DRONE_CAUGHT_POACHER
+from q_table import DenseQTable
+from replay_buffer import ReplayBuffer
+from visit_counts import VisitCounts
+from random_stream import RandomStream
 
 class RLOptimizer(DroneOptimizer):
     """Reinforcement Learning Optimizer"""
@@ -23,7 +26,12 @@ class RLOptimizer(DroneOptimizer):
                  map_width=800,                         # width of the map
                  map_height=600,                        # height of the map
                  grid_x_divisions=16,                   # number of horizontal grid divisions
-                 grid_y_divisions=12                    # number of vertical grid divisions
+                 grid_y_divisions=12,                   # number of vertical grid divisions
+                 dense_q_table=False,                   # store the Q-table in a dense NumPy array instead of a dict
+                 replay_capacity=None,                  # size of the experience replay buffer, None to learn from the latest experience only
+                 replay_batch_size=32,                  # number of experiences sampled per replay update
+                 replay_frequency=4,                    # number of new experiences between replay updates
+                 seed=None                              # seed of the random stream, main.run reseeds it per episode
                  ):  
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
@@ -33,6 +41,7 @@ class RLOptimizer(DroneOptimizer):
         self.catch_threshold = catch_threshold
         self.exploration_bonus_weight = exploration_bonus_weight
         self.exploration_penalty_multiplier = exploration_penalty_multiplier
+        self.rng = RandomStream(seed)
         
         # Map and grid configuration
         self.map_width = map_width
@@ -40,15 +49,38 @@ class RLOptimizer(DroneOptimizer):
         self.grid_x_divisions = grid_x_divisions
         self.grid_y_divisions = grid_y_divisions
         
-        self.q_table = {}  # {state_key: {action_key: q_value}}
+        # Simplified action space - 8 directions × 2 altitudes
+        self.actions = []
+        for direction in [(1,0), (1,1), (0,1), (-1,1), (-1,0), (-1,-1), (0,-1), (1,-1)]:
+            for altitude in [0, 1]:  # 0=high, 1=low
+                self.actions.append((direction[0], direction[1], altitude, 1.0))  # Fixed speed
+        
+        self.dense_q_table = dense_q_table
+        if dense_q_table:
+            self.q_table = DenseQTable(grid_x_divisions, grid_y_divisions, self.actions)
+        else:
+            self.q_table = {}  # {state_key: {action_key: q_value}}
         
         # Track exploration of grid locations
-        self.grid_exploration_count = {}  # {(grid_x, grid_y): visit_count}
+        self.grid_exploration_count = VisitCounts(grid_x_divisions, grid_y_divisions)  # visit count per (grid_x, grid_y)
         self.recent_locations = deque(maxlen=10)  # Track recently visited locations
         
         # Simple experience replay buffer
         self.replay_buffer = deque(maxlen=100)
         
+        # Mini-batch experience replay (optional), works on the integer indexes of the dense Q-table
+        self.experience_replay = None
+        if replay_capacity:
+            if not dense_q_table:
+                raise ValueError("Experience replay requires dense_q_table=True")
+            self.experience_replay = ReplayBuffer(replay_capacity)
+            self.replay_batch_size = replay_batch_size
+            self.replay_frequency = replay_frequency
+            self.experiences_since_replay = 0
+        
+        # Full list of experiences of an episode (optional), collected by training workers to merge them later
+        self.experience_log = None
+        
         # State tracking for each drone
         self.previous_states = {}  # {drone_name: previous_state}
         self.previous_actions = {}  # {drone_name: previous_action}
@@ -56,12 +88,7 @@ class RLOptimizer(DroneOptimizer):
         # Performance metrics
         self.rewards_history = []
         self.episode_step = 0
-        
-        # Simplified action space - 8 directions × 2 altitudes
-        self.actions = []
-        for direction in [(1,0), (1,1), (0,1), (-1,1), (-1,0), (-1,-1), (0,-1), (1,-1)]:
-            for altitude in [0, 1]:  # 0=high, 1=low
-                self.actions.append((direction[0], direction[1], altitude, 1.0))  # Fixed speed
+        self.batch_steps = 0  # Steps of the other worlds of a running batch, counted for the exploration decay in end_batch
     
     def discretize_state(self, drone, detected_animals, detected_poachers):
         """
@@ -87,9 +114,7 @@ class RLOptimizer(DroneOptimizer):
         
         # Track grid exploration
         grid_location = (grid_x, grid_y)
-        if grid_location not in self.grid_exploration_count:
-            self.grid_exploration_count[grid_location] = 0
-        self.grid_exploration_count[grid_location] += 1
+        self.grid_exploration_count.increment(grid_location)
         
         # Update recent locations
         if grid_location not in self.recent_locations:
@@ -148,45 +173,86 @@ class RLOptimizer(DroneOptimizer):
     
     def choose_action(self, state):
         """Select action using epsilon-greedy policy with bias towards unexplored areas"""
+        if self.dense_q_table:
+            return self.choose_action_dense(state)
+        
         # Ensure state has an entry in Q-table
         if state not in self.q_table:
             self.q_table[state] = {}
             
         # Select random action (exploration)
-        if random.random() < self.exploration_rate:
-            return random.choice(self.actions)
+        if self.rng.random() < self.exploration_rate:
+            return self.rng.choice(self.actions)
         
         # Select best action (exploitation)
         if not self.q_table[state]:
-            return random.choice(self.actions)
+            return self.rng.choice(self.actions)
         
         # Bias towards less explored locations
         grid_location = (state[0], state[1])
         
         # If current location is one of the least visited, prioritize it
-        sorted_locations = sorted(self.grid_exploration_count.items(), key=lambda x: x[1])
-        least_visited_locations = [loc for loc, _ in sorted_locations[:3]]
+        least_visited_locations = [loc for loc, _ in self.grid_exploration_count.least_visited(3)]
         
         if grid_location in least_visited_locations:
             # Increase probability of choosing an action that keeps us in this location
             actions_in_state = [action for action in self.q_table[state].keys()]
-            return max(actions_in_state, key=lambda a: self.q_table[state].get(a, 0) + random.random())
+            return max(actions_in_state, key=lambda a: self.q_table[state].get(a, 0) + self.rng.random())
         
         # Normal action selection
         return max(self.q_table[state], key=self.q_table[state].get)
+    
+    def choose_action_dense(self, state):
+        """choose_action for the dense Q-table"""
+        # Select random action (exploration)
+        if self.rng.random() < self.exploration_rate:
+            return self.rng.choice(self.actions)
         
-    def optimize(self, drones, detected_animals, detected_poachers):
-        drone_actions = {}
-        self.episode_step += 1
+        # Select best action (exploitation)
+        if not self.q_table.has_values(state):
+            return self.rng.choice(self.actions)
         
-        # Decay exploration periodically
-        if self.episode_step >= 100:
-            self.episode_step = 0
+        # If current location is one of the least visited, add noise to the Q-values to stay in this location
+        least_visited_locations = [loc for loc, _ in self.grid_exploration_count.least_visited(3)]
+        if (state[0], state[1]) in least_visited_locations:
+            known_actions = int((self.q_table.values[state] > -np.inf).sum())
+            return self.q_table.best_action(state, noise=np.array([self.rng.random() for _ in range(known_actions)]))
+        
+        # Normal action selection
+        return self.q_table.best_action(state)
+        
+    def advance_episode_step(self, steps=1):
+        """Count optimize steps for the exploration decay, the exploration rate decays every 100 steps"""
+        total_steps = self.episode_step + steps
+        for _ in range(total_steps // 100):
             self.exploration_rate = max(
                 self.min_exploration_rate, 
                 self.exploration_rate * self.exploration_decay
             )
-        
+        self.episode_step = total_steps % 100
+    
+    def optimize(self, drones, detected_animals, detected_poachers):
+        # Decay exploration periodically
+        self.advance_episode_step()
+        return self.act(drones, detected_animals, detected_poachers)
+    
+    def optimize_batch(self, drones, detected_animals, detected_poachers):
+        """
+        optimize for a batch of worlds advanced in lockstep. All worlds of a tick act with the same exploration rate, the
+        decay advances once per tick like in a single episode, the steps of the other worlds are caught up with in end_batch.
+        """
+        self.advance_episode_step()
+        self.batch_steps += len(drones) - 1
+        return [self.act(*world) for world in zip(drones, detected_animals, detected_poachers)]
+    
+    def end_batch(self):
+        """Advance the exploration decay by the steps of the other worlds of the finished batch"""
+        self.advance_episode_step(self.batch_steps)
+        self.batch_steps = 0
+    
+    def act(self, drones, detected_animals, detected_poachers):
+        """Q-learning update and next action of every drone of one world, optimize without the exploration decay"""
+        drone_actions = {}
         for drone in drones:
             # Check if drone can catch any poachers - with probability based on distance
             if isinstance(drone.active_state, DroneDeepSearch):  # Only catch in low altitude
@@ -199,10 +265,9 @@ class RLOptimizer(DroneOptimizer):
                         catch_probability = 1.0 - (distance / self.catch_threshold) * 0.8
                         
                         # Roll the dice to see if catch succeeds
-                        if random.random() < catch_probability:
+                        if self.rng.random() < catch_probability:
                             # Post the caught poacher event
-                            catch_event = pygame.event.Event(DRONE_CAUGHT_POACHER, {'poacher': poacher})
-                            pygame.event.post(catch_event)
+                            drone.event_bus.emit(DRONE_CAUGHT_POACHER, poacher, drone)
                             # Add extra reward for catching a poacher
                             if drone.name in self.previous_states:
                                 self.rewards_history.append(10)  # Big reward for catch
@@ -221,8 +286,11 @@ class RLOptimizer(DroneOptimizer):
                 reward = self.calculate_reward(drone, detected_animals, detected_poachers)
                 
                 # Store experience and update Q-table immediately
-                self.replay_buffer.append((prev_state, prev_action, reward, current_state))
+                experience = (prev_state, prev_action, reward, current_state)
+                self.replay_buffer.append(experience)
                 self.update_q_table()
+                if self.experience_log is not None:
+                    self.experience_log.append(experience)
                 
                 # Track rewards
                 self.rewards_history.append(reward)
@@ -248,6 +316,24 @@ class RLOptimizer(DroneOptimizer):
         experience = self.replay_buffer[-1]
         state, action, reward, next_state = experience
         
+        if self.experience_replay is not None:
+            # Store the experience and learn from a sampled mini-batch every replay_frequency experiences
+            self.experience_replay.add(state, self.q_table.action_index[action], reward, next_state)
+            self.experiences_since_replay += 1
+            if self.experiences_since_replay >= self.replay_frequency:
+                self.experiences_since_replay = 0
+                self.replay_update()
+            return
+        
+        if self.dense_q_table:
+            # Initialize Q-value first, it counts for the max Q-value if next_state is the same state
+            current_q = self.q_table.get(state, action)
+            self.q_table.set(state, action, current_q)
+            self.q_table.set(state, action, current_q + self.learning_rate * (
+                reward + self.discount_factor * self.q_table.max_value(next_state) - current_q
+            ))
+            return
+        
         # Initialize Q-values if needed
         if state not in self.q_table:
             self.q_table[state] = {}
@@ -266,9 +352,31 @@ class RLOptimizer(DroneOptimizer):
             reward + self.discount_factor * next_max_q - current_q
         )
 
+    def replay_update(self):
+        """Vectorized Q-learning update with a mini-batch sampled from the experience replay buffer"""
+        states, actions, rewards, next_states = self.experience_replay.sample(self.replay_batch_size, self.rng.generator)
+        values = self.q_table.values
+        index = tuple(states.T) + (actions,)
+        
+        # Initialize Q-values first, like the single experience update, in the sampled order so the actions are ranked
+        # in the order their values were first set
+        current_q = values[index]
+        for i in np.flatnonzero(current_q == -np.inf):
+            self.q_table.set(tuple(states[i]), self.actions[actions[i]], 0.0)
+        current_q = np.where(current_q == -np.inf, 0.0, current_q)
+        
+        # TD errors of all sampled experiences against the Q-values before the update
+        td_error = rewards + self.discount_factor * self.q_table.max_values(next_states) - current_q
+        
+        # Average the TD errors of experiences sampled more than once, so they count like a single update
+        flat_index = np.ravel_multi_index(index, values.shape)
+        unique_index, inverse = np.unique(flat_index, return_inverse=True)
+        mean_td_error = np.bincount(inverse, weights=td_error) / np.bincount(inverse)
+        values.flat[unique_index] += self.learning_rate * mean_td_error
+        
     def action_to_params(self, action, drone):
         """Convert discrete action to continuous parameters"""
-        direction = pygame.Vector2(action[0], action[1])
+        direction = Vector2(action[0], action[1])
         if direction.length() > 0:
             direction.normalize()
             
@@ -308,8 +416,8 @@ class RLOptimizer(DroneOptimizer):
             "exploration_rate": self.exploration_rate,
             "q_table_size": len(self.q_table),
             "unique_grid_locations": len(self.grid_exploration_count),
-            "grid_exploration": dict(sorted(self.grid_exploration_count.items(), key=lambda x: x[1], reverse=True)[:5]),
-            "least_visited_locations": dict(sorted(self.grid_exploration_count.items(), key=lambda x: x[1])[:5]),
+            "grid_exploration": dict(self.grid_exploration_count.most_visited(5)),
+            "least_visited_locations": dict(self.grid_exploration_count.least_visited(5)),
             "grid_configuration": {
                 "map_width": self.map_width,
                 "map_height": self.map_height,
@@ -318,29 +426,176 @@ class RLOptimizer(DroneOptimizer):
             }
         }
     
-    def save_model(self, filename='rl_model.pkl'):
-        """Save the Q-table and learning parameters to a file"""
-        model_data = {
+    def get_model_data(self):
+        """Return the Q-table and learning parameters as a picklable dict"""
+        return {
             'q_table': self.q_table,
             'exploration_rate': self.exploration_rate,
-            'grid_exploration_count': self.grid_exploration_count,
+            'grid_exploration_count': self.grid_exploration_count.to_dict(),
             'rewards_history': self.rewards_history,
             'episode_step': self.episode_step
         }
+    
+    def get_worker_data(self):
+        """
+        Model an episode of a training worker starts from, get_model_data without the rewards history, which grows with
+        every episode and isn't needed to act or learn. The worker returns its new rewards with the rollout.
+        """
+        return {
+            'q_table': self.q_table,
+            'exploration_rate': self.exploration_rate,
+            'grid_exploration_count': self.grid_exploration_count.to_dict(),
+            'episode_step': self.episode_step
+        }
+    
+    def set_model_data(self, model_data):
+        """Set the Q-table and learning parameters from a dict created by get_model_data or get_worker_data"""
+        self.q_table = self.convert_q_table(model_data['q_table'])
+        self.exploration_rate = model_data['exploration_rate']
+        self.grid_exploration_count = VisitCounts.from_dict(
+            model_data['grid_exploration_count'], self.grid_x_divisions, self.grid_y_divisions)
+        self.rewards_history = model_data.get('rewards_history', [])
+        self.episode_step = model_data['episode_step']
+    
+    def checkpoint_data(self):
+        """
+        Model as compact arrays for checkpoint.write_checkpoint, a dict Q-table is stored as state keys, action indexes
+        and values, the visit counts as cells and counts in the order of their first visit.
+        The state carried from one episode to the next (last state and action per drone, recent locations, replay buffers)
+        is included, so a training resumed from a checkpoint continues exactly
+        Returns:
+            (arrays, header): dict {name: np.ndarray} and dict of scalars
+        """
+        arrays = {'rewards_history': np.array(self.rewards_history, dtype=float)}
+        if self.dense_q_table:
+            arrays['q_values'] = np.asarray(self.q_table.values)
+            arrays['q_order'] = np.asarray(self.q_table.order)
+        else:
+            rows = [(state, self.actions.index(action), value)
+                    for state, q_values in self.q_table.items() for action, value in q_values.items()]
+            arrays['q_states'] = np.array([state for state, _, _ in rows], dtype=np.int16).reshape(-1, 5)
+            arrays['q_actions'] = np.array([action for _, action, _ in rows], dtype=np.int8)
+            arrays['q_values'] = np.array([value for _, _, value in rows], dtype=float)
+        visits = self.grid_exploration_count.to_dict()
+        arrays['visit_cells'] = np.array(list(visits), dtype=np.int16).reshape(-1, 2)
+        arrays['visit_counts'] = np.array(list(visits.values()), dtype=np.int64)
+        
+        # Experiences as (state, action index, reward, next state) columns
+        experiences = [(state, self.actions.index(action), reward, next_state)
+                       for state, action, reward, next_state in self.replay_buffer]
+        arrays['replay_states'] = np.array([e[0] for e in experiences], dtype=np.int16).reshape(-1, 5)
+        arrays['replay_actions'] = np.array([e[1] for e in experiences], dtype=np.int8)
+        arrays['replay_rewards'] = np.array([e[2] for e in experiences], dtype=float)
+        arrays['replay_next_states'] = np.array([e[3] for e in experiences], dtype=np.int16).reshape(-1, 5)
+        if self.experience_replay is not None:
+            for name in ('states', 'actions', 'rewards', 'next_states'):
+                arrays[f'experience_replay_{name}'] = getattr(self.experience_replay, name)
+        
+        header = {
+            'dense_q_table': self.dense_q_table,
+            'exploration_rate': self.exploration_rate,
+            'episode_step': self.episode_step,
+            'previous': {name: [state, self.actions.index(self.previous_actions[name])]
+                         for name, state in self.previous_states.items()},
+            'recent_locations': list(self.recent_locations)
+        }
+        if self.experience_replay is not None:
+            header['experience_replay'] = [self.experience_replay.position, self.experience_replay.size, self.experiences_since_replay]
+        return arrays, header
+    
+    def restore_checkpoint_data(self, arrays, header):
+        """Set the model from the arrays and header of checkpoint_data, the Q-table is converted to the format of this optimizer"""
+        if header['dense_q_table']:
+            q_table = DenseQTable(self.grid_x_divisions, self.grid_y_divisions, self.actions, arrays['q_values'],
+                                  arrays['q_order'])
+        else:
+            q_table = {}
+            for state, action, value in zip(arrays['q_states'].tolist(), arrays['q_actions'].tolist(), arrays['q_values'].tolist()):
+                q_table.setdefault(tuple(state), {})[self.actions[action]] = value
+        self.set_model_data({
+            'q_table': q_table,
+            'exploration_rate': header['exploration_rate'],
+            'grid_exploration_count': dict(zip(map(tuple, arrays['visit_cells'].tolist()), arrays['visit_counts'].tolist())),
+            'rewards_history': arrays['rewards_history'].tolist(),
+            'episode_step': header['episode_step']
+        })
+        self.previous_states = {name: tuple(state) for name, (state, _) in header['previous'].items()}
+        self.previous_actions = {name: self.actions[action] for name, (_, action) in header['previous'].items()}
+        self.recent_locations = deque(map(tuple, header['recent_locations']), maxlen=self.recent_locations.maxlen)
+        experiences = zip(arrays['replay_states'].tolist(), arrays['replay_actions'].tolist(), arrays['replay_rewards'].tolist(),
+                          arrays['replay_next_states'].tolist())
+        self.replay_buffer = deque(((tuple(state), self.actions[action], reward, tuple(next_state))
+                                    for state, action, reward, next_state in experiences), maxlen=self.replay_buffer.maxlen)
+        if self.experience_replay is not None and 'experience_replay' in header:
+            for name in ('states', 'actions', 'rewards', 'next_states'):
+                setattr(self.experience_replay, name, arrays[f'experience_replay_{name}'])
+            self.experience_replay.position, self.experience_replay.size, self.experiences_since_replay = header['experience_replay']
+    
+    def convert_q_table(self, q_table):
+        """Convert a Q-table of either format to the format of this optimizer"""
+        if self.dense_q_table and isinstance(q_table, dict):
+            return DenseQTable.from_dict(q_table, self.grid_x_divisions, self.grid_y_divisions, self.actions)
+        if not self.dense_q_table and isinstance(q_table, DenseQTable):
+            return q_table.to_dict()
+        return q_table
+    
+    def merge_rollout(self, rollout):
+        """
+        Merge the experiences of an episode run by another optimizer (e.g. in a training worker)
+        Args:
+            rollout: dict with
+                'experiences': list of (state, action, reward, next_state) in the order they were made
+                'grid_visits': dict {(grid_x, grid_y): additional visit count}
+                'rewards': list of rewards collected during the episode
+                'optimize_steps': int, number of optimize calls of the episode
+        """
+        # Replay the experiences through the Q-learning update
+        for experience in rollout['experiences']:
+            self.replay_buffer.append(experience)
+            self.update_q_table()
+        
+        # Add grid visits and rewards
+        for grid_location, visits in rollout['grid_visits'].items():
+            self.grid_exploration_count.increment(grid_location, visits)
+        self.rewards_history.extend(rollout['rewards'])
+        
+        # Advance the exploration decay as if the optimize calls were made here
+        self.advance_episode_step(rollout['optimize_steps'])
+    
+    def save_model(self, filename='rl_model.pkl'):
+        """
+        Save the Q-table and learning parameters to a file.
+        A dense Q-table is saved next to it as .npy file (<filename without extension>_q_table.npy, its action ranks
+        as <filename without extension>_q_table_order.npy), the model file then only stores the name of that file.
+        """
+        model_data = self.get_model_data()
+        if self.dense_q_table:
+            q_table_filename = os.path.splitext(filename)[0] + '_q_table.npy'
+            self.q_table.save(q_table_filename)
+            model_data = dict(model_data, q_table=os.path.basename(q_table_filename))
         with open(filename, 'wb') as f:
             pickle.dump(model_data, f)
         # print(f"Model saved to {filename}")
     
-    def load_model(self, filename='rl_model.pkl'):
-        """Load the Q-table and learning parameters from a file"""
+    def load_model(self, filename='rl_model.pkl', mmap_mode=None):
+        """
+        Load the Q-table and learning parameters from a file
+        Args:
+            filename: str, model file written by save_model
+            mmap_mode: str (optional), memory-map a dense Q-table (see np.load), e.g. 'c' to evaluate a large model:
+                the Q-table is updated every step, the updates stay in memory and the file is not changed
+        """
+        if mmap_mode == 'r':
+            raise ValueError("The Q-table is updated every step and can't be mapped read-only, use mmap_mode='c'")
         if os.path.exists(filename):
             with open(filename, 'rb') as f:
                 model_data = pickle.load(f)
-                self.q_table = model_data['q_table']
-                self.exploration_rate = model_data['exploration_rate']
-                self.grid_exploration_count = model_data['grid_exploration_count']
-                self.rewards_history = model_data['rewards_history']
-                self.episode_step = model_data['episode_step']
+            if isinstance(model_data['q_table'], str):
+                # Dense Q-table saved as .npy file next to the model file
+                q_table_filename = os.path.join(os.path.dirname(filename), model_data['q_table'])
+                model_data['q_table'] = DenseQTable.load(
+                    q_table_filename, self.grid_x_divisions, self.grid_y_divisions, self.actions, mmap_mode=mmap_mode)
+            self.set_model_data(model_data)
             # print(f"Model loaded from {filename}")
             return True
         return False
\ No newline at end of file
@@ -0,0 +1,146 @@
+# Scenarios of the simulation
+# A Scenario describes the agent population and the map of a world: (name, x, y) tuples for drones, animals and
+# poachers as taken by World and ArrayWorld, and the map size. Scenarios can be written by hand, loaded from JSON files
+# or generated procedurally for load tests: herds are placed around seeded herd centers and all positions of a type are
+# drawn with one NumPy call, no agent objects or pygame surfaces are created until a world is built from the scenario.
+#
+# Usage: python scenario.py <output.json> [n_herds] [herd_size] [n_poachers] [n_drones] [map_width] [map_height] [seed]
+
+import sys
+import json
+import numpy as np
+
+from settings import GAME_WIDTH, HEIGHT
+from world import DEFAULT_DRONES, DEFAULT_ANIMALS, DEFAULT_POACHERS
+
+SPECIES = ['elephant', 'giraffe', 'zebra', 'rhino', 'buffalo', 'lion']
+
+
+class Scenario:
+    def __init__(self, drones=DEFAULT_DRONES, animals=DEFAULT_ANIMALS, poachers=DEFAULT_POACHERS, map_width=GAME_WIDTH, map_height=HEIGHT):
+        """
+        Args:
+            drones: list of (name, x, y) tuples
+            animals: list of (name, x, y) tuples
+            poachers: list of (name, x, y) tuples
+            map_width: float, width of the map
+            map_height: float, height of the map
+        """
+        self.drones = [tuple(agent) for agent in drones]
+        self.animals = [tuple(agent) for agent in animals]
+        self.poachers = [tuple(agent) for agent in poachers]
+        self.map_width = map_width
+        self.map_height = map_height
+
+    def __iter__(self):
+        # Unpacks like the (drones, animals, poachers) tuples taken by main.run, World(*scenario) works for both
+        return iter((self.drones, self.animals, self.poachers))
+
+    @property
+    def map_size(self):
+        return (self.map_width, self.map_height)
+
+    def __repr__(self):
+        return (f"Scenario({len(self.drones)} drones, {len(self.animals)} animals, {len(self.poachers)} poachers, "
+                f"{self.map_width}x{self.map_height} map)")
+
+    @classmethod
+    def generate(cls, n_herds=10, herd_size=8, n_poachers=5, n_drones=3, map_width=GAME_WIDTH, map_height=HEIGHT,
+                 herd_spread=15, seed=None):
+        """
+        Procedurally generate a scenario with seeded herd placement
+        Args:
+            n_herds: int, number of herds
+            herd_size: int or (min, max) tuple, number of animals per herd, a range is sampled per herd (inclusive)
+            n_poachers: int, number of poachers, placed uniformly on the map
+            n_drones: int, number of drones, spread over a regular grid to cover the map
+            map_width: float, width of the map
+            map_height: float, height of the map
+            herd_spread: float, standard deviation of the animal positions around their herd center
+            seed: int (optional), seed of the placement, equal seeds generate equal scenarios
+        Returns:
+            scenario: Scenario
+        """
+        rng = np.random.default_rng(seed)
+        map_size = np.array([map_width, map_height], dtype=float)
+
+        # Herds: centers keep a margin to the map border, the animals of a herd scatter normally around the center
+        if np.isscalar(herd_size):
+            sizes = np.full(n_herds, herd_size)
+        else:
+            sizes = rng.integers(herd_size[0], herd_size[1] + 1, n_herds)
+        margin = np.minimum(3 * herd_spread, map_size / 4)
+        centers = rng.uniform(margin, map_size - margin, (n_herds, 2))
+        herd = np.repeat(np.arange(n_herds), sizes)
+        animal_positions = np.clip(centers[herd] + rng.normal(0, herd_spread, (len(herd), 2)), 0, map_size)
+
+        # Animals are named after the species and index of their herd, e.g. 'zebra12-3'
+        first = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(int)
+        member = np.arange(len(herd)) - first[herd]
+        animal_names = [f"{SPECIES[h % len(SPECIES)]}{h}-{m}" for h, m in zip(herd.tolist(), member.tolist())]
+
+        # Poachers anywhere on the map
+        poacher_positions = rng.uniform(0, map_size, (n_poachers, 2))
+
+        # Drones in the centers of the cells of a grid with about the aspect ratio of the map
+        columns = max(1, int(np.ceil(np.sqrt(n_drones * map_width / map_height))))
+        rows = int(np.ceil(n_drones / columns))
+        cell = np.arange(n_drones)
+        drone_positions = np.column_stack(((cell % columns + 0.5) * map_width / columns,
+                                           (cell // columns + 0.5) * map_height / rows))
+
+        def agents(names, positions):
+            return [(name, x, y) for name, (x, y) in zip(names, positions.tolist())]
+        return cls(agents([f"drone{i + 1}" for i in range(n_drones)], drone_positions),
+                   agents(animal_names, animal_positions),
+                   agents([f"poacher{i + 1}" for i in range(n_poachers)], poacher_positions), map_width, map_height)
+
+    @classmethod
+    def from_dict(cls, description):
+        """
+        Create a scenario from a description, either listing the agents or the parameters of Scenario.generate
+        Args:
+            description: dict, {'drones': [[name, x, y], ...], 'animals': ..., 'poachers': ..., 'map_width': ...,
+                         'map_height': ...} or {'generate': {keyword arguments of Scenario.generate}}
+        Returns:
+            scenario: Scenario
+        """
+        if 'generate' in description:
+            parameters = dict(description['generate'])
+            if isinstance(parameters.get('herd_size'), list):
+                parameters['herd_size'] = tuple(parameters['herd_size'])
+            return cls.generate(**parameters)
+        return cls(description.get('drones', []), description.get('animals', []), description.get('poachers', []),
+                   description.get('map_width', GAME_WIDTH), description.get('map_height', HEIGHT))
+
+    def to_dict(self):
+        return {
+            'map_width': self.map_width,
+            'map_height': self.map_height,
+            'drones': [list(agent) for agent in self.drones],
+            'animals': [list(agent) for agent in self.animals],
+            'poachers': [list(agent) for agent in self.poachers]
+        }
+
+    @classmethod
+    def load(cls, filename):
+        """Load a scenario description from a JSON file"""
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, filename):
+        """Save the agents and map of the scenario as JSON file"""
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python scenario.py <output.json> [n_herds] [herd_size] [n_poachers] [n_drones] [map_width] [map_height] [seed]")
+        sys.exit(1)
+    arguments = [int(argument) for argument in sys.argv[2:9]]
+    names = ['n_herds', 'herd_size', 'n_poachers', 'n_drones', 'map_width', 'map_height', 'seed']
+    scenario = Scenario.generate(**dict(zip(names, arguments)))
+    scenario.save(sys.argv[1])
+    print(f"Saved {scenario} to {sys.argv[1]}")
@@ -7,7 +7,8 @@ GAME_WIDTH = 800
 PANEL_WIDTH = 300
 WIDTH = GAME_WIDTH + PANEL_WIDTH
 HEIGHT = 600
-FPS = 10
+FPS = 10  # Simulation steps per second at 1x speed
+RENDER_FPS = 30  # Cap of the display frame rate, independent of the simulation speed
 
 # Colors
 DRONE_COLOR = (0, 0, 255)  # Blue
@@ -35,3 +36,6 @@ ANIMAL_SCAN_RANGE = 100
 ANIMAL_THREAT_RANGE = 50
 ANIMAL_SEPARATION = 20
 ANIMAL_HEALTH = 100
+
+# Performance Parameters
+SPATIAL_CELL_SIZE = 100  # Cell size of the spatial index used for scans, close to the common scan ranges
@@ -0,0 +1,37 @@
+# World snapshots
+# A snapshot holds the complete state of a World or ArrayWorld between two ticks: agent positions, states and their
+# counters, targets, threats, memories, health, alive groups, pending events, progress and the state of the random
+# stream. Per-agent values are stored in NumPy arrays and agent references as agent indices, the few remaining values
+# (outcome, event log, random stream) in a small dict.
+# World.restore / ArrayWorld.restore reset a world to a snapshot in place, fork creates independent copies for what-if
+# rollouts, and snapshots can be saved to checkpoint and resume long runs.
+
+import pickle
+
+
+class WorldSnapshot:
+    def __init__(self, engine, arrays, data):
+        """
+        Args:
+            engine: str, 'objects' for a World or 'array' for an ArrayWorld
+            arrays: dict {name: np.ndarray}, per-agent state
+            data: dict {name: value}, scalars and small lists
+        """
+        self.engine = engine
+        self.arrays = arrays
+        self.data = data
+
+    def nbytes(self):
+        """Size of the arrays of the snapshot in bytes"""
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def save(self, filename):
+        """Save the snapshot to a file, e.g. as checkpoint of a long run"""
+        with open(filename, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
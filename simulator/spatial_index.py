@@ -0,0 +1,115 @@
+# Uniform grid spatial index over agent positions
+# Agents are binned into square cells, so a scan only has to look at the cells overlapping its scan circle
+# instead of walking the whole group. The index keeps the insertion order of the agents, which lets
+# Agent.scan_surroundings reproduce the exact result (and heap layout) of the brute-force scan.
+
+from settings import SPATIAL_CELL_SIZE
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        """
+        Initialize an empty uniform grid.
+        Args:
+            cell_size: float, edge length of a grid cell, should be close to the typical scan range
+        """
+        self.cell_size = cell_size
+        self.cells = {}  # {(cell_x, cell_y): set of agents}
+        self.agent_cells = {}  # {agent: (cell_x, cell_y)}
+        self.order = {}  # {agent: insertion order}, used to restore the iteration order of the source group
+        self.next_order = 0
+
+        # Usage counters, read by the profiler of the world
+        self.queries = 0
+        self.candidates_returned = 0
+
+    def __len__(self):
+        return len(self.agent_cells)
+
+    def __contains__(self, agent):
+        return agent in self.agent_cells
+
+    def cell_key(self, position):
+        """Return the cell coordinates containing the given position"""
+        return (int(position[0] // self.cell_size), int(position[1] // self.cell_size))
+
+    def rebuild(self, agents):
+        """
+        Rebuild the index from scratch. Called once per tick for each indexed group.
+        Args:
+            agents: iterable of agents, their iteration order is kept for queries
+        """
+        self.cells.clear()
+        self.agent_cells.clear()
+        self.order.clear()
+        self.next_order = 0
+        for agent in agents:
+            self.insert(agent)
+        return
+
+    def insert(self, agent):
+        """Add an agent to the index at its current position"""
+        key = self.cell_key(agent.position)
+        self.cells.setdefault(key, set()).add(agent)
+        self.agent_cells[agent] = key
+        self.order[agent] = self.next_order
+        self.next_order += 1
+        return
+
+    def remove(self, agent):
+        """Remove an agent from the index, ignores agents that are not indexed"""
+        key = self.agent_cells.pop(agent, None)
+        if key is None:
+            return
+        cell = self.cells[key]
+        cell.discard(agent)
+        if not cell:
+            del self.cells[key]
+        del self.order[agent]
+        return
+
+    def update(self, agent):
+        """Move an agent to the cell of its current position. Must be called after the agent moved."""
+        old_key = self.agent_cells.get(agent)
+        if old_key is None:
+            return
+        new_key = self.cell_key(agent.position)
+        if new_key == old_key:
+            return
+
+        # Move agent between cells
+        cell = self.cells[old_key]
+        cell.discard(agent)
+        if not cell:
+            del self.cells[old_key]
+        self.cells.setdefault(new_key, set()).add(agent)
+        self.agent_cells[agent] = new_key
+        return
+
+    def query(self, position, radius, ordered=True):
+        """
+        Collect all agents in the cells overlapping the circle around position.
+        The result is a superset of the agents within radius, the exact distance check is left to the caller.
+        Args:
+            position: pygame.Vector2, center of the query
+            radius: float, query radius
+            ordered: bool, restore the insertion order, callers that don't depend on the order can skip the sort
+        Returns:
+            candidates: list of agents in insertion order, in arbitrary order if not ordered
+        """
+        min_x, min_y = self.cell_key((position[0] - radius, position[1] - radius))
+        max_x, max_y = self.cell_key((position[0] + radius, position[1] + radius))
+
+        candidates = []
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                cell = self.cells.get((cell_x, cell_y))
+                if cell:
+                    candidates.extend(cell)
+
+        # Restore the iteration order of the source group
+        if ordered:
+            candidates.sort(key=self.order.__getitem__)
+        self.queries += 1
+        self.candidates_returned += len(candidates)
+        return candidates
@@ -1,32 +1,47 @@
 # defines the high-level state representation in the simulation. 
 
-import pygame
-import random
 import math
 
+from vector import Vector2
 from events import POACHER_ATTACK_ANIMAL, DRONE_CAUGHT_POACHER
 from settings import FPS
 
 class State:
-    def __init__(self, speed_modifier=1.0, scan_range_modifier=1.0, detection_probability=1.0):
-        self.agent = None
-        self.speed_modifier = speed_modifier
-        self.scan_range_modifier = scan_range_modifier
-        self.detection_probability = detection_probability
-    
+    """
+    Behavior of an agent in one state.
+    States are shared, stateless singletons: calling a state class returns its only instance, the per-agent data of a
+    state (search pattern, attack time) lives on the agent, which is passed to every method.
+    Each state is identified by a small integer code, its index in STATES, as used by the array engine and recorder.
+    """
+    __slots__ = ()
+    code = None
+    speed_modifier = 1.0
+    scan_range_modifier = 1.0
+    detection_probability = 1.0
+
+    def __new__(cls):
+        instance = cls.__dict__.get('instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            cls.instance = instance
+        return instance
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
     def enter(self, agent):
         """Called when an agent enters this state"""
-        self.agent = agent
+        pass
         
-    def exit(self):
+    def exit(self, agent):
         """Called when an agent exits this state"""
-        self.agent = None
+        pass
     
-    def action(self):
+    def action(self, agent):
         """Action logic for this state, to be implemented by subclasses"""
         pass
     
-    def check_transition(self):
+    def check_transition(self, agent):
         """
         Check if the agent can transition to another state, to be implemented by subclasses
         Returns:
@@ -37,82 +52,91 @@ class State:
 
 # Drone states
 class DroneFastSearch(State):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
+    code = 0
         
-    def action(self, direction, speed_optimizer):
+    def action(self, agent, direction, speed_optimizer):
         # Calculate correct speed & move agent
-        speed = min(self.agent.base_speed * speed_optimizer, self.agent.base_speed * self.speed_modifier)
-        self.agent.move(direction, speed)
+        speed = min(agent.base_speed * speed_optimizer, agent.base_speed * self.speed_modifier)
+        agent.move(direction, speed)
         return
 
-    def check_transition(self):
+    def check_transition(self, agent):
         # always true for low altitude state
         return DroneDeepSearch()
 
 
 class DroneDeepSearch(State):
-    def __init__(self):
-        super().__init__(speed_modifier=0.7, scan_range_modifier=0.5, detection_probability=0.9)
+    __slots__ = ()
+    code = 1
+    speed_modifier = 0.7
+    scan_range_modifier = 0.5
+    detection_probability = 0.9
 
-    def action(self, direction, speed_optimizer):
+    def action(self, agent, direction, speed_optimizer):
         # Calculate correct speed & move agent
-        speed = min(self.agent.base_speed * speed_optimizer, self.agent.base_speed * self.speed_modifier)
-        self.agent.move(direction, speed)
+        speed = min(agent.base_speed * speed_optimizer, agent.base_speed * self.speed_modifier)
+        agent.move(direction, speed)
         
         # If has target and in range, catch
-        if self.agent.target:
-            distance = self.agent.position.distance_to(self.agent.target.position)
-            if distance < self.agent.catch_range:
-                catch_event = pygame.event.Event(DRONE_CAUGHT_POACHER, {'poacher': self.agent.target, 'drone': self.agent})
-                pygame.event.post(catch_event)
-                self.agent.target = None      
+        if agent.target:
+            distance = agent.position.distance_to(agent.target.position)
+            if distance < agent.catch_range:
+                agent.event_bus.emit(DRONE_CAUGHT_POACHER, agent.target, agent)
+                agent.target = None      
         return
 
-    def check_transition(self):
+    def check_transition(self, agent):
         # always true for high altitude state
         return DroneFastSearch()
 
 
 # Animal states
 class AnimalIdle(State):
-    def __init__(self):
-        super().__init__(speed_modifier=0.5)
-        self.herd_cohesion=0.8
-        self.separation_weight = 1.2
-        self.random_weight = 0.3
+    __slots__ = ()
+    code = 2
+    speed_modifier = 0.5
+    herd_cohesion = 0.8
+    separation_weight = 1.2
+    random_weight = 0.3
         
-    def action(self):
+    def action(self, agent):
         # Random grazing movement, tendency to stay with herd
+        # Herds tracked as connected groups, the herd center is looked up
+        if agent.herds is not None:
+            direction = self.herd_direction(agent, agent.herds)
+
         # No herd members, move randomly
-        if not self.agent.herd:
-            direction = pygame.Vector2(random.randint(-1, 1), random.randint(-1, 1))
+        elif not agent.herd:
+            rng = agent.rng
+            direction = Vector2(rng.randint(-1, 1), rng.randint(-1, 1))
 
         # If herd members are present, calculate cohesion and separation vectors
         else:
-            cohesion_vector = pygame.Vector2(0, 0)
-            herd_center = pygame.Vector2(0, 0)
-            separation_vector = pygame.Vector2(0, 0)
-            random_vector = pygame.Vector2(random.uniform(-1, 1), random.uniform(-1, 1))
+            cohesion_vector = Vector2(0, 0)
+            herd_center = Vector2(0, 0)
+            separation_vector = Vector2(0, 0)
+            rng = agent.rng
+            random_vector = Vector2(rng.uniform(-1, 1), rng.uniform(-1, 1))
             
             # Calculate vectors for each herd member            
-            for animal in self.agent.herd:
+            for animal in agent.herd:
                 # Calculate herd center for cohesion vector
                 herd_center += animal.position
                 
                 # Check distance to animal for separation vector
-                distance = self.agent.position.distance_to(animal.position)
-                if distance < self.agent.separation:
+                distance = agent.position.distance_to(animal.position)
+                if distance < agent.separation:
                     
                     # Move away from the other animal
-                    away_vector = self.agent.position - animal.position
+                    away_vector = agent.position - animal.position
                     if away_vector.length() > 0:
 
                         # The closer the other animal, the stronger the separation force
                         separation_vector += away_vector / max(1, distance)
 
             # Calculate cohesion vector from herd center
-            cohesion_vector = herd_center / len(self.agent.herd) - self.agent.position
+            cohesion_vector = herd_center / len(agent.herd) - agent.position
             if cohesion_vector.length() > 0:
                 cohesion_vector.normalize_ip()
             
@@ -124,18 +148,59 @@ class AnimalIdle(State):
                 )
 
         # Move agent in the given direction
-        self.agent.move(direction, mode='direction')
+        agent.move(direction, mode='direction')
         return
+
+    def herd_direction(self, agent, herds):
+        """
+        Grazing direction of an animal in a herd tracked by a HerdTracker, same forces as with the herd list
+        Args:
+            agent: Animal
+            herds: HerdTracker, provides the herd center and the close neighbors of the animal
+        Returns:
+            Vector2, direction to move in
+        """
+        rng = agent.rng
+        center = herds.center(agent)
+        if center is None:
+            return Vector2(rng.randint(-1, 1), rng.randint(-1, 1))
+        random_vector = Vector2(rng.uniform(-1, 1), rng.uniform(-1, 1))
+
+        # Cohesion towards the center of the other herd members
+        cohesion_vector = Vector2(center) - agent.position
+        if cohesion_vector.length() > 0:
+            cohesion_vector.normalize_ip()
+
+        # Separation from the close neighbors, summed exactly as the neighbors are kept in a set
+        # Computed on the tracked positions with the float operations of the Vector2 version
+        positions = herds.positions
+        x, y = positions[agent]
+        forces_x, forces_y = [], []
+        for animal in herds.close[agent]:
+            other_x, other_y = positions[animal]
+            away_x, away_y = x - other_x, y - other_y
+            distance = math.sqrt(away_x * away_x + away_y * away_y)
+            if distance > 0:
+                inverse = 1 / max(1, distance)
+                forces_x.append(away_x * inverse)
+                forces_y.append(away_y * inverse)
+        separation_vector = Vector2(math.fsum(forces_x), math.fsum(forces_y))
+
+        return (
+            cohesion_vector * self.herd_cohesion +
+            separation_vector * self.separation_weight +
+            random_vector * self.random_weight
+            )
     
-    def check_transition(self):
+    def check_transition(self, agent):
         # Check if agent has a threat in sight
-        if self.agent.threat:
+        if agent.threat:
 
             # Check distance to threat
-            distance = self.agent.position.distance_to(self.agent.threat.position)
+            distance = agent.position.distance_to(agent.threat.position)
             
             # If threat is close enough, transition to fleeing state
-            if distance < self.agent.threat_range:
+            if distance < agent.threat_range:
                 return AnimalFleeing()
         
         # Stay in Idle state if no threat is in sight or not in range
@@ -143,26 +208,27 @@ class AnimalIdle(State):
             
 
 class AnimalFleeing(State):
-    def __init__(self):
-        super().__init__(speed_modifier=1.0)
-        self.herd_cohesion = 0
+    __slots__ = ()
+    code = 3
+    speed_modifier = 1.0
+    herd_cohesion = 0
 
-    def action(self):
+    def action(self, agent):
         # Fast movement away from threat
         # Caclulate direction to flee from threat
-        direction = pygame.Vector2(self.agent.position - self.agent.threat.position)
+        direction = Vector2(agent.position - agent.threat.position)
 
         # Move agent in the opposite direction
-        self.agent.move(direction, mode='direction')
+        agent.move(direction, mode='direction')
         return
         
-    def check_transition(self):
+    def check_transition(self, agent):
         # Check if agent has a threat in sight
-        if self.agent.threat:
+        if agent.threat:
 
             # Calc distance to threat & check if close enough to keep fleeing
-            distance = self.agent.position.distance_to(self.agent.threat.position)
-            if distance < self.agent.threat_range:
+            distance = agent.position.distance_to(agent.threat.position)
+            if distance < agent.threat_range:
                 return None # Transition to dead state triggered by event and not self-check
         
         # Transition to Idle state if threat is lost or not in range
@@ -178,43 +244,47 @@ class PoacherIdle(State):
     If no memory exists, move in strategic search pattern (expanding circles)
     """
     
-    def __init__(self):
-        super().__init__(speed_modifier=0.5, scan_range_modifier=1.0, detection_probability=1.0)
-        self.search_time = 0
-        self.time_since_direction_change = 0
-        self.search_angle = random.randint(0, 360)
-        self.max_interval = FPS * 5  # Change direction every 3 seconds
-
-    def action(self):
+    __slots__ = ()
+    code = 4
+    speed_modifier = 0.5
+    max_interval = FPS * 5  # Change direction every 3 seconds
+
+    def enter(self, agent):
+        # Restart the search pattern, random start direction drawn from the stream of the agent's world
+        agent.search_time = 0
+        agent.time_since_direction_change = 0
+        agent.search_angle = agent.rng.randint(0, 360)
+
+    def action(self, agent):
         # If memory of animal locations, move towards the most recent memory
-        if self.agent.memory:
+        if agent.memory:
             # Get the most recent memory & move towards it
-            target_position = self.agent.memory.popleft()[1]
-            self.agent.move(target_position, mode='position')
+            target_position = agent.memory.popleft()[1]
+            agent.move(target_position, mode='position')
         
         # Follow search pattern of expanding circles
         else:
             # Change direction every few seconds
-            self.search_time += 1
-            self.time_since_direction_change += 1      
+            agent.search_time += 1
+            agent.time_since_direction_change += 1      
 
             # Calculate direction change interval using logarithmic growth
             # This will start small and grow toward max_interval
-            direction_change_interval = self.max_interval * (1 - 1 / math.log(1 + self.search_time / 2))
+            direction_change_interval = self.max_interval * (1 - 1 / math.log(1 + agent.search_time / 2))
             
             # Change direction when interval is reached
-            if self.time_since_direction_change >= direction_change_interval:
-                self.search_angle = (self.search_angle + 45) % 360
-                self.time_since_direction_change = 0
+            if agent.time_since_direction_change >= direction_change_interval:
+                agent.search_angle = (agent.search_angle + 45) % 360
+                agent.time_since_direction_change = 0
             
             # Create direction vector from angle with increasing magnitude
-            direction = pygame.Vector2(math.cos(math.radians(self.search_angle)), math.sin(math.radians(self.search_angle)))
-            self.agent.move(direction, mode='direction')
+            direction = Vector2(math.cos(math.radians(agent.search_angle)), math.sin(math.radians(agent.search_angle)))
+            agent.move(direction, mode='direction')
         return
     
-    def check_transition(self):
+    def check_transition(self, agent):
         # Check if agent has a target & transition to Hunting state
-        if self.agent.target:
+        if agent.target:
             return PoacherHunting()
         
         return None  # Transition to dead state triggered by event and not self-check
@@ -225,23 +295,24 @@ class PoacherHunting(State):
     Poacher hunting state, moves towards the target animal to attack it.
     Can only be in this state if a target animal is in sight.
     """
-    def __init__(self):
-        super().__init__(speed_modifier=1.1, scan_range_modifier=1.0, detection_probability=1.0)
+    __slots__ = ()
+    code = 5
+    speed_modifier = 1.1
         
-    def action(self):
+    def action(self, agent):
         # Get target position and move towards it
-        target_position = self.agent.target.position
-        self.agent.move(target_position, mode='position')
+        target_position = agent.target.position
+        agent.move(target_position, mode='position')
         return
         
         
-    def check_transition(self):
+    def check_transition(self, agent):
         # Transition options: Attacking state, Idle state
-        if self.agent.target:
+        if agent.target:
             
             # If target is in attack range, transition to attacking state
-            distance = self.agent.position.distance_to(self.agent.target.position)
-            if distance < self.agent.attack_range:
+            distance = agent.position.distance_to(agent.target.position)
+            if distance < agent.attack_range:
                 return PoacherAttacking()
             
             # If target is out of attack range, stay in Hunting state
@@ -254,29 +325,31 @@ class PoacherHunting(State):
 
 
 class PoacherAttacking(State):
-    def __init__(self):
-        super().__init__(speed_modifier=1.2, scan_range_modifier=1.0, detection_probability=1.0)
-        self.attack_time = 0
+    __slots__ = ()
+    code = 6
+    speed_modifier = 1.2
+
+    def enter(self, agent):
+        agent.attack_time = 0
         
-    def action(self):
+    def action(self, agent):
         # Direct attack on animal
-        self.attack_time += 1
+        agent.attack_time += 1
 
         # if animal is in range create and post attack event
-        if self.agent.position.distance_to(self.agent.target.position) < self.agent.kill_range:
-            attack_event = pygame.event.Event(POACHER_ATTACK_ANIMAL, {'animal': self.agent.target, 'poacher': self.agent})
-            pygame.event.post(attack_event)
+        if agent.position.distance_to(agent.target.position) < agent.kill_range:
+            agent.event_bus.emit(POACHER_ATTACK_ANIMAL, agent.target, agent)
             
         # if animal is not in range, move towards animal
         else:
-            self.agent.move(self.agent.target.position, mode='position')
+            agent.move(agent.target.position, mode='position')
         return
     
-    def check_transition(self):
+    def check_transition(self, agent):
         # Check if agent still has a target (not lost or dead) & is still in attack range
-        if self.agent.target:
-            distance = self.agent.position.distance_to(self.agent.target.position)
-            if distance < self.agent.attack_range:
+        if agent.target:
+            distance = agent.position.distance_to(agent.target.position)
+            if distance < agent.attack_range:
                 return None
             
             # If target is out of attack range, transition back to Hunting state
@@ -288,14 +361,21 @@ class PoacherAttacking(State):
 
     
 class Terminal(State):
-    def __init__(self):
-        super().__init__(speed_modifier=0, scan_range_modifier=0, detection_probability=0)
+    __slots__ = ()
+    code = 7
+    speed_modifier = 0
+    scan_range_modifier = 0
+    detection_probability = 0
         
-    def action(self):
+    def action(self, agent):
         # Terminal state, agent exists further bot does not move anymore
         return
     
-    def check_transition(self):
+    def check_transition(self, agent):
         # Agent can't transition to any other state
         return None
-    
\ No newline at end of file
+    
+
+
+# Shared state instances indexed by state code
+STATES = [DroneFastSearch(), DroneDeepSearch(), AnimalIdle(), AnimalFleeing(), PoacherIdle(), PoacherHunting(), PoacherAttacking(), Terminal()]
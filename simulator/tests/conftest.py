@@ -0,0 +1,5 @@
+# The simulator modules import each other by bare names, make them importable when pytest runs from the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
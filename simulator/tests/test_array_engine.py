@@ -0,0 +1,100 @@
+import functools
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from array_engine import ArrayWorld, BatchWorld
+from world import World
+from states import AnimalIdle
+from optimizer import DroneOptimizer
+from random_stream import spawn_streams
+from rl_optimizer import RLOptimizer
+
+MAX_STEPS = 300
+
+
+class FixedCourse(DroneOptimizer):
+    """Drones keep their course, the optimizer doesn't couple the worlds of a batch"""
+
+    def optimize(self, drones, detected_animals, detected_poachers):
+        return {}
+
+
+class TestBatchWorld(unittest.TestCase):
+    def test_worlds_match_single_worlds(self):
+        """Every world of a batch runs like a single world seeded with its stream"""
+        batch = BatchWorld(n_worlds=3, seed=4, max_steps=MAX_STEPS)
+        results = batch.run(FixedCourse())
+        for world, seed in enumerate(spawn_streams(4, 3)):
+            single = ArrayWorld(seed=seed, max_steps=MAX_STEPS)
+            self.assertEqual(single.run(FixedCourse()), results[world])
+            np.testing.assert_array_equal(single.animals.position, batch.animals.position[batch.animals.world == world])
+            np.testing.assert_array_equal(single.poachers.position, batch.poachers.position[batch.poachers.world == world])
+
+    def test_exploration_decays_once_per_world_step(self):
+        """The exploration decays once per tick during the batch and catches up with the other worlds at its end"""
+        optimizer = RLOptimizer(seed=2)
+        batch = BatchWorld(n_worlds=3, seed=2, max_steps=MAX_STEPS)
+        rates = []
+        while batch.running:
+            batch.step(optimizer)
+            rates.append(optimizer.exploration_rate)
+        optimizer.end_batch()
+        self.assertEqual(rates[99], 0.8 * 0.98)
+        self.assertEqual(rates[98], 0.8)
+
+        total_steps = sum(result['steps'] for result in batch.results())
+        self.assertEqual(optimizer.episode_step, total_steps % 100)
+        self.assertAlmostEqual(optimizer.exploration_rate, max(0.15, 0.8 * 0.98 ** (total_steps // 100)))
+
+
+class TestWorldDifferences(unittest.TestCase):
+    """The documented differences of ArrayWorld to the object loop of World and the rules both engines share"""
+
+    DRONES = [('drone', 750, 50)]  # Far from all other agents, keeps its position with FixedCourse
+
+    def step(self, world_class, animals, poachers):
+        # Grazing without the random part, the moves of the animals only depend on their herd
+        with mock.patch.object(AnimalIdle, 'random_weight', 0):
+            world = world_class(self.DRONES, animals, poachers, seed=0)
+            world.step(FixedCourse())
+        return world
+
+    def test_animals_update_simultaneously(self):
+        """Every animal moves as if it was updated first, in World the second animal sees the move of the first"""
+        # Closer than the separation distance, the first animal moves away from the second one
+        animals = [('first', 400, 300), ('second', 418, 300)]
+        poachers = [('poacher', 50, 550)]
+        array_world = self.step(ArrayWorld, animals, poachers)
+        positions = [tuple(view.position) for view in array_world.animal_views]
+
+        # Updated first in World
+        first_world = self.step(World, animals, poachers)
+        second_world = self.step(World, animals[::-1], poachers)
+        for (x, y), animal in zip(positions, (list(first_world.animals)[0], list(second_world.animals)[0])):
+            self.assertAlmostEqual(x, animal.position.x)
+            self.assertAlmostEqual(y, animal.position.y)
+
+        # Updated second in World: the first animal moved out of separation distance, the second one follows it
+        second = list(first_world.animals)[1]
+        self.assertGreater(positions[1][0], 418)
+        self.assertLess(second.position.x, 418)
+
+    def test_poachers_target_smallest_herd(self):
+        """Poachers of both engines target the animal in the smallest herd in sight, not the nearest animal"""
+        # A pair of animals next to the poacher and a single animal farther away
+        animals = [('pair_near', 230, 300), ('pair_far', 210, 300), ('single', 380, 300)]
+        poachers = [('poacher', 300, 300)]
+        self.assertEqual(self.step(ArrayWorld, animals, poachers).poacher_views[0].target.name, 'single')
+        self.assertEqual(list(self.step(World, animals, poachers).poachers)[0].target.name, 'single')
+        scanned = functools.partial(World, herding='neighbors')
+        self.assertEqual(list(self.step(scanned, animals, poachers).poachers)[0].target.name, 'single')
+
+        # Of equally small herds the nearest animal
+        animals = [('near', 330, 300), ('far', 210, 300)]
+        self.assertEqual(self.step(ArrayWorld, animals, poachers).poacher_views[0].target.name, 'near')
+        self.assertEqual(list(self.step(World, animals, poachers).poachers)[0].target.name, 'near')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+
+import numpy as np
+
+from world import World
+from array_engine import ArrayWorld, BatchWorld
+from scenario import Scenario
+from vector import Vector2
+from agents import Drone, Animal
+from states import DroneFastSearch
+from pso_optimizer import PSOOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+
+MAX_STEPS = 200
+
+
+class FixedRandom:
+    """Random stream drawing the same number every time, for both the scalar and the array interface"""
+
+    def random(self, size=None):
+        return 0.5 if size is None else np.full(size, 0.5)
+
+
+class AgentPath(ArrayPSOOptimizer):
+    """ArrayPSOOptimizer getting the detected groups of agents instead of the arrays of ArrayWorld or the changes"""
+    optimizes_arrays = False
+    tracks_detections = False
+
+
+class DetectionPath(ArrayPSOOptimizer):
+    """ArrayPSOOptimizer getting the changes of the detected agents from ArrayWorld instead of its arrays"""
+    optimizes_arrays = False
+
+
+class TestArrayPSOOptimizer(unittest.TestCase):
+    def test_matches_pso_with_one_particle(self):
+        """With one particle per drone, the same start swarm and the same random numbers both optimizers take the same actions"""
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                scenario = Scenario.generate(n_herds=6, n_poachers=3, seed=seed)
+                worlds = [World(*scenario, seed=seed, log_transitions=False, max_steps=MAX_STEPS) for _ in range(2)]
+                pso = PSOOptimizer(particles_per_drone=1, seed=seed)
+                array_pso = ArrayPSOOptimizer(particles_per_drone=1, seed=seed)
+
+                # Start from the swarm of the PSOOptimizer
+                drones = list(worlds[1].drones)
+                rows = array_pso.initialize_particles(drones)
+                for drone, row in zip(worlds[0].drones, rows):
+                    pso.initialize_particles(drone)
+                    particle = pso.particles[drone.name][0]
+                    array_pso.positions[row, 0] = array_pso.best_positions[row, 0] = tuple(particle['position'])
+                    array_pso.velocities[row, 0] = tuple(particle['velocity'])
+                pso.rng = array_pso.rng = FixedRandom()
+
+                # The detected animals move between the ticks, the bests are scored at their current positions
+                while worlds[0].running:
+                    for world, optimizer in zip(worlds, (pso, array_pso)):
+                        world.step(optimizer)
+                    self.assertEqual(worlds[0].running, worlds[1].running)
+                    for drone, array_drone in zip(worlds[0].drones, worlds[1].drones):
+                        self.assertEqual(drone.active_state, array_drone.active_state)
+                        self.assertAlmostEqual(drone.position.x, array_drone.position.x)
+                        self.assertAlmostEqual(drone.position.y, array_drone.position.y)
+                self.assertEqual(worlds[0].results(), worlds[1].results())
+
+    def test_bests_follow_moving_animals(self):
+        """The personal bests are rescored at the current positions of the detected animals"""
+        optimizer = ArrayPSOOptimizer(particles_per_drone=1, w=0, c1=0, c2=0)  # Particles stay where they are put
+        drone, animal = Drone('drone', 100, 100), Animal('animal', 400, 300)
+        optimizer.initialize_particles([drone])
+
+        # In the band around the animal, 1.1 times its scan range away
+        optimizer.positions[0, 0] = optimizer.best_positions[0, 0] = (510, 300)
+        optimizer.optimize([drone], [animal], [])
+        np.testing.assert_array_equal(optimizer.global_best[0], (510, 300))
+
+        # The same animal moved, only the new particle position is in its band
+        animal.position = Vector2(180, 300)
+        optimizer.positions[0, 0] = (290, 300)
+        optimizer.optimize([drone], [animal], [])
+        np.testing.assert_array_equal(optimizer.best_positions[0, 0], (290, 300))
+        np.testing.assert_array_equal(optimizer.global_best[0], (290, 300))
+
+    def test_fitness_matches_pso(self):
+        """The vectorized fitness of random particles equals the fitness of PSOOptimizer"""
+        world = World(*Scenario.generate(n_herds=6, n_poachers=3, seed=1), seed=1, log_transitions=False)
+        rng = np.random.default_rng(1)
+        positions = rng.uniform(0, 1, (1, 50, 2)) * [800, 600]
+        last_positions = positions + rng.normal(0, 5, positions.shape)
+        has_last_position = rng.random((1, 50)) < 0.8
+        stagnation_count = rng.integers(0, 10, (1, 50))
+        animals, poachers = list(world.animals), list(world.poachers)
+        drone = list(world.drones)[0]
+
+        pso = PSOOptimizer()
+        array_pso = ArrayPSOOptimizer()
+        for state in (drone.active_state, drone.active_state.check_transition(drone)):
+            drone.set_state(state)
+            fitness = array_pso.calculate_fitness(
+                positions, last_positions, has_last_position, stagnation_count, np.array([isinstance(state, DroneFastSearch)]),
+                np.array([[tuple(animal.position) for animal in animals]]), np.array([[animal.scan_range for animal in animals]]),
+                np.ones((1, len(animals)), dtype=bool), np.array([[tuple(poacher.position) for poacher in poachers]]),
+                np.ones((1, len(poachers)), dtype=bool))
+            pso.current_drone = drone
+            for particle in range(50):
+                pso.current_particle = {'last_position': Vector2(*last_positions[0, particle]) if has_last_position[0, particle] else None}
+                expected = pso.calculate_fitness(Vector2(*positions[0, particle]), poachers, animals, stagnation_count[0, particle])
+                self.assertAlmostEqual(fitness[0, particle], expected)
+
+    def test_arrays_match_agents(self):
+        """ArrayWorld and BatchWorld take the same actions with the array fast path as with the agent views"""
+        for new_world in (lambda: ArrayWorld(seed=3, max_steps=MAX_STEPS), lambda: BatchWorld(n_worlds=3, seed=3, max_steps=MAX_STEPS)):
+            worlds = [new_world(), new_world()]
+            optimizers = [ArrayPSOOptimizer(seed=3), AgentPath(seed=3)]
+            with self.subTest(world=type(worlds[0]).__name__):
+                while worlds[0].running:
+                    for world, optimizer in zip(worlds, optimizers):
+                        world.step(optimizer)
+                    self.assertEqual(worlds[0].running, worlds[1].running)
+                    np.testing.assert_array_equal(worlds[0].drones.position, worlds[1].drones.position)
+                    np.testing.assert_array_equal(worlds[0].drones.state, worlds[1].drones.state)
+                self.assertEqual(worlds[0].results(), worlds[1].results())
+
+    def test_detection_changes_match_groups(self):
+        """The optimizer takes the same actions with the detected agents kept from the changes as with the groups"""
+        scenario = Scenario.generate(n_herds=6, n_poachers=4, seed=2)
+        for new_world, optimizer in ((lambda: World(*scenario, seed=2, log_transitions=False, max_steps=MAX_STEPS), ArrayPSOOptimizer),
+                                     (lambda: ArrayWorld(*scenario, seed=2, max_steps=MAX_STEPS), DetectionPath)):
+            worlds = [new_world(), new_world()]
+            optimizers = [optimizer(seed=2), AgentPath(seed=2)]
+            with self.subTest(world=type(worlds[0]).__name__):
+                n_detected = 0
+                while worlds[0].running:
+                    for world, world_optimizer in zip(worlds, optimizers):
+                        world.step(world_optimizer)
+                    for agent, other in zip(worlds[0].all_agents(), worlds[1].all_agents()):
+                        self.assertEqual(tuple(agent.position), tuple(other.position))
+                    n_detected += len(optimizers[0].detected_animals)
+                self.assertEqual(worlds[0].results(), worlds[1].results())
+                self.assertGreater(n_detected, 0)
+                self.assertFalse(optimizers[1].detected_animals)
+
+
+if __name__ == '__main__':
+    unittest.main()
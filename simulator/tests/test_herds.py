@@ -0,0 +1,172 @@
+import math
+import random
+import unittest
+
+from agents import Animal
+from herds import HerdTracker
+from spatial_index import SpatialGrid
+from vector import Vector2
+
+LINK_RANGE = 100
+
+
+def components(animals):
+    """Connected groups of animals closer than the link range, found by brute force"""
+    herds, seen = [], set()
+    for animal in animals:
+        if animal in seen:
+            continue
+        herd = [animal]
+        seen.add(animal)
+        for member in herd:
+            for other in animals:
+                if other not in seen and member.position.distance_to(other.position) < LINK_RANGE:
+                    seen.add(other)
+                    herd.append(other)
+        herds.append(frozenset(herd))
+    return set(herds)
+
+
+class TestHerdTracker(unittest.TestCase):
+    def setUp(self):
+        self.tracker = HerdTracker(link_range=LINK_RANGE)
+        self.index = SpatialGrid(cell_size=LINK_RANGE)
+
+    def track(self, positions):
+        animals = [Animal(f"animal_{i}", x, y) for i, (x, y) in enumerate(positions)]
+        self.index.rebuild(animals)
+        self.tracker.rebuild(animals)
+        return animals
+
+    def move(self, animal, x, y):
+        animal.position = Vector2(x, y)
+        self.index.update(animal)
+        self.tracker.update(animal, self.index)
+        return
+
+    def remove(self, animal):
+        self.index.remove(animal)
+        self.tracker.remove(animal)
+        return
+
+    def assert_herds(self, animals):
+        """The herds, sizes and centers of the tracker match the brute-force components"""
+        expected = components(animals)
+        self.assertEqual({frozenset(self.tracker.herd(animal)) for animal in animals}, expected)
+        self.assertEqual(len(self.tracker), len(expected))
+        self.assertEqual(self.tracker.sizes(), sorted((len(herd) for herd in expected), reverse=True))
+        for animal in animals:
+            herd = next(herd for herd in expected if animal in herd)
+            self.assertEqual(self.tracker.size(animal), len(herd))
+            self.assertEqual(self.tracker.center(animal, exclude=False),
+                             (math.fsum(a.position.x for a in herd) / len(herd), math.fsum(a.position.y for a in herd) / len(herd)))
+        return
+
+    def test_union(self):
+        """A new link merges two herds right away, the center follows without a refresh"""
+        a, b, c, d = animals = self.track([(100, 100), (150, 100), (400, 100), (600, 100)])
+        self.assertEqual(self.tracker.sizes(), [2, 1, 1])
+
+        self.move(c, 220, 100)
+        self.assertEqual(self.tracker.size(a), 3)
+        self.assertEqual(self.tracker.sizes(), [3, 1])
+        self.assertIs(self.tracker.find(a), self.tracker.find(c))
+        self.assertEqual(self.tracker.center(c), (125, 100))
+        x, y = self.tracker.center(a, exclude=False)
+        self.assertAlmostEqual(x, (100 + 150 + 220) / 3)
+        self.assertAlmostEqual(y, 100)
+        self.assertFalse(self.tracker.dirty)
+
+        self.tracker.refresh()
+        self.assert_herds(animals)
+        self.assertEqual(self.tracker.size(d), 1)
+
+    def test_remove(self):
+        """Removing the animal linking two parts of a herd splits it in the next refresh"""
+        a, bridge, c = animals = self.track([(100, 100), (180, 100), (260, 100)])
+        self.assertEqual(self.tracker.size(a), 3)
+
+        self.remove(bridge)
+        self.assertNotIn(bridge, self.tracker)
+        self.assertEqual(self.tracker.size(a), 2)  # Still one herd until the refresh
+        self.tracker.refresh()
+        self.assert_herds([a, c])
+        self.assertEqual(self.tracker.sizes(), [1, 1])
+        self.assertIsNone(self.tracker.center(a))
+
+        # Removing an animal twice is ignored
+        self.remove(bridge)
+        self.tracker.refresh()
+        self.assert_herds([a, c])
+
+    def test_refresh(self):
+        """Broken links only mark the herd dirty, the refresh splits it into its connected parts"""
+        a, b, c = animals = self.track([(100, 100), (180, 100), (200, 150)])
+        self.move(a, 20, 100)
+        self.assertEqual(self.tracker.size(a), 3)
+        self.assertEqual(len(self.tracker.dirty), 1)
+
+        self.tracker.refresh()
+        self.assertFalse(self.tracker.dirty)
+        self.assert_herds(animals)
+        self.assertEqual(self.tracker.size(a), 1)
+        self.assertEqual(self.tracker.size(b), 2)
+
+    def test_candidates(self):
+        """Animals are re-anchored once they moved more than half the skin, links are found across the whole map"""
+        a, b, c = animals = self.track([(100, 100), (500, 100), (520, 100)])
+        self.assertEqual(self.tracker.candidates[b], {c})
+        self.move(a, 110, 100)  # Within half the skin, the anchor is kept
+        self.assertEqual(self.tracker.anchors[a], (100, 100))
+
+        self.move(a, 450, 100)
+        self.assertEqual(self.tracker.anchors[a], (450, 100))
+        self.assertEqual(self.tracker.candidates[a], {b, c})
+        self.assertIn(a, self.tracker.candidates[b])
+        self.assert_herds(animals)
+
+        # A small step back towards the herd links without a new anchor
+        self.move(a, 390, 100)
+        self.tracker.refresh()
+        self.assertEqual(self.tracker.size(a), 1)
+        self.move(a, 405, 100)
+        self.assertEqual(self.tracker.anchors[a], (390, 100))
+        self.assertEqual(self.tracker.size(a), 3)
+        self.tracker.refresh()
+        self.assert_herds(animals)
+        self.remove(c)
+        self.assertEqual(self.tracker.candidates[b], {a})
+
+    def test_refresh_changed_herds(self):
+        """The refresh recomputes the sums of changed herds only"""
+        a, b, c, d = animals = self.track([(100, 100), (150, 100), (400, 300), (450, 300)])
+        sums = {animal: self.tracker.sums[self.tracker.find(animal)] for animal in animals}
+        self.move(a, 100.1, 100.3)
+        self.tracker.refresh()
+        self.assertIsNot(self.tracker.sums[self.tracker.find(a)], sums[a])
+        self.assertIs(self.tracker.sums[self.tracker.find(c)], sums[c])
+        self.assert_herds(animals)
+
+        self.move(d, 450, 300)  # Not moved
+        self.tracker.refresh()
+        self.assertIs(self.tracker.sums[self.tracker.find(c)], sums[c])
+
+    def test_matches_components(self):
+        """After every refresh the herds are the connected groups of a random walk with removals"""
+        rng = random.Random(1)
+        animals = self.track([(rng.uniform(0, 600), rng.uniform(0, 400)) for _ in range(30)])
+        self.assert_herds(animals)
+        for tick in range(100):
+            for animal in rng.sample(animals, 10):
+                self.move(animal, animal.position.x + rng.uniform(-40, 40), animal.position.y + rng.uniform(-40, 40))
+            if tick % 10 == 9:
+                animal = rng.choice(animals)
+                self.remove(animal)
+                animals.remove(animal)
+            self.tracker.refresh()
+            with self.subTest(tick=tick):
+                self.assert_herds(animals)
+
+
+if __name__ == '__main__':
+    unittest.main()
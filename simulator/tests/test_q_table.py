@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import main
+from q_table import DenseQTable
+from rl_optimizer import RLOptimizer
+
+MAX_STEPS = 300
+
+
+class TestDenseQTable(unittest.TestCase):
+    """The dense Q-table picks the same actions as the dict Q-table of the RLOptimizer"""
+
+    def train(self, dense_q_table, seed):
+        optimizer = RLOptimizer(dense_q_table=dense_q_table)
+        results = [main.run(optimizer, headless=True, seed=seed * 10 + episode, max_steps=MAX_STEPS) for episode in range(3)]
+        q_table = optimizer.q_table.to_dict() if dense_q_table else optimizer.q_table
+        return results, {state: list(q_values.items()) for state, q_values in q_table.items() if q_values}
+
+    def test_backends_match(self):
+        for seed in range(6):
+            with self.subTest(seed=seed):
+                self.assertEqual(self.train(False, seed), self.train(True, seed))
+
+    def test_ties_follow_insertion_order(self):
+        actions = [(0, 1), (1, 0), (0, -1)]
+        table = DenseQTable(2, 2, actions)
+        state = (1, 0, 0, 1, 0)
+        table.set(state, (0, -1), 1.0)
+        table.set(state, (1, 0), 1.0)
+        table.set(state, (0, -1), 0.5)
+        table.set(state, (1, 0), 0.5)
+        q_table = {state: {(0, -1): 0.5, (1, 0): 0.5}}
+        self.assertEqual(table.best_action(state), max(q_table[state], key=q_table[state].get))
+        self.assertEqual(table.best_actions(np.array([state]))[0], actions.index((0, -1)))
+        self.assertEqual(table.best_action(state, noise=np.array([0.0, 0.1])), (1, 0))
+        self.assertEqual(table.to_dict(), q_table)
+        self.assertEqual(list(table.to_dict()[state]), list(q_table[state]))
+        self.assertEqual(list(DenseQTable.from_dict(q_table, 2, 2, actions).to_dict()[state]), list(q_table[state]))
+
+    def test_save_load_keeps_order(self):
+        actions = [(0, 1), (1, 0), (0, -1)]
+        table = DenseQTable(2, 2, actions)
+        state = (0, 1, 1, 0, 1)
+        table.set(state, (0, -1), 2.0)
+        table.set(state, (0, 1), 2.0)
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'q_table.npy')
+            table.save(filename)
+            loaded = DenseQTable.load(filename, 2, 2, actions, mmap_mode='r')
+            self.assertEqual(loaded.best_action(state), (0, -1))
+            self.assertEqual(list(loaded.to_dict()[state]), [(0, -1), (0, 1)])
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestMappedModel(unittest.TestCase):
+    """A dense model mapped copy-on-write runs episodes without changing its files"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'rl_model.pkl')
+        optimizer = RLOptimizer(dense_q_table=True, seed=1)
+        main.run(optimizer, headless=True, seed=1, max_steps=MAX_STEPS)
+        optimizer.save_model(self.filename)
+        self.q_table_filename = os.path.join(self.directory, 'rl_model_q_table.npy')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_copy_on_write_episode(self):
+        saved = np.load(self.q_table_filename)
+        results = []
+        for mmap_mode in (None, 'c'):
+            optimizer = RLOptimizer(dense_q_table=True)
+            optimizer.load_model(self.filename, mmap_mode=mmap_mode)
+            self.assertEqual(isinstance(optimizer.q_table.values, np.memmap), mmap_mode is not None)
+            results.append(main.run(optimizer, headless=True, seed=2, max_steps=MAX_STEPS))
+            self.assertFalse(np.array_equal(optimizer.q_table.values, saved))
+        self.assertEqual(results[0], results[1])
+        np.testing.assert_array_equal(np.load(self.q_table_filename), saved)
+
+    def test_read_only_mapping_rejected(self):
+        with self.assertRaises(ValueError):
+            RLOptimizer(dense_q_table=True).load_model(self.filename, mmap_mode='r')
+
+
+if __name__ == '__main__':
+    unittest.main()
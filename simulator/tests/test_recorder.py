@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from world import World
+from array_engine import ArrayWorld
+from scenario import Scenario
+from recorder import TrajectoryRecorder, TICK_ARRAYS, load_trajectories
+from pso_optimizer import PSOOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+
+MAX_STEPS = 300
+
+
+class MemoryRecorder(TrajectoryRecorder):
+    """Keeps a copy of every tick and all events the world writes, next to the files of the recording"""
+
+    def open(self, names, types, map_size, **metadata):
+        super().open(names, types, map_size, **metadata)
+        self.ticks = []
+        self.all_events = []
+        return
+
+    def tick(self, step):
+        # The world fills the rows after this call, they are copied at the next tick and when the recording is closed
+        self.keep_last_tick()
+        rows = super().tick(step)
+        self.last_tick = (step, *rows)
+        return rows
+
+    def keep_last_tick(self):
+        if getattr(self, 'last_tick', None) is not None:
+            step, position, state, health = self.last_tick
+            self.ticks.append((step, position.copy(), state.copy(), health.copy()))
+            self.last_tick = None
+        return
+
+    def add_events(self, step, events):
+        events = list(events)
+        self.all_events.extend((step, *event) for event in events)
+        super().add_events(step, events)
+        return
+
+    def close(self, results=None):
+        self.keep_last_tick()
+        super().close(results)
+        return
+
+
+class TestRecorder(unittest.TestCase):
+    """load_trajectories returns every tick and event a seeded world wrote to its TrajectoryRecorder"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, new_world, optimizer):
+        """Record episodes of three seeds, a small chunk size so the files are written in several chunks"""
+        recorders, worlds = [], []
+        for seed in range(3):
+            recorder = MemoryRecorder(os.path.join(self.directory, f"episode_{seed}"), chunk_size=16)
+            world = new_world(Scenario.generate(n_herds=8, n_poachers=4, seed=seed), seed=seed, max_steps=MAX_STEPS,
+                              recorder=recorder)
+            recorder.close(world.run(optimizer(seed=seed)))
+            recorders.append(recorder)
+            worlds.append(world)
+        return recorders, worlds
+
+    def assert_round_trip(self, recorders, worlds):
+        trajectories = load_trajectories(self.directory)
+        self.assertEqual([os.path.basename(t.path) for t in trajectories], ['episode_0', 'episode_1', 'episode_2'])
+        for trajectory, recorder, world in zip(trajectories, recorders, worlds):
+            names = [agent.name for agent in world.all_agents()]
+            self.assertEqual(trajectory.names, names)
+            self.assertEqual(trajectory.results, world.results())
+            self.assertEqual(trajectory.n_ticks, world.steps + 1)  # Tick 0 is the initial state
+            self.assertGreater(trajectory.n_ticks, recorder.chunk_size)
+            self.assertEqual([len(names[trajectory.agents(name)]) for name in ('drones', 'animals', 'poachers')],
+                             [len(world.drones), len(world.animals), len(world.poachers)])
+
+            self.assertEqual(len(recorder.ticks), trajectory.n_ticks)
+            for tick, (step, position, state, health) in enumerate(recorder.ticks):
+                self.assertEqual(trajectory.steps[tick], step)
+                np.testing.assert_array_equal(trajectory.position[tick], position, f"Tick {tick}")
+                np.testing.assert_array_equal(trajectory.state[tick], state, f"Tick {tick}")
+                np.testing.assert_array_equal(trajectory.health[tick], health, f"Tick {tick}")
+            for name, (dtype, _) in TICK_ARRAYS.items():
+                self.assertEqual(trajectory.array(name).dtype, dtype)
+
+            # The last tick is the final state of the world
+            agents = world.all_agents()
+            np.testing.assert_array_equal(trajectory.position[-1], np.array([tuple(agent.position) for agent in agents], dtype=np.float32))
+            np.testing.assert_array_equal(trajectory.state[-1], [agent.active_state.code for agent in agents])
+
+            self.assertGreater(len(recorder.all_events), 0)
+            self.assertEqual([tuple(event) for event in trajectory.events.tolist()], recorder.all_events)
+        return
+
+    def test_world(self):
+        self.assert_round_trip(*self.record(lambda scenario, **kwargs: World(*scenario, log_transitions=False, **kwargs),
+                                            PSOOptimizer))
+
+    def test_array_world(self):
+        self.assert_round_trip(*self.record(lambda scenario, **kwargs: ArrayWorld(*scenario, **kwargs), ArrayPSOOptimizer))
+
+
+if __name__ == '__main__':
+    unittest.main()
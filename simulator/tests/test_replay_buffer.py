@@ -0,0 +1,104 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from replay_buffer import ReplayBuffer
+from rl_optimizer import RLOptimizer
+
+
+def experience(i):
+    """Experience number i, with a state key, an action index, a reward and a next state key of its own"""
+    return (i, i + 1, 0, 1, 0), i % 4, float(i), (i + 1, i + 2, 1, 0, 1)
+
+
+class TestReplayBuffer(unittest.TestCase):
+    def test_wraparound(self):
+        """Once the buffer is full, new experiences overwrite the oldest ones"""
+        buffer = ReplayBuffer(3)
+        for i in range(5):
+            buffer.add(*experience(i))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.position, 2)
+        # Experiences 3 and 4 replaced 0 and 1, experience 2 is the oldest one left
+        for slot, i in enumerate([3, 4, 2]):
+            state, action, reward, next_state = experience(i)
+            self.assertEqual(tuple(buffer.states[slot]), state)
+            self.assertEqual(buffer.actions[slot], action)
+            self.assertEqual(buffer.rewards[slot], reward)
+            self.assertEqual(tuple(buffer.next_states[slot]), next_state)
+
+        states, _, rewards, _ = buffer.sample(100, np.random.default_rng(0))
+        self.assertEqual(set(rewards), {2.0, 3.0, 4.0})
+        self.assertEqual({tuple(state) for state in states}, {experience(i)[0] for i in (2, 3, 4)})
+
+    def test_seeded_sampling(self):
+        """The same seed samples the same experiences, only from the stored ones"""
+        buffer = ReplayBuffer(10)
+        for i in range(4):
+            buffer.add(*experience(i))
+        samples = [buffer.sample(50, np.random.default_rng(3)) for _ in range(2)]
+        for first, second in zip(*samples):
+            np.testing.assert_array_equal(first, second)
+
+        states, actions, rewards, next_states = samples[0]
+        index = np.random.default_rng(3).integers(0, 4, 50)
+        np.testing.assert_array_equal(rewards, index.astype(float))
+        for i, state, action, next_state in zip(index, states, actions, next_states):
+            self.assertEqual((tuple(state), action, tuple(next_state)), (experience(i)[0], experience(i)[1], experience(i)[3]))
+        self.assertGreater(len(set(index)), 1)
+        self.assertNotEqual(list(buffer.sample(50, np.random.default_rng(4))[2]), list(rewards))
+
+
+class TestReplayUpdate(unittest.TestCase):
+    def setUp(self):
+        self.optimizer = RLOptimizer(dense_q_table=True, replay_capacity=100, replay_batch_size=4)
+        self.actions = self.optimizer.actions
+        # Known values of the next states, the TD targets use their maximum
+        for i in range(8):
+            self.optimizer.q_table.set(experience(i)[3], self.actions[0], 2.0 * i)
+            self.optimizer.q_table.set(experience(i)[3], self.actions[1], -1.0)
+
+    def replay(self, batch):
+        """replay_update with the sampled mini-batch replaced by the given experiences"""
+        states, actions, rewards, next_states = zip(*batch)
+        sample = (np.array(states), np.array(actions), np.array(rewards, dtype=float), np.array(next_states))
+        with mock.patch.object(self.optimizer.experience_replay, 'sample', return_value=sample):
+            self.optimizer.replay_update()
+        return
+
+    def test_matches_sequential_updates(self):
+        """A batch without duplicates updates every sampled Q-value like the single experience update"""
+        sequential = RLOptimizer(dense_q_table=True)
+        sequential.q_table.values[:] = self.optimizer.q_table.values
+        sequential.q_table.order[:] = self.optimizer.q_table.order
+        batch = [experience(i) for i in (5, 1, 6, 2)]
+        self.optimizer.q_table.set(batch[1][0], self.actions[batch[1][1]], 3.0)  # An experience with an earlier value
+        sequential.q_table.set(batch[1][0], self.actions[batch[1][1]], 3.0)
+
+        self.replay(batch)
+        for state, action, reward, next_state in batch:
+            sequential.replay_buffer.append((state, self.actions[action], reward, next_state))
+            sequential.update_q_table()
+        np.testing.assert_array_equal(self.optimizer.q_table.values, sequential.q_table.values)
+        self.assertEqual(self.optimizer.q_table.to_dict(), sequential.q_table.to_dict())
+        self.assertEqual(self.optimizer.q_table.get(batch[1][0], self.actions[batch[1][1]]),
+                         3.0 + self.optimizer.learning_rate * (1.0 + self.optimizer.discount_factor * 2.0 - 3.0))
+
+    def test_duplicates_are_averaged(self):
+        """Experiences sampled more than once count like a single update with their average TD error"""
+        state, action, _, next_state = experience(3)
+        other = experience(4)
+        learning_rate, discount_factor = self.optimizer.learning_rate, self.optimizer.discount_factor
+        self.replay([(state, action, 1.0, next_state), other, (state, action, 5.0, next_state), (state, action, 6.0, next_state)])
+
+        # All TD errors are computed against the Q-values before the update, the new value starts at 0
+        target = discount_factor * 6.0
+        expected = learning_rate * ((1.0 + target) + (5.0 + target) + (6.0 + target)) / 3
+        self.assertAlmostEqual(self.optimizer.q_table.get(state, self.actions[action]), expected)
+        self.assertEqual(self.optimizer.q_table.get(other[0], self.actions[other[1]]),
+                         learning_rate * (other[2] + discount_factor * 8.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
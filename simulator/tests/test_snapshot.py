@@ -0,0 +1,102 @@
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+from world import World
+from array_engine import ArrayWorld
+from scenario import Scenario
+from snapshot import WorldSnapshot
+from pso_optimizer import PSOOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+
+MAX_STEPS = 300
+SNAPSHOT_STEP = 100
+
+
+def continue_run(world, optimizer):
+    """Positions, states and health of all agents after every remaining tick, and the results"""
+    ticks = []
+    while world.running:
+        world.step(optimizer)
+        ticks.append([(agent.position.x, agent.position.y, agent.active_state.code, getattr(agent, 'health', None))
+                      for agent in world.all_agents()])
+    return ticks, world.results(), [message for message, _ in world.event_log]
+
+
+class TestSnapshot(unittest.TestCase):
+    """Worlds restored from a snapshot, forks and saved snapshots continue exactly like the original run"""
+
+    def assert_same_run(self, run, expected):
+        # Compared tick by tick, a diff of the whole run would take very long
+        ticks, results, event_log = run
+        self.assertEqual(len(ticks), len(expected[0]))
+        for tick, (agents, expected_agents) in enumerate(zip(ticks, expected[0])):
+            self.assertEqual(agents, expected_agents, f"Tick {tick + 1} after the snapshot")
+        self.assertEqual(results, expected[1])
+        self.assertEqual(event_log, expected[2])
+
+    def assert_continues(self, new_world, optimizer_class, **world_kwargs):
+        scenario = Scenario.generate(n_herds=8, n_poachers=4, seed=3)
+        world = new_world(scenario, seed=3, max_steps=MAX_STEPS, **world_kwargs)
+        optimizer = optimizer_class(seed=3)
+        for _ in range(SNAPSHOT_STEP):
+            world.step(optimizer)
+
+        # The optimizer is not part of the snapshot, every continuation starts from a copy
+        snapshot = world.snapshot()
+        fork = world.fork(1)[0]
+        optimizer_state = copy.deepcopy(optimizer)
+        expected = continue_run(world, optimizer)
+        self.assertGreater(len(expected[0]), 10)
+
+        self.assert_same_run(continue_run(fork, copy.deepcopy(optimizer_state)), expected)
+
+        world.restore(snapshot)
+        self.assert_same_run(continue_run(world, copy.deepcopy(optimizer_state)), expected)
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'snapshot.pkl')
+            snapshot.save(filename)
+            world.restore(WorldSnapshot.load(filename))
+            self.assert_same_run(continue_run(world, copy.deepcopy(optimizer_state)), expected)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_world(self):
+        # The herds are rebuilt from the restored animals, their position sums are exact, so the moves replay bit-identically
+        self.assert_continues(lambda scenario, **kwargs: World(*scenario, log_transitions=False, **kwargs), PSOOptimizer)
+
+    def test_world_with_scanned_herds(self):
+        self.assert_continues(lambda scenario, **kwargs: World(*scenario, log_transitions=False, **kwargs), PSOOptimizer,
+                              herding='neighbors')
+
+    def test_array_world(self):
+        self.assert_continues(lambda scenario, **kwargs: ArrayWorld(*scenario, **kwargs), ArrayPSOOptimizer)
+
+    def test_forks_are_independent(self):
+        """Forks of a World draw the same random numbers but don't share agents"""
+        world = World(seed=1, log_transitions=False)
+        optimizer = PSOOptimizer(seed=1)
+        for _ in range(20):
+            world.step(optimizer)
+        first, second = world.fork(2)
+        first_agents, second_agents = first.all_agents(), second.all_agents()
+        for agent, first_agent, second_agent in zip(world.all_agents(), first_agents, second_agents):
+            self.assertIsNot(first_agent, second_agent)
+            self.assertIsNot(first_agent.position, second_agent.position)
+            self.assertEqual(tuple(first_agent.position), tuple(agent.position))
+
+        # Moving the agents of one fork leaves the other fork and the world unchanged
+        positions = [tuple(agent.position) for agent in world.all_agents()]
+        state = copy.deepcopy(optimizer)
+        first.step(optimizer)
+        self.assertEqual([tuple(agent.position) for agent in second_agents], positions)
+        self.assertEqual([tuple(agent.position) for agent in world.all_agents()], positions)
+        self.assert_same_run(continue_run(second, copy.deepcopy(state)), continue_run(world, state))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from agents import Agent
+from world import World
+from scenario import Scenario
+from pso_optimizer import PSOOptimizer
+
+MAX_STEPS = 300
+
+
+def trajectory(world, optimizer):
+    """Positions and states of all agents after every tick"""
+    ticks = []
+    while world.running and world.steps < MAX_STEPS:
+        world.step(optimizer)
+        ticks.append([(agent.position.x, agent.position.y, agent.active_state.code) for agent in world.all_agents()])
+    return ticks, world.results()
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def test_scans_match_brute_force(self):
+        """A seeded world runs the same with the spatial indexes as with brute-force scans over the whole groups"""
+        scan = Agent.scan_surroundings
+
+        def brute_force_scan(agent, agents, mode='all', index=None):
+            return scan(agent, agents, mode=mode)
+
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                scenario = Scenario.generate(n_herds=8, n_poachers=4, seed=seed)
+                ticks, results = trajectory(World(*scenario, seed=seed, log_transitions=False), PSOOptimizer(seed=seed))
+                with mock.patch.object(Agent, 'scan_surroundings', brute_force_scan):
+                    expected_ticks, expected_results = trajectory(World(*scenario, seed=seed, log_transitions=False),
+                                                                  PSOOptimizer(seed=seed))
+
+                # Compared tick by tick, a diff of the whole trajectory would take very long
+                self.assertEqual(len(ticks), len(expected_ticks))
+                for tick, (agents, expected) in enumerate(zip(ticks, expected_ticks)):
+                    self.assertEqual(agents, expected, f"Tick {tick + 1}")
+                self.assertEqual(results, expected_results)
+
+
+if __name__ == '__main__':
+    unittest.main()
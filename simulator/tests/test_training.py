@@ -0,0 +1,218 @@
+import copy
+import functools
+import glob
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from checkpoint import Checkpoints
+from results_log import ResultsReader
+from scenario import Scenario
+from rl_optimizer import RLOptimizer
+
+MAX_STEPS = 150  # Short episodes, enough for the model to change between runs
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestTrainingResume(unittest.TestCase):
+    """Interrupted and resumed RL trainings log the same episodes as an uninterrupted training"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # train_optimizer writes training_stats.pkl to the working directory
+
+        # Both trainings continue the same pretrained model
+        self.train('pretrained', num_runs=2)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def train(self, name, crash_at=None, num_runs=4, **kwargs):
+        """Train seeded runs in a directory of their own, optionally raising in the episode crash_at"""
+        if not os.path.exists(name):
+            os.makedirs(name)
+            if os.path.exists(os.path.join('pretrained', 'rl_model.pkl')):
+                shutil.copy(os.path.join('pretrained', 'rl_model.pkl'), name)
+        calls = []
+        run = main.run
+
+        def short_run(*args, **run_kwargs):
+            calls.append(1)
+            if len(calls) == crash_at:
+                raise Interrupted()
+            return run(*args, max_steps=MAX_STEPS, **run_kwargs)
+
+        kwargs.setdefault('results_filename', os.path.join(name, 'results.jsonl'))
+        with mock.patch.object(main, 'run', short_run):
+            main.train_optimizer(num_runs=num_runs, model_filename=os.path.join(name, 'rl_model.pkl'), seed=7, **kwargs)
+        return
+
+    def results(self, name):
+        reader = ResultsReader(os.path.join(name, 'results.jsonl'))
+        reader.update()
+        return [(record['run'], record['outcome'], record['steps'], record['poachers_caught_pct'], record['animals_alive_pct'])
+                for record in reader.records]
+
+    def assert_resumed(self, checkpoint_every, crash_at):
+        self.train('uninterrupted', checkpoint_every=checkpoint_every)
+        with self.assertRaises(Interrupted):
+            self.train('resumed', crash_at=crash_at, checkpoint_every=checkpoint_every)
+        self.train('resumed', resume=True, checkpoint_every=checkpoint_every)
+        self.assertEqual(self.results('resumed'), self.results('uninterrupted'))
+        return
+
+    def test_resume_before_first_checkpoint(self):
+        # No checkpoint was written, the training restarts from the model file and the log is reset
+        self.assert_resumed(checkpoint_every=10, crash_at=3)
+
+    def test_resume_from_checkpoint(self):
+        # Run 3 is repeated from the checkpoint after run 2
+        self.assert_resumed(checkpoint_every=2, crash_at=4)
+
+    def test_new_training_keeps_earlier_results(self):
+        # A second training without resume fails before it touches the log or the model
+        results = self.results('pretrained')
+        with open(os.path.join('pretrained', 'rl_model.pkl'), 'rb') as f:
+            model = f.read()
+        with self.assertRaises(FileExistsError):
+            self.train('pretrained', num_runs=2)
+        self.assertEqual(self.results('pretrained'), results)
+        self.assertEqual(len(results), 2)
+        with open(os.path.join('pretrained', 'rl_model.pkl'), 'rb') as f:
+            self.assertEqual(f.read(), model)
+
+        # The checkpoints of the earlier training are kept as well, overwrite replaces the log and the checkpoints
+        checkpoint_dir = os.path.join('pretrained', 'results_checkpoints')
+        self.assertEqual(Checkpoints(checkpoint_dir).runs(), [2])
+        with self.assertRaises(FileExistsError):
+            self.train('pretrained', num_runs=2, results_filename=os.path.join('pretrained', 'other.jsonl'),
+                       checkpoint_dir=checkpoint_dir)
+        self.assertFalse(os.path.exists(os.path.join('pretrained', 'other.jsonl')))
+        self.train('pretrained', num_runs=3, overwrite=True, checkpoint_every=1)
+        self.assertEqual([run for run, *_ in self.results('pretrained')], [1, 2, 3])
+        self.assertEqual(Checkpoints(checkpoint_dir).runs(), [3, 2, 1])
+
+    def test_default_results_per_training(self):
+        """Trainings without a results file log to files of their own, resume continues the last one"""
+        self.train('default', num_runs=2, results_filename=None, checkpoint_every=1)
+        with self.assertRaises(Interrupted):
+            self.train('default', crash_at=3, results_filename=None, checkpoint_every=1)
+        logs = sorted(glob.glob(os.path.join('default', 'rl_model_results_*.jsonl')), key=os.path.getmtime)
+        self.assertEqual(len(logs), 2)
+        self.train('default', results_filename=None, resume=True, checkpoint_every=1)
+        self.assertEqual(sorted(glob.glob(os.path.join('default', 'rl_model_results_*.jsonl')), key=os.path.getmtime), logs)
+
+        # Each training has its own checkpoints, the first training is untouched
+        for log, runs in zip(logs, ([2, 1], [4, 3, 2])):
+            reader = ResultsReader(log)
+            reader.update()
+            self.assertEqual([record['run'] for record in reader.records], list(range(1, runs[0] + 1)))
+            self.assertEqual(Checkpoints(os.path.splitext(log)[0] + '_checkpoints').runs(), runs)
+
+
+class TestWorkerTask(unittest.TestCase):
+    """Training workers start from the model without the rewards history and return the same rollout"""
+
+    def test_task_without_rewards_history(self):
+        optimizer = RLOptimizer()
+        main.run(optimizer, headless=True, seed=5, max_steps=MAX_STEPS)
+        self.assertTrue(optimizer.rewards_history)
+        worker_data = optimizer.get_worker_data()
+        self.assertNotIn('rewards_history', worker_data)
+
+        results = []
+        for model_data in (optimizer.get_model_data(), worker_data):
+            task = {'optimizer_type': 'rl', 'seed': 6, 'optimizer_kwargs': {}, 'model_data': copy.deepcopy(model_data)}
+            with mock.patch.object(main, 'run', functools.partial(main.run, max_steps=MAX_STEPS)):
+                results.append(main.run_episode(task))
+        self.assertEqual(results[0], results[1])
+        return
+
+
+class TestParallelTraining(unittest.TestCase):
+    """A training on two workers merges the rollouts of every round into the model, in the order of the runs"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # train_optimizer writes training_stats.pkl to the working directory
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_two_workers(self):
+        scenario = Scenario.generate(n_herds=2, herd_size=4, n_poachers=1, n_drones=1, seed=1)
+        main.train_optimizer(num_runs=4, workers=2, seed=7, model_filename='rl_model.pkl', results_filename='results.jsonl',
+                             scenario=scenario)
+
+        # The same rounds run in this process: every episode starts from the model of its round
+        expected = RLOptimizer(**main.map_kwargs(scenario))
+        expected_results = []
+        for run_nums in ([1, 2], [3, 4]):
+            model_data = expected.get_worker_data()
+            results = [main.run_episode({'optimizer_type': 'rl', 'seed': 7 + run_num, 'optimizer_kwargs': {},
+                                         'model_data': copy.deepcopy(model_data), 'scenario': scenario})
+                       for run_num in run_nums]
+            for result in results:
+                expected.merge_rollout(result.pop('rollout'))
+            expected_results.extend(results)
+
+        trained = RLOptimizer(**main.map_kwargs(scenario))
+        self.assertTrue(trained.load_model('rl_model.pkl'))
+        self.assertTrue(trained.get_model_data() == expected.get_model_data())
+
+        with open('results.jsonl') as results_file:
+            records = [json.loads(line) for line in results_file]
+        self.assertEqual([record['run'] for record in records], [1, 2, 3, 4])
+        self.assertEqual([record['seed'] for record in records], [8, 9, 10, 11])
+        for record, result in zip(records, expected_results):
+            self.assertEqual(record['optimizer_type'], 'rl')
+            self.assertEqual((record['outcome'], record['steps'], record['poachers_caught_pct'], record['animals_alive_pct']),
+                             (result['outcome'], result['steps'], result['poachers_caught_pct'], result['animals_alive_pct']))
+            self.assertGreater(record['time'], 0)
+
+        with open('training_stats.pkl', 'rb') as stats_file:
+            stats = pickle.load(stats_file)
+        self.assertEqual(stats['victories'] + stats['defeats'] + stats['timeouts'], 4)
+        self.assertEqual(stats['steps_per_run'], [result['steps'] for result in expected_results])
+        self.assertEqual(stats['poachers_caught_pct'], [result['poachers_caught_pct'] for result in expected_results])
+        self.assertEqual(stats['animals_alive_pct'], [result['animals_alive_pct'] for result in expected_results])
+
+    def test_worker_model_read_once(self):
+        """Every episode of a round gets its own copy of the model, the file is read by the first episode of the worker"""
+        with open('round_0.pkl', 'wb') as model_file:
+            pickle.dump(RLOptimizer().get_worker_data(), model_file)
+        first = main.load_worker_model('round_0.pkl')
+        first['q_table'][(0, 0, 0, 0, 0)] = {}
+        os.remove('round_0.pkl')
+        second = main.load_worker_model('round_0.pkl')
+        self.assertNotIn((0, 0, 0, 0, 0), second['q_table'])
+        self.assertEqual(second['exploration_rate'], first['exploration_rate'])
+
+
+class TestScenarioMap(unittest.TestCase):
+    def test_rl_grid_on_scenario_map(self):
+        """The RL optimizer of a worker discretizes the map of the scenario of its task"""
+        # 200x200 grid cells on the 3200x2400 map, cell (8, 1) for the drones, the last cell (15, 1) on the default map
+        scenario = Scenario([('drone1', 1700, 300), ('drone2', 1710, 310)], [('animal', 3000, 2000)], [('poacher', 100, 2000)],
+                            map_width=3200, map_height=2400)
+        task = {'optimizer_type': 'rl', 'seed': 1, 'optimizer_kwargs': {}, 'model_data': RLOptimizer().get_worker_data(),
+                'scenario': scenario}
+        with mock.patch.object(main, 'run', functools.partial(main.run, max_steps=3)):
+            result = main.run_episode(task)
+        self.assertEqual(set(result['rollout']['grid_visits']), {(8, 1)})
+
+
+if __name__ == '__main__':
+    unittest.main()
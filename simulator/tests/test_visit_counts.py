@@ -0,0 +1,35 @@
+import random
+import unittest
+
+from visit_counts import VisitCounts
+
+
+class TestVisitCounts(unittest.TestCase):
+    """The heap gives the cells in the order of sorting the {(grid_x, grid_y): visit_count} dict it replaces"""
+
+    def test_matches_sorted_dict(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                counts, visit_counts = {}, VisitCounts(6, 4)
+                for _ in range(300):
+                    # Mostly single visits as in discretize_state, sometimes merged rollouts with several
+                    cell = (rng.randrange(6), rng.randrange(4))
+                    amount = 1 if rng.random() < 0.8 else rng.randint(1, 5)
+                    counts[cell] = counts.get(cell, 0) + amount
+                    visit_counts.increment(cell, amount)
+
+                    self.assertEqual(visit_counts.to_dict(), counts)
+                    for k in (1, 3, 5):
+                        self.assertEqual(visit_counts.least_visited(k), sorted(counts.items(), key=lambda x: x[1])[:k])
+                        self.assertEqual(visit_counts.most_visited(k), sorted(counts.items(), key=lambda x: x[1], reverse=True)[:k])
+
+    def test_from_dict_keeps_order(self):
+        counts = {(2, 1): 3, (0, 0): 1, (1, 3): 1, (3, 2): 3}
+        visit_counts = VisitCounts.from_dict(counts, 4, 4)
+        self.assertEqual(list(visit_counts.to_dict().items()), list(counts.items()))
+        self.assertEqual(visit_counts.least_visited(4), sorted(counts.items(), key=lambda x: x[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
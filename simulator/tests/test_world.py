@@ -0,0 +1,195 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from world import World
+from array_engine import ArrayWorld, BatchWorld
+from agents import AgentGroup
+from scenario import Scenario
+from optimizer import DroneOptimizer
+from pso_optimizer import PSOOptimizer
+from array_pso_optimizer import ArrayPSOOptimizer
+from events import DRONE_DETECTED_ANIMAL, DRONE_LOST_ANIMAL, DRONE_DETECTED_POACHER, DRONE_LOST_POACHER
+
+
+class TestDetectionEvents(unittest.TestCase):
+    def test_events_track_detected_groups(self):
+        """Replaying the detected/lost events of every tick gives the detected groups of the world"""
+        world = World(*Scenario.generate(n_herds=6, n_poachers=4, seed=1), seed=1, log_transitions=False)
+        optimizer = PSOOptimizer(seed=1)
+        animals, poachers, n_events = set(), set(), 0
+        while world.running and world.steps < 300:
+            world.step(optimizer)
+            for event in world.event_bus.queue:
+                if event.type == DRONE_DETECTED_ANIMAL:
+                    self.assertNotIn(event.animal, animals)
+                    animals.add(event.animal)
+                elif event.type == DRONE_LOST_ANIMAL:
+                    animals.remove(event.animal)
+                elif event.type == DRONE_DETECTED_POACHER:
+                    self.assertIn(event.drone, world.drones)
+                    poachers.add(event.poacher)
+                elif event.type == DRONE_LOST_POACHER:
+                    poachers.remove(event.poacher)
+                else:
+                    continue
+                n_events += 1
+            self.assertEqual(animals, set(world.detected_animals))
+            self.assertEqual(poachers, set(world.detected_poachers))
+        self.assertGreater(n_events, 0)
+
+
+class DetectionView(DroneOptimizer):
+    """Keeps the detected agents from the changes passed to update_detections and optimizes with another optimizer"""
+
+    tracks_detections = True
+
+    def __init__(self, optimizer):
+        self.optimizer = optimizer
+        self.animals = AgentGroup()
+        self.poachers = AgentGroup()
+        self.calls = []  # reset flag of every update
+
+    def update_detections(self, detected_animals, lost_animals, detected_poachers, lost_poachers, reset=False):
+        if reset:
+            self.animals.empty()
+            self.poachers.empty()
+        for agent in lost_animals:
+            assert agent in self.animals
+        for agent in lost_poachers:
+            assert agent in self.poachers
+        self.animals.remove(*lost_animals)
+        self.poachers.remove(*lost_poachers)
+        self.animals.add(*detected_animals)
+        self.poachers.add(*detected_poachers)
+        self.calls.append(reset)
+        return
+
+    def optimize(self, drones, detected_animals, detected_poachers):
+        assert detected_animals is None and detected_poachers is None
+        return self.optimizer.optimize(drones, self.animals, self.poachers)
+
+
+def world_detections(world):
+    """Names of the detected animals and poachers of a World"""
+    return {agent.name for agent in world.detected_animals}, {agent.name for agent in world.detected_poachers}
+
+
+def array_detections(world):
+    """Names of the detected animals and poachers of an ArrayWorld"""
+    return ({world.animal_views[i].name for i in np.flatnonzero(world.animal_sighted_by >= 0)},
+            {world.poacher_views[i].name for i in np.flatnonzero(world.poacher_sighted_by >= 0)})
+
+
+class TestDetectionChanges(unittest.TestCase):
+    """Optimizers tracking detections get the changes of the detected agents instead of the full groups"""
+
+    def trajectory(self, world, optimizer, detections=None, steps=300):
+        ticks = []
+        while world.running and world.steps < steps:
+            world.step(optimizer)
+            ticks.append([(agent.position.x, agent.position.y, agent.active_state.code) for agent in world.all_agents()])
+            if detections is not None:
+                animals, poachers = detections(world)
+                self.assertEqual(list(optimizer.animals), animals, f"Tick {world.steps}")
+                self.assertEqual(list(optimizer.poachers), poachers, f"Tick {world.steps}")
+        return ticks
+
+    def test_world(self):
+        """The view rebuilt from the changes has the agents and order of the detected groups, the world runs the same"""
+        scenario = Scenario.generate(n_herds=6, n_poachers=4, seed=1)
+        expected = self.trajectory(World(*scenario, seed=1, log_transitions=False), PSOOptimizer(seed=1))
+        view = DetectionView(PSOOptimizer(seed=1))
+        ticks = self.trajectory(World(*scenario, seed=1, log_transitions=False), view,
+                                lambda world: (list(world.detected_animals), list(world.detected_poachers)))
+        self.assertEqual(len(ticks), len(expected))
+        for tick, (agents, expected_agents) in enumerate(zip(ticks, expected)):
+            self.assertEqual(agents, expected_agents, f"Tick {tick + 1}")
+
+        # One reset in the first tick, afterwards only ticks with changes
+        self.assertEqual(view.calls[0], True)
+        self.assertNotIn(True, view.calls[1:])
+        self.assertGreater(len(view.calls), 10)
+        self.assertLess(len(view.calls), len(ticks))
+
+    def test_array_world(self):
+        """ArrayWorld passes the changes of its sightings to the optimizer as views"""
+        def detections(world):
+            return (set(np.flatnonzero(world.animal_sighted_by >= 0).tolist()),
+                    set(np.flatnonzero(world.poacher_sighted_by >= 0).tolist()))
+
+        view = DetectionView(ArrayPSOOptimizer(seed=1))
+        world = ArrayWorld(*Scenario.generate(n_herds=6, n_poachers=4, seed=1), seed=1)
+        n_changes = 0
+        while world.running and world.steps < 300:
+            world.step(view)
+            animals, poachers = detections(world)
+            self.assertEqual({agent.index for agent in view.animals}, animals)
+            self.assertEqual({agent.index for agent in view.poachers}, poachers)
+            n_changes += sum(len(agents) for _, agents, _ in world.detection_changes)
+        self.assertGreater(n_changes, 0)
+        self.assertNotIn(True, view.calls[1:])
+
+        with self.assertRaises(ValueError):
+            BatchWorld(n_worlds=2, seed=1).step(DetectionView(ArrayPSOOptimizer(seed=1)))
+
+    def test_restored_world_resets_the_view(self):
+        """Restored worlds and forks pass their detected agents anew, the view of the later ticks is outdated"""
+        for new_world, optimizer, detections in ((lambda: World(seed=2, log_transitions=False), PSOOptimizer, world_detections),
+                                                 (lambda: ArrayWorld(seed=2), ArrayPSOOptimizer, array_detections)):
+            world = new_world()
+            view = DetectionView(optimizer(seed=2))
+            for _ in range(100):
+                world.step(view)
+            snapshot = world.snapshot()
+            for _ in range(100):
+                world.step(view)
+            for restored in (world.fork(1)[0], world):
+                restored.restore(snapshot)
+                calls = len(view.calls)
+                restored.step(view)
+                self.assertEqual(view.calls[calls:], [True])
+                self.assertEqual(({agent.name for agent in view.animals}, {agent.name for agent in view.poachers}),
+                                 detections(restored))
+
+    def test_shared_optimizer(self):
+        """Worlds stepped in turns with the same optimizer reset the view the other world left behind"""
+        for new_world, optimizer, detections in ((lambda: World(seed=3, log_transitions=False), PSOOptimizer, world_detections),
+                                                 (lambda: ArrayWorld(seed=3), ArrayPSOOptimizer, array_detections)):
+            world = new_world()
+            view = DetectionView(optimizer(seed=3))
+            for _ in range(50):
+                world.step(view)
+            forks = world.fork(2)
+            for _ in range(50):
+                for fork in forks:
+                    calls = len(view.calls)
+                    fork.step(view)
+                    self.assertEqual(view.calls[calls:], [True])
+                    self.assertEqual(({agent.name for agent in view.animals}, {agent.name for agent in view.poachers}),
+                                     detections(fork))
+
+
+class TestHeadless(unittest.TestCase):
+    def test_runs_without_pygame(self):
+        """Headless episodes of both engines import and run with pygame blocked, in a fresh interpreter"""
+        code = (
+            "import sys\n"
+            "sys.modules['pygame'] = None  # Any import of pygame raises ImportError\n"
+            "import main\n"
+            "from rl_optimizer import RLOptimizer\n"
+            "for engine in ('objects', 'array'):\n"
+            "    main.run(headless=True, engine=engine, seed=1, max_steps=50)\n"
+            "main.run(RLOptimizer(), headless=True, seed=1, max_steps=50, herding='neighbors')\n"
+            "assert sys.modules['pygame'] is None\n"
+        )
+        simulator = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.run([sys.executable, '-c', code], cwd=simulator, capture_output=True, text=True)
+        self.assertEqual(process.returncode, 0, process.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
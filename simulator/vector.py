@@ -0,0 +1,165 @@
+# Plain Python 2D vector used by the simulation core
+# Implements the subset of the pygame.Vector2 interface used by agents, states and optimizers,
+# so the simulation can run without importing pygame. Behaves like pygame.Vector2 for these operations
+# (in-place operators mutate the vector, normalizing a zero vector raises ValueError) and can be passed
+# wherever pygame expects a coordinate pair.
+
+import math
+
+
+class Vector2:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0.0, y=None):
+        # Accept a single coordinate pair like pygame.Vector2
+        if y is None:
+            if isinstance(x, (int, float)):
+                y = x
+            else:
+                x, y = x[0], x[1]
+        self.x = float(x)
+        self.y = float(y)
+
+    def __repr__(self):
+        return f"Vector2({self.x}, {self.y})"
+
+    # Sequence protocol, allows tuple(vector), x, y = vector and passing vectors to pygame
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, index):
+        return (self.x, self.y)[index]
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+    def __eq__(self, other):
+        try:
+            ox, oy = coordinates(other)
+        except (TypeError, IndexError):
+            return NotImplemented
+        return self.x == ox and self.y == oy
+
+    __hash__ = None  # Mutable, like pygame.Vector2
+
+    # Arithmetic, results are created with new_vector to skip the argument handling of __init__
+    def __add__(self, other):
+        if other.__class__ is Vector2:
+            return new_vector(self.x + other.x, self.y + other.y)
+        ox, oy = coordinates(other)
+        return new_vector(self.x + ox, self.y + oy)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if other.__class__ is Vector2:
+            return new_vector(self.x - other.x, self.y - other.y)
+        ox, oy = coordinates(other)
+        return new_vector(self.x - ox, self.y - oy)
+
+    def __rsub__(self, other):
+        ox, oy = coordinates(other)
+        return new_vector(ox - self.x, oy - self.y)
+
+    def __mul__(self, scalar):
+        return new_vector(self.x * scalar, self.y * scalar)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        # Multiply with the reciprocal like pygame.Vector2, keeps results bit-identical
+        inverse = 1 / scalar
+        return new_vector(self.x * inverse, self.y * inverse)
+
+    def __neg__(self):
+        return new_vector(-self.x, -self.y)
+
+    def __iadd__(self, other):
+        if other.__class__ is Vector2:
+            self.x += other.x
+            self.y += other.y
+            return self
+        ox, oy = coordinates(other)
+        self.x += ox
+        self.y += oy
+        return self
+
+    def __isub__(self, other):
+        ox, oy = coordinates(other)
+        self.x -= ox
+        self.y -= oy
+        return self
+
+    def __imul__(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def __itruediv__(self, scalar):
+        inverse = 1 / scalar
+        self.x *= inverse
+        self.y *= inverse
+        return self
+
+    # Vector operations
+    def copy(self):
+        return new_vector(self.x, self.y)
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y)
+
+    def length_squared(self):
+        return self.x * self.x + self.y * self.y
+
+    def distance_to(self, other):
+        # Inlined fast path, this is the hottest method of the simulation
+        if other.__class__ is Vector2:
+            dx = self.x - other.x
+            dy = self.y - other.y
+        else:
+            dx = self.x - other[0]
+            dy = self.y - other[1]
+        return math.sqrt(dx * dx + dy * dy)
+
+    def dot(self, other):
+        ox, oy = coordinates(other)
+        return self.x * ox + self.y * oy
+
+    def normalize(self):
+        length = self.length()
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        return new_vector(self.x / length, self.y / length)
+
+    def normalize_ip(self):
+        length = self.length()
+        if length == 0:
+            raise ValueError("Can't normalize Vector of length Zero")
+        self.x /= length
+        self.y /= length
+        return
+
+    def scale_to_length(self, new_length):
+        length = self.length()
+        if length == 0:
+            raise ValueError("Cannot scale a vector with zero length")
+        fraction = new_length / length
+        self.x *= fraction
+        self.y *= fraction
+        return
+
+
+def coordinates(other):
+    """Return the (x, y) pair of a vector or any coordinate sequence"""
+    if other.__class__ is Vector2:
+        return other.x, other.y
+    return other[0], other[1]
+
+
+def new_vector(x, y):
+    """Create a vector from two floats without the argument handling of Vector2.__init__"""
+    vector = object.__new__(Vector2)
+    vector.x = x
+    vector.y = y
+    return vector
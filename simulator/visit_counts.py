@@ -0,0 +1,157 @@
+# Visit counts of the grid cells of the RLOptimizer
+# Counts are kept in a dense list indexed by cell and the visited cells in an indexed binary min-heap ordered by
+# (visit count, order of the first visit). The k least visited cells are read from the top of the heap without
+# sorting all cells, and counting a visit moves one cell down the heap in O(log n).
+# The order matches sorting the old {(grid_x, grid_y): visit_count} dict by count, ties keep the order of the first visits.
+
+import heapq
+import numpy as np
+
+
+class VisitCounts:
+    def __init__(self, grid_x_divisions, grid_y_divisions):
+        """
+        Args:
+            grid_x_divisions: int, number of horizontal grid divisions
+            grid_y_divisions: int, number of vertical grid divisions
+        """
+        self.grid_x_divisions = grid_x_divisions
+        self.grid_y_divisions = grid_y_divisions
+        size = grid_x_divisions * grid_y_divisions
+        self.counts = [0] * size        # Visit count per cell, cell id = grid_x * grid_y_divisions + grid_y
+        self.first_visit = [-1] * size  # Order of the first visit per cell, -1 if never visited
+        self.visited = []               # Cell ids in the order of their first visit
+
+        # Heap of visited cell ids, ordered by the key count * size + first_visit
+        self.heap = []
+        self.heap_position = [-1] * size
+
+    @classmethod
+    def from_dict(cls, visit_counts, grid_x_divisions, grid_y_divisions):
+        """Create visit counts from a {(grid_x, grid_y): visit_count} dict, as stored in model files"""
+        counts = cls(grid_x_divisions, grid_y_divisions)
+        for cell, count in visit_counts.items():
+            counts.increment(cell, count)
+        return counts
+
+    # Read access like the {(grid_x, grid_y): visit_count} dict it replaces, only visited cells are contained
+    def __len__(self):
+        return len(self.visited)
+
+    def __contains__(self, cell):
+        return self.first_visit[self.cell_id(cell)] >= 0
+
+    def __getitem__(self, cell):
+        cell_id = self.cell_id(cell)
+        if self.first_visit[cell_id] < 0:
+            raise KeyError(cell)
+        return self.counts[cell_id]
+
+    def get(self, cell, default=None):
+        return self[cell] if cell in self else default
+
+    def keys(self):
+        return [self.cell(cell_id) for cell_id in self.visited]
+
+    def items(self):
+        return [(self.cell(cell_id), self.counts[cell_id]) for cell_id in self.visited]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def as_array(self):
+        """Visit counts as np.ndarray (grid_x_divisions, grid_y_divisions)"""
+        return np.array(self.counts).reshape(self.grid_x_divisions, self.grid_y_divisions)
+
+    def cell_id(self, cell):
+        return cell[0] * self.grid_y_divisions + cell[1]
+
+    def cell(self, cell_id):
+        return divmod(cell_id, self.grid_y_divisions)
+
+    def key(self, cell_id):
+        return self.counts[cell_id] * len(self.counts) + self.first_visit[cell_id]
+
+    def increment(self, cell, amount=1):
+        """Count visits of a cell"""
+        cell_id = self.cell_id(cell)
+        self.counts[cell_id] += amount
+        if self.first_visit[cell_id] < 0:
+            # First visit, add the cell at the bottom of the heap and move it up
+            self.first_visit[cell_id] = len(self.visited)
+            self.visited.append(cell_id)
+            self.heap.append(cell_id)
+            self.heap_position[cell_id] = len(self.heap) - 1
+            self.sift_up(len(self.heap) - 1)
+        else:
+            # The key only grows, move the cell down
+            self.sift_down(self.heap_position[cell_id])
+        return
+
+    def least_visited(self, k):
+        """
+        The k least visited cells, in O(k log k) by expanding the heap from its root
+        Returns:
+            list of ((grid_x, grid_y), visit_count), least visited first
+        """
+        result = []
+        if not self.heap:
+            return result
+        candidates = [(self.key(self.heap[0]), 0)]
+        while candidates and len(result) < k:
+            _, position = heapq.heappop(candidates)
+            cell_id = self.heap[position]
+            result.append((self.cell(cell_id), self.counts[cell_id]))
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self.heap):
+                    heapq.heappush(candidates, (self.key(self.heap[child]), child))
+        return result
+
+    def most_visited(self, k):
+        """
+        The k most visited cells, ties in the order of the first visit
+        Returns:
+            list of ((grid_x, grid_y), visit_count), most visited first
+        """
+        visited = np.array(self.visited, dtype=np.int64)
+        counts = np.array(self.counts)[visited] if len(visited) else np.empty(0)
+        order = np.lexsort((np.arange(len(visited)), -counts))[:k]
+        return [(self.cell(int(visited[i])), int(counts[i])) for i in order]
+
+    def sift_up(self, position):
+        heap, heap_position = self.heap, self.heap_position
+        cell_id = heap[position]
+        key = self.key(cell_id)
+        while position > 0:
+            parent = (position - 1) // 2
+            if self.key(heap[parent]) <= key:
+                break
+            heap[position] = heap[parent]
+            heap_position[heap[position]] = position
+            position = parent
+        heap[position] = cell_id
+        heap_position[cell_id] = position
+        return
+
+    def sift_down(self, position):
+        heap, heap_position = self.heap, self.heap_position
+        cell_id = heap[position]
+        key = self.key(cell_id)
+        size = len(heap)
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            child_key = self.key(heap[child])
+            if child + 1 < size:
+                right_key = self.key(heap[child + 1])
+                if right_key < child_key:
+                    child, child_key = child + 1, right_key
+            if key <= child_key:
+                break
+            heap[position] = heap[child]
+            heap_position[heap[position]] = position
+            position = child
+        heap[position] = cell_id
+        heap_position[cell_id] = position
+        return
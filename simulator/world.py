@@ -0,0 +1,608 @@
+# Headless simulation core
+# A World holds all agents of one simulation and advances them tick by tick. It does not import or initialize pygame:
+# events are routed through the world's own EventBus and positions use the plain Vector2 of vector.py.
+# main.run drives a World and only adds pygame for the display, so many worlds can run in one process
+# (e.g. in training workers) without sharing a global event queue.
+
+import time
+from collections import deque
+from itertools import count
+import numpy as np
+
+from events import (POACHER_ATTACK_ANIMAL, ANIMAL_KILLED, DRONE_CAUGHT_POACHER, DRONE_DETECTED_ANIMAL, DRONE_LOST_ANIMAL,
+                    DRONE_DETECTED_POACHER, DRONE_LOST_POACHER)
+from event_bus import EventBus, Event
+from agents import Drone, Animal, Poacher, AgentGroup
+from states import DroneDeepSearch, Terminal, STATES
+from vector import new_vector
+from snapshot import WorldSnapshot
+from spatial_index import SpatialGrid
+from herds import HerdTracker
+from settings import GAME_WIDTH, HEIGHT
+from random_stream import RandomStream
+
+# Default scenario, (name, x, y) for every agent
+DEFAULT_DRONES = [('good boy1', 100, 100), ('good boy2', 700, 100), ('good boy3', 100, 400)]
+DEFAULT_ANIMALS = [('elephant1', 400, 300), ('elephant2', 410, 300), ('elephant3', 400, 310), ('elephant4', 410, 310),
+                   ('giraffe1', 700, 300), ('giraffe2', 710, 300), ('giraffe3', 700, 300), ('giraffe4', 710, 310)]
+DEFAULT_POACHERS = [('bad boy1', 400, 500), ('bad boy2', 650, 500)]
+
+MAX_STEPS = 2000  # Early termination to prevent hanging
+DETECTION_VIEWS = count()  # Ids of the detected agents of a world between restores, see DroneOptimizer.detection_view
+
+# Data of the agent states kept on the agents, stored in snapshots
+STATE_FIELDS = ('search_time', 'time_since_direction_change', 'search_angle', 'attack_time')
+MEMORY_SIZE = 3  # Length of Agent.memory
+
+
+class World:
+    """Object-based simulation world, every agent is updated one after another"""
+
+    def __init__(self, drones=DEFAULT_DRONES, animals=DEFAULT_ANIMALS, poachers=DEFAULT_POACHERS, event_log=None, log_transitions=True,
+                 max_steps=MAX_STEPS, profiler=None, map_size=(GAME_WIDTH, HEIGHT), seed=None, recorder=None, herding='components'):
+        """
+        Args:
+            drones: list of (name, x, y) tuples
+            animals: list of (name, x, y) tuples
+            poachers: list of (name, x, y) tuples
+            event_log: deque (optional), log of (message, milliseconds) tuples shown in the info panel
+            log_transitions: bool, whether to log state changes
+            max_steps: int, number of steps after which the simulation ends with a timeout
+            profiler: PhaseProfiler (optional), times the phases of every tick and counts scans, transitions and events
+            map_size: tuple (width, height), boundaries of the map
+            seed: int or np.random.SeedSequence (optional), seed of the random stream of the agents, None for a fresh seed
+            recorder: TrajectoryRecorder (optional), records positions, states, health and events of every tick
+            herding: str, 'components': herds are the connected groups of animals, tracked incrementally by a HerdTracker,
+                     'neighbors': the herd of an animal are the animals within its scan range, scanned every tick
+        """
+        self.event_bus = EventBus()
+        self.event_bus.subscribe(POACHER_ATTACK_ANIMAL, self.on_poacher_attack)
+        self.event_bus.subscribe(ANIMAL_KILLED, self.on_animal_killed)
+        self.event_bus.subscribe(DRONE_CAUGHT_POACHER, self.on_poacher_caught)
+        self.rng = RandomStream(seed)
+        self.map_size = map_size
+        self.profiler = profiler
+        self.start_time = time.perf_counter()
+        self.log_transitions = log_transitions
+
+        # Event log for displaying recent events (max 15 events)
+        self.event_log = event_log if event_log is not None else deque(maxlen=15)
+        self.log("Simulation started")
+
+        # Create agents, handled in separate groups for easier access
+        self.drones = AgentGroup(Drone(name, x, y, event_bus=self.event_bus, map_size=map_size, rng=self.rng) for name, x, y in drones)
+        self.animals = AgentGroup(Animal(name, x, y, event_bus=self.event_bus, map_size=map_size, rng=self.rng) for name, x, y in animals)
+        self.poachers = AgentGroup(Poacher(name, x, y, event_bus=self.event_bus, map_size=map_size, rng=self.rng)
+                                   for name, x, y in poachers)
+
+        # Track alive agents seperately,
+        # if any of these alive groups is empty, the game is over
+        self.alive_animals = AgentGroup(self.animals)
+        self.alive_poachers = AgentGroup(self.poachers)
+
+        # Handle drone search globally since drones can communicate
+        # Sightings map every detected agent to the first drone that saw it in the last tick, the detected groups are
+        # updated in place with the changes, which are posted as events and passed to optimizers that track detections
+        self.detected_animals = AgentGroup()
+        self.detected_poachers = AgentGroup()
+        self.animal_sightings = {}
+        self.poacher_sightings = {}
+        self.detection_optimizer = None  # Optimizer whose view of the detected agents is up to date
+        self.detection_view = next(DETECTION_VIEWS)
+
+        # Spatial indexes over agent positions to limit scans to nearby agents
+        self.alive_animal_index = SpatialGrid()
+        self.alive_poacher_index = SpatialGrid()
+        self.animal_index = SpatialGrid()
+
+        # Herds as connected groups, the tracker is shared with the animals for the herd lookups of their states
+        if herding not in ('neighbors', 'components'):
+            raise ValueError(f"Unknown herding: {herding}")
+        self.herding = herding
+        self.herds = None
+        if herding == 'components':
+            self.herds = HerdTracker()
+            self.herds.rebuild(self.alive_animals)
+            for animal in self.animals:
+                animal.herds = self.herds
+
+        # Track simulation progress
+        self.max_steps = max_steps
+        self.steps = 0
+        self.outcome = None
+        self.running = True
+
+        # Optional trajectory recording, events refer to agents by their index in all_agents
+        self.recorder = recorder
+        if recorder is not None:
+            agents = self.all_agents()
+            self.agent_index = {agent: i for i, agent in enumerate(agents)}
+            recorder.open([agent.name for agent in agents],
+                          [('drones', len(self.drones)), ('animals', len(self.animals)), ('poachers', len(self.poachers))],
+                          map_size, engine='objects')
+            self.record()
+
+    def elapsed_ms(self):
+        """Milliseconds since the world was created, used as timestamp in the event log"""
+        return int((time.perf_counter() - self.start_time) * 1000)
+
+    def log(self, message):
+        self.event_log.append((message, self.elapsed_ms()))
+
+    def all_agents(self):
+        """All agents of the world, alive or not"""
+        return list(self.drones) + list(self.animals) + list(self.poachers)
+
+    def agents_by_type(self):
+        """Drones, alive animals and alive poachers, as shown in the info panel"""
+        return list(self.drones), list(self.alive_animals), list(self.alive_poachers)
+
+    def results(self):
+        """Return simulation results for analysis"""
+        return {
+            'outcome': self.outcome,
+            'steps': self.steps,
+            'poachers_caught_pct': 1 - len(self.alive_poachers) / len(self.poachers),
+            'animals_alive_pct': len(self.alive_animals) / len(self.animals)
+        }
+
+    def run(self, optimizer):
+        """Step the world until the simulation ends and return the results"""
+        while self.running:
+            self.step(optimizer)
+        return self.results()
+
+    def snapshot(self):
+        """
+        Capture the complete state of the world between two ticks.
+        Positions are stored once per distinct vector, so positions shared by several agents or memories (e.g. a poacher
+        that reached its target) are shared again after restoring. Herds are not stored, they are rescanned before use.
+        Returns:
+            snapshot: WorldSnapshot
+        """
+        agents = self.all_agents()
+        index = {agent: i for i, agent in enumerate(agents)}
+        vector_slots = {}  # {id(vector): slot}
+        vectors = []
+
+        def slot(vector):
+            if id(vector) not in vector_slots:
+                vector_slots[id(vector)] = len(vectors)
+                vectors.append((vector.x, vector.y))
+            return vector_slots[id(vector)]
+
+        n = len(agents)
+        position = [slot(agent.position) for agent in agents]
+        memory = np.full((n, MEMORY_SIZE), -1, dtype=np.int64)
+        memory_kinds = []
+        memory_kind = np.zeros((n, MEMORY_SIZE), dtype=np.int8)
+        state = np.zeros(n, dtype=np.int8)
+        state_data = np.zeros((n, len(STATE_FIELDS)), dtype=np.int64)
+        target = np.full(n, -1, dtype=np.int64)
+        threat = np.full(n, -1, dtype=np.int64)
+        health = np.zeros(n)
+        sightings = {**self.animal_sightings, **self.poacher_sightings}
+        sighted_by = np.array([index[sightings[agent]] if agent in sightings else -1 for agent in agents], dtype=np.int64)
+        sighted_order = np.full(n, -1, dtype=np.int64)  # Position in the detected group, the groups are in detection order
+        for group in (self.animal_sightings, self.poacher_sightings):
+            for order, agent in enumerate(group):
+                sighted_order[index[agent]] = order
+        for i, agent in enumerate(agents):
+            for j, (kind, vector) in enumerate(getattr(agent, 'memory', ())):
+                if kind not in memory_kinds:
+                    memory_kinds.append(kind)
+                memory[i, j] = slot(vector)
+                memory_kind[i, j] = memory_kinds.index(kind)
+            state[i] = agent.active_state.code
+            state_data[i] = [getattr(agent, field, 0) for field in STATE_FIELDS]
+            if getattr(agent, 'target', None) is not None:
+                target[i] = index[agent.target]
+            if getattr(agent, 'threat', None) is not None:
+                threat[i] = index[agent.threat]
+            health[i] = getattr(agent, 'health', 0)
+
+        arrays = {
+            'vectors': np.array(vectors, dtype=float).reshape(-1, 2),
+            'position': np.array(position, dtype=np.int64),
+            'memory': memory,
+            'memory_kind': memory_kind,
+            'state': state,
+            'state_data': state_data,
+            'target': target,
+            'threat': threat,
+            'health': health,
+            'alive': np.array([agent in self.alive_animals or agent in self.alive_poachers for agent in agents]),
+            'sighted_by': sighted_by,
+            'sighted_order': sighted_order
+        }
+        data = {
+            'names': [[agent.name for agent in group] for group in (self.drones, self.animals, self.poachers)],
+            'memory_kinds': memory_kinds,
+            'events': [(event.type, {key: index[agent] for key, agent in event.dict.items()}) for event in self.event_bus.queue],
+            'rng': self.rng.get_state(),
+            'event_log': list(self.event_log),
+            'steps': self.steps,
+            'outcome': self.outcome,
+            'running': self.running,
+            'max_steps': self.max_steps,
+            'map_size': self.map_size,
+            'log_transitions': self.log_transitions,
+            'herding': self.herding
+        }
+        return WorldSnapshot('objects', arrays, data)
+
+    def restore(self, snapshot):
+        """
+        Reset the world to a snapshot of itself or of a world with the same agents
+        Args:
+            snapshot: WorldSnapshot, as returned by snapshot
+        """
+        arrays, data = snapshot.arrays, snapshot.data
+        agents = self.all_agents()
+        vectors = [new_vector(x, y) for x, y in arrays['vectors'].tolist()]
+        targets, threats = arrays['target'].tolist(), arrays['threat'].tolist()
+        memory, memory_kind = arrays['memory'].tolist(), arrays['memory_kind'].tolist()
+        state_data = arrays['state_data'].tolist()
+        for i, (agent, position, state, health) in enumerate(zip(agents, arrays['position'].tolist(), arrays['state'].tolist(),
+                                                              arrays['health'].tolist())):
+            agent.position = vectors[position]
+
+            # Set the state without entering it, entering can draw random numbers
+            agent.active_state = STATES[state]
+            for field, value in zip(STATE_FIELDS, state_data[i]):
+                if hasattr(agent, field):
+                    setattr(agent, field, value)
+
+            if hasattr(agent, 'memory'):
+                agent.memory = deque(((data['memory_kinds'][kind], vectors[slot])
+                                      for slot, kind in zip(memory[i], memory_kind[i]) if slot >= 0), maxlen=MEMORY_SIZE)
+            if hasattr(agent, 'target'):
+                agent.target = agents[targets[i]] if targets[i] >= 0 else None
+            if hasattr(agent, 'threat'):
+                agent.threat = agents[threats[i]] if threats[i] >= 0 else None
+            if hasattr(agent, 'health'):
+                agent.health = health
+            if hasattr(agent, 'herd'):
+                agent.herd = None
+
+        # Groups keep the order of the agents, agents list drones, animals and poachers one after another
+        alive, sighted_by, sighted_order = arrays['alive'].tolist(), arrays['sighted_by'].tolist(), arrays['sighted_order'].tolist()
+        animals = slice(len(self.drones), len(self.drones) + len(self.animals))
+        poachers = slice(animals.stop, len(agents))
+        self.alive_animals = AgentGroup(agent for agent, flag in zip(self.animals, alive[animals]) if flag)
+        self.alive_poachers = AgentGroup(agent for agent, flag in zip(self.poachers, alive[poachers]) if flag)
+
+        # Sightings and detected groups in detection order, optimizers tracking detections get the restored groups anew
+        def sightings(group, rows):
+            rows = sorted((order, agent, drone) for agent, drone, order in zip(group, sighted_by[rows], sighted_order[rows])
+                          if drone >= 0)
+            return {agent: agents[drone] for _, agent, drone in rows}
+        self.animal_sightings = sightings(self.animals, animals)
+        self.poacher_sightings = sightings(self.poachers, poachers)
+        self.detected_animals = AgentGroup(self.animal_sightings)
+        self.detected_poachers = AgentGroup(self.poacher_sightings)
+        self.detection_optimizer = None
+        self.detection_view = next(DETECTION_VIEWS)
+
+        self.event_bus.queue = [Event(type, {key: agents[i] for key, i in agent_index.items()})
+                                for type, agent_index in data['events']]
+        self.rng.set_state(data['rng'])
+        self.event_log.clear()
+        self.event_log.extend(data['event_log'])
+        self.steps = data['steps']
+        self.outcome = data['outcome']
+        self.running = data['running']
+        self.max_steps = data['max_steps']
+
+        # Herds only depend on the positions of the alive animals
+        if self.herds is not None:
+            self.herds.rebuild(self.alive_animals)
+        return
+
+    @classmethod
+    def from_snapshot(cls, snapshot, profiler=None):
+        """Create a new world in the state of a snapshot"""
+        data = snapshot.data
+        vectors, position = snapshot.arrays['vectors'], snapshot.arrays['position']
+        groups, start = [], 0
+        for names in data['names']:
+            groups.append([(name, *vectors[position[start + i]]) for i, name in enumerate(names)])
+            start += len(names)
+        world = cls(*groups, log_transitions=data['log_transitions'], max_steps=data['max_steps'], profiler=profiler,
+                    map_size=data['map_size'], herding=data.get('herding', 'neighbors'))  # Older snapshots scanned neighbors
+        world.restore(snapshot)
+        return world
+
+    def fork(self, n):
+        """
+        Independent copies of the world in its current state, e.g. for what-if rollouts with different actions.
+        The copies continue the random stream of the world, every copy draws the same random numbers.
+        Args:
+            n: int, number of copies
+        Returns:
+            list of World
+        """
+        snapshot = self.snapshot()
+        return [self.__class__.from_snapshot(snapshot) for _ in range(n)]
+
+    def step(self, optimizer):
+        """Advance the world by one tick"""
+        self.steps += 1
+
+        # Early termination to prevent hanging
+        if self.steps > self.max_steps:
+            self.outcome = "timeout"
+            self.running = False
+
+        profiler = self.profiler
+        if profiler is None:
+            self.handle_events()
+            self.update_animals()
+            self.update_poachers()
+            self.update_drones(optimizer)
+            if self.recorder is not None:
+                self.record()
+            return
+
+        # Same phases with timers, update_drones times its sensing, optimizer and action phases itself
+        indexes = (self.alive_animal_index, self.alive_poacher_index, self.animal_index)
+        queries = sum(index.queries for index in indexes)
+        candidates = sum(index.candidates_returned for index in indexes)
+        profiler.tick()
+        start = profiler.start()
+        self.handle_events()
+        start = profiler.stop('events', start)
+        self.update_animals()
+        start = profiler.stop('animals', start)
+        self.update_poachers()
+        profiler.stop('poachers', start)
+        self.update_drones(optimizer)
+
+        # Scans through the spatial indexes and the drone target scans over all detected poachers
+        profiler.count('scans', sum(index.queries for index in indexes) - queries + len(self.drones))
+        profiler.count('agents_scanned', sum(index.candidates_returned for index in indexes) - candidates
+                       + len(self.drones) * len(self.detected_poachers))
+        if self.recorder is not None:
+            start = profiler.start()
+            self.record()
+            profiler.stop('recording', start)
+        return
+
+    def record(self):
+        """Write the current tick and the events raised in it (still queued for the next tick) to the recorder"""
+        agents = self.all_agents()
+        position, state, health = self.recorder.tick(self.steps)
+        position[:] = [(agent.position.x, agent.position.y) for agent in agents]
+        state[:] = [agent.active_state.code for agent in agents]
+        health[len(self.drones):len(self.drones) + len(self.animals)] = [animal.health for animal in self.animals]
+        index = self.agent_index
+        self.recorder.add_events(self.steps, [(event.type, index[event.agent], index[event.other]) for event in self.event_bus.queue])
+        return
+
+    def handle_events(self):
+        """Handle the events posted during the previous tick, see the handlers subscribed in __init__"""
+        dispatched = self.event_bus.dispatch()
+        if self.profiler is not None:
+            self.profiler.count('events_dispatched', dispatched)
+        return
+
+    def on_poacher_attack(self, animal, poacher):
+        # Reduce animal health
+        animal.health -= poacher.attack_damage
+
+        # if animal is dead, post animal killed event
+        if animal.health <= 0:
+            self.event_bus.emit(ANIMAL_KILLED, animal, poacher)
+        return
+
+    def on_animal_killed(self, animal, poacher):
+        # Set animal to terminal state & remove from alive agents
+        animal.set_state(Terminal())
+        self.alive_animals.remove(animal)
+        if self.herds is not None:
+            self.herds.remove(animal)
+        if self.profiler is not None:
+            self.profiler.count('state_transitions')
+
+        # Delete target from poacher
+        poacher.target = None
+
+        # Log the event
+        self.log(f"Poacher {poacher.name} killed {animal.name}")
+
+        # Check if all animals are dead to end the game
+        if len(self.alive_animals) == 0:
+            self.outcome = "defeat"
+            self.running = False
+        return
+
+    def on_poacher_caught(self, poacher, drone):
+        # Set poacher to terminal state & remove from alive agents
+        poacher.set_state(Terminal())
+        self.alive_poachers.remove(poacher)
+        if self.profiler is not None:
+            self.profiler.count('state_transitions')
+
+        # Log the event
+        self.log(f"Drone caught poacher {poacher.name}")
+
+        # End simulation if all poachers are caught
+        if len(self.alive_poachers) == 0:
+            self.outcome = "victory"
+            self.running = False
+        return
+
+    def set_state(self, agent, state):
+        """Change the state of an agent and log the transition"""
+        agent.set_state(state)
+        if self.profiler is not None:
+            self.profiler.count('state_transitions')
+        if self.log_transitions:
+            self.log(f"{agent.name} changed state to {state.__class__.__name__}")
+        return
+
+    def update_animals(self):
+        # Rebuild spatial indexes of alive agents once per tick, moving agents are updated incrementally
+        self.alive_animal_index.rebuild(self.alive_animals)
+        self.alive_poacher_index.rebuild(self.alive_poachers)
+        herds = self.herds
+        if herds is not None:
+            herds.refresh()
+
+        for animal in self.alive_animals:
+
+            # Scan surroundings for poachers
+            detected_poacher = animal.scan_surroundings(agents=self.alive_poachers, mode='nearest', index=self.alive_poacher_index)
+
+            # Update threat
+            animal.threat = detected_poacher[2] if detected_poacher else None
+
+            # Update my current herd, tracked herds are updated after the animal moved
+            if herds is None:
+                animal.herd = [a[2] for a in animal.scan_surroundings(agents=self.alive_animals, mode='all', index=self.alive_animal_index)]
+
+            # Check state transitions
+            state = animal.active_state.check_transition(animal)
+            if state:
+                self.set_state(animal, state)
+
+            # Perform the action of the current state
+            animal.active_state.action(animal)
+            self.alive_animal_index.update(animal)
+            if herds is not None:
+                herds.update(animal, self.alive_animal_index)
+        return
+
+    def herd_size(self, animal):
+        """
+        Number of animals in the herd of an animal including itself, e.g. for poachers looking for small herds
+        Args:
+            animal: Animal, alive animal of the world
+        Returns:
+            int, size of the connected herd when herds are tracked, otherwise the animals within scan range of the
+            last animal update plus the animal
+        """
+        if self.herds is not None:
+            return self.herds.size(animal)
+        return len(animal.herd or ()) + 1
+
+    def update_poachers(self):
+        for poacher in self.alive_poachers:
+
+            # Scan surroundings for animals
+            detected_agents = poacher.scan_surroundings(agents=self.alive_animals, mode='all', index=self.alive_animal_index)
+
+            if detected_agents:
+                # Update target if one is found and there is no current target
+                # Poachers prefer the animal in the smallest herd, the nearest one of equally small herds
+                sighting = min(detected_agents, key=lambda x: (self.herd_size(x[2]), x[0], x[1]))
+                detected_agents.remove(sighting)
+                poacher.target = sighting[2] if poacher.target is None else poacher.target
+
+                # Update memory of animal sightings with the other animals
+                temp_agents = sorted(detected_agents, key=lambda x: x[0], reverse=True) # Sort by distance
+                for _, _, agent in temp_agents:
+                    new_memory = ('animal', agent.position)
+                    poacher.memory.appendleft(new_memory)
+
+            else:
+                poacher.target = None
+
+            # Check state transitions
+            state = poacher.active_state.check_transition(poacher)
+            if state:
+                self.set_state(poacher, state)
+
+            # Perform the action of the current state
+            poacher.active_state.action(poacher)
+            self.alive_poacher_index.update(poacher)
+        return
+
+    def update_drones(self, optimizer):
+        profiler = self.profiler
+        if profiler is not None:
+            start = profiler.start()
+
+        # 1. Update current sightings of animals and poachers
+        # Drones also see dead animals, so they use an index over all animals
+        self.animal_index.rebuild(self.animals)
+        animal_sightings, poacher_sightings = {}, {}  # Agents in sight of a drone in this tick
+
+        for drone in self.drones:
+            # Scan surroundings for animals & add to detected
+            detected_agents = drone.scan_surroundings(agents=self.animals, mode='all', index=self.animal_index)
+            for (_, _, agent) in detected_agents:
+                animal_sightings.setdefault(agent, drone)
+
+            # If drone state is Low Altitude, also check for poachers & add to detected
+            if isinstance(drone.active_state, DroneDeepSearch):
+                detected_agents = drone.scan_surroundings(agents=self.alive_poachers, mode='all', index=self.alive_poacher_index)
+                for (_, _, agent) in detected_agents:
+                    poacher_sightings.setdefault(agent, drone)
+
+        # Update the detected groups with the changes since the last tick, newly detected agents are appended
+        new_animals, lost_animals = self.update_sightings(self.animal_sightings, self.detected_animals, animal_sightings,
+                                                          DRONE_DETECTED_ANIMAL, DRONE_LOST_ANIMAL)
+        new_poachers, lost_poachers = self.update_sightings(self.poacher_sightings, self.detected_poachers, poacher_sightings,
+                                                            DRONE_DETECTED_POACHER, DRONE_LOST_POACHER)
+
+        # 2. Push current state to optimizer and get drone actions
+        if profiler is not None:
+            start = profiler.stop('drone_sensing', start)
+        if optimizer.tracks_detections:
+            # The optimizer only gets the changes, a new optimizer, a restored world or a view of another world starts
+            # from the groups
+            if self.detection_optimizer is not optimizer or optimizer.detection_view != self.detection_view:
+                optimizer.update_detections(list(self.detected_animals), [], list(self.detected_poachers), [], reset=True)
+                self.detection_optimizer = optimizer
+                optimizer.detection_view = self.detection_view
+            elif new_animals or lost_animals or new_poachers or lost_poachers:
+                optimizer.update_detections(new_animals, lost_animals, new_poachers, lost_poachers)
+            drone_actions = optimizer.optimize(self.drones, None, None)
+        else:
+            drone_actions = optimizer.optimize(self.drones, self.detected_animals, self.detected_poachers)
+        if profiler is not None:
+            start = profiler.stop('optimizer', start)
+
+        # Apply drone actions
+        for drone, action in drone_actions.items():
+            # Update drone state if needed
+            if action['state']:
+                self.set_state(drone, action['state'])
+
+            # Set closest poacher as target to catch
+            poacher = drone.scan_surroundings(agents=self.detected_poachers, mode='nearest')
+            drone.target = poacher[2] if poacher else None
+
+            # Perform state action with given parameters
+            drone.active_state.action(drone, action['direction'], action['speed_modifier'])
+
+        if profiler is not None:
+            profiler.stop('drone_actions', start)
+        return
+
+    def update_sightings(self, sightings, group, current, detected_type, lost_type):
+        """
+        Update the sightings and the detected group in place and post an event for every agent detected or lost
+        Args:
+            sightings: dict {agent: drone}, sightings of the last tick, updated to this tick
+            group: AgentGroup, detected agents of the last tick, updated to this tick
+            current: dict {agent: drone}, agents in sight in this tick with the first drone that saw them
+            detected_type: int, event type posted with the agent and the drone that detected it
+            lost_type: int, event type posted with the agent and the drone that saw it last
+        Returns:
+            (detected, lost): lists of agents
+        """
+        emit = self.event_bus.emit
+        lost = [agent for agent in sightings if agent not in current]
+        for agent in lost:
+            emit(lost_type, agent, sightings.pop(agent))
+        group.remove(*lost)
+        detected = []
+        for agent, drone in current.items():
+            if agent not in sightings:
+                detected.append(agent)
+                emit(detected_type, agent, drone)
+            sightings[agent] = drone
+        group.add(*detected)
+        return detected, lost